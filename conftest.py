@@ -120,6 +120,11 @@ def use_tmp_media_root(settings, tmp_path_factory):
     settings.MEDIA_ROOT = tmp_path_factory.getbasetemp() / "tmp-media"
 
 
+@pytest.fixture(autouse=True)
+def use_tmp_chunked_upload_dir(settings, tmp_path_factory):
+    settings.CONTENT_BLOCKS_CHUNKED_UPLOAD_DIR = tmp_path_factory.mktemp("uploads")
+
+
 @pytest.fixture
 def text_template(tmp_path_factory):
     """
@@ -297,6 +302,37 @@ def nested_content_block(
     return content_block, nested_content_block
 
 
+@pytest.fixture
+def deeply_nested_content_block(
+    nested_content_block,
+    nested_content_block_field_factory,
+    content_block_factory,
+    content_block_field_factory,
+    text_template,
+    content_block_template_factory,
+):
+    """
+    Nest a content block in the nested content block.
+    :return: Tuple of the top level, nested and deeply nested content blocks.
+    """
+    content_block, nested_content_block = nested_content_block
+    nested_field = nested_content_block_field_factory.create(
+        content_block=nested_content_block
+    )
+    deeply_nested_content_block = content_block_factory.create(
+        content_block_template=content_block_template_factory.create(
+            template_filename=text_template.name
+        ),
+        parent=nested_field,
+        saved=True,
+    )
+    content_block_field_factory.create(
+        text=faker.text(256),
+        content_block=deeply_nested_content_block,
+    )
+    return content_block, nested_content_block, deeply_nested_content_block
+
+
 @pytest.fixture
 def svg_file(tmp_path_factory):
     """
@@ -22,6 +22,7 @@ from content_blocks.models import (
     ContentBlockCollection,
     ContentBlockTemplate,
     ContentBlockTemplateField,
+    TemplateFieldDeletion,
 )
 from content_blocks.services.content_block_template import ImportExportServices
 from content_blocks.views import (
@@ -223,6 +224,60 @@ class ContentBlockAvailabilityAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(TemplateFieldDeletion)
+class TemplateFieldDeletionAdmin(admin.ModelAdmin):
+    """
+    Monitor the progress of deleting content block template fields.
+    Deletions are run after the request, or by the delete_content_block_template_fields management command when
+    CONTENT_BLOCKS_DEFER_TEMPLATE_FIELD_DELETION is True.
+    """
+
+    list_display = [
+        "name",
+        "status",
+        "progress_display",
+        "processed",
+        "total",
+    ] + AUTO_DATE_FIELDS
+    list_filter = ["status"] + AUTO_DATE_FIELDS
+    search_fields = ["name"]
+    readonly_fields = [
+        "name",
+        "status",
+        "progress_display",
+        "processed",
+        "total",
+        "last_id",
+        "error",
+    ] + AUTO_DATE_FIELDS
+    fieldsets = (
+        AUTO_DATE_FIELDSET,
+        (
+            "Template Field Deletion",
+            {
+                "fields": (
+                    "name",
+                    "status",
+                    "progress_display",
+                    ("processed", "total"),
+                    "last_id",
+                    "error",
+                )
+            },
+        ),
+    )
+
+    @admin.display(description="Progress")
+    def progress_display(self, obj):
+        return f"{obj.progress}%"
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
 class ContentBlockModelAdmin(admin.ModelAdmin):
     """
     Base class to be added to the admin of any model which has a content_blocks m2m.  This will then add
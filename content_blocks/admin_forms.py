@@ -2,17 +2,21 @@ import json
 
 from adminsortable2.admin import CustomInlineFormSet
 from django import forms
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ValidationError
 from django.core.validators import FileExtensionValidator
 
+from content_blocks.conf import settings
 from content_blocks.models import (
-    ContentBlock,
-    ContentBlockField,
     ContentBlockFields,
     ContentBlockTemplate,
     ContentBlockTemplateField,
 )
-from content_blocks.services.content_block_template import ImportExportServices
+from content_blocks.services.content_block_template import (
+    ImportExportServices,
+    TemplateFieldDeletionServices,
+)
 from content_blocks.widgets import (
     ChoicesWidget,
     ContentBlockTemplateFieldDeleteWidget,
@@ -55,6 +59,14 @@ def validate_choices(choices):
 class ContentBlockTemplateFieldInlineFormSet(CustomInlineFormSet):
     deletion_widget = ContentBlockTemplateFieldDeleteWidget()
 
+    def delete_existing(self, obj, commit=True):
+        """
+        Queue the template field for deletion rather than deleting the content block fields of every content block
+        using it in this request.
+        """
+        if commit:
+            TemplateFieldDeletionServices.queue(obj)
+
 
 class ContentBlockTemplateFieldAdminForm(forms.ModelForm):
     class Meta:
@@ -68,6 +80,23 @@ class ContentBlockTemplateFieldAdminForm(forms.ModelForm):
             help_text="You must provide a value and label for each choice or it will be ignored.",
             required=False,
         )
+        if (
+            settings.CONTENT_BLOCKS_MODEL_CHOICES is not None
+            and "model_choice_content_type" in self.fields
+        ):
+            self.fields[
+                "model_choice_content_type"
+            ].queryset = ContentType.objects.filter(
+                id__in=[
+                    content_type.id
+                    for content_type in ContentType.objects.get_for_models(
+                        *[
+                            apps.get_model(label)
+                            for label in settings.CONTENT_BLOCKS_MODEL_CHOICES
+                        ]
+                    ).values()
+                ]
+            )
 
     def clean(self):
         cleaned_data = super().clean()
@@ -108,35 +137,6 @@ class ContentBlockTemplateFieldAdminForm(forms.ModelForm):
 
         return cleaned_data
 
-    def save(self, commit=True):
-        """
-        Update content block fields based on this template field.
-        """
-        template_field = super().save(commit=False)
-
-        created = False if template_field.pk else True
-
-        # Find existing content blocks using this field
-        content_blocks = ContentBlock.objects.filter(
-            content_block_template=template_field.content_block_template
-        )
-        create_content_block_fields = created and content_blocks.exists()
-
-        if commit or create_content_block_fields:
-            template_field.save()
-            self.save_m2m()
-
-        if create_content_block_fields:
-            # Create a new field for existing content blocks
-            for content_block in content_blocks:
-                ContentBlockField.objects.create(
-                    template_field=template_field,
-                    content_block=content_block,
-                    field_type=template_field.field_type,
-                )
-
-        return template_field
-
 
 class ContentBlockTemplateImportForm(forms.Form):
     fixture_file = forms.FileField(
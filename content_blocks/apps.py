@@ -13,4 +13,15 @@ class ContentBlocksConfig(AppConfig):
         from content_blocks.signals import (  # noqa
             cleanup_media_delete,
             cleanup_media_save,
+            collection_cache_pre_save,
+            collection_cache_save_delete,
+            connect_model_choice_invalidation,
+            forget_model_choice_models,
+            forget_template_plans,
+            invalidate_model_choice,
+            render_cache_request_finished,
+            render_cache_request_started,
+            touch_render_cache,
         )
+
+        connect_model_choice_invalidation()
@@ -0,0 +1,618 @@
+"""
+Content Blocks cache.py
+Render cache for published content blocks.  See CONTENT_BLOCKS_RENDER_CACHE.
+"""
+import contextlib
+import hashlib
+import logging
+import math
+import random
+import sys
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+from typing import NamedTuple, Optional, Union
+
+from asgiref.local import Local
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.dispatch import Signal
+
+from content_blocks.conf import settings
+from content_blocks.models import ContentBlock
+
+try:
+    import lzma
+except ImportError:  # pragma: no cover
+    lzma = None
+
+# Context variable set when rendering a content block.  Nested content blocks are only cached when rendered inside a
+# cached content block, as they are never drafts themselves.
+RENDER_CACHE_CONTEXT_NAME = "content_blocks_render_cache"
+
+NOT_SET = object()
+
+logger = logging.getLogger(__name__)
+
+# Sent each time the render cache serves a content block.  Connect to this to record metrics.
+# Events are "hit", "miss", "early_refresh", "stale", "stale_error", "lock_wait" and "lock_timeout".
+render_cache_event = Signal()
+
+
+# Compression codecs for CONTENT_BLOCKS_RENDER_CACHE_COMPRESS.  Name: (compress, decompress).
+CODECS = {"zlib": (zlib.compress, zlib.decompress)}
+if lzma is not None:
+    CODECS["lzma"] = (lzma.compress, lzma.decompress)
+
+
+def compress(html, codec=NOT_SET, min_size=NOT_SET):
+    """
+    Compress html if it is at least min_size bytes.
+    :param codec: Name of the codec, defaults to CONTENT_BLOCKS_RENDER_CACHE_COMPRESS.  lzma falls back to zlib when
+    it isn't available.
+    :param min_size: Defaults to CONTENT_BLOCKS_RENDER_CACHE_COMPRESS_MIN_SIZE.
+    :return: (html or compressed bytes, codec name or None) tuple.
+    :raises ImproperlyConfigured: If the codec is unknown.
+    """
+    if codec is NOT_SET:
+        codec = settings.CONTENT_BLOCKS_RENDER_CACHE_COMPRESS
+    if min_size is NOT_SET:
+        min_size = settings.CONTENT_BLOCKS_RENDER_CACHE_COMPRESS_MIN_SIZE
+
+    if not codec:
+        return html, None
+
+    if codec == "lzma" and lzma is None:  # pragma: no cover
+        codec = "zlib"
+    elif codec not in CODECS:
+        raise ImproperlyConfigured(
+            f"Unknown CONTENT_BLOCKS_RENDER_CACHE_COMPRESS codec {codec!r}."
+        )
+
+    data = html.encode()
+    if len(data) < min_size:
+        return html, None
+
+    return CODECS[codec][0](data), codec
+
+
+def decompress(value, codec):
+    """
+    :return: html from the value returned by compress.
+    """
+    if codec is None:
+        return value
+    return CODECS[codec][1](value).decode()
+
+
+class CachedHtml(NamedTuple):
+    """
+    Rendered html stored in the cache with the codec it is compressed with, the version it was rendered for, when it
+    expires and how long it took to render in seconds.
+    """
+
+    html: Union[str, bytes]
+    codec: Optional[str]
+    version: int
+    expires: Optional[float]
+    delta: float
+
+    @property
+    def text(self):
+        return decompress(self.html, self.codec)
+
+
+class LocalCache:
+    """
+    Memory bounded LRU cache for this process.
+    Size is measured with sys.getsizeof so the bound is approximate.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data = OrderedDict()
+        self.size = 0
+        self.generation = None
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        values = {}
+
+        with self.lock:
+            for key in keys:
+                item = self.data.get(key)
+                if item is None:
+                    continue
+
+                value, expires, size = item
+                if expires is not None and expires <= now:
+                    del self.data[key]
+                    self.size -= size
+                    continue
+
+                self.data.move_to_end(key)
+                values[key] = value
+
+        return values
+
+    def set_many(self, mapping, timeout=None):
+        max_size = settings.CONTENT_BLOCKS_RENDER_CACHE_LOCAL_MAX_SIZE
+        expires = None if timeout is None else time.monotonic() + timeout
+
+        with self.lock:
+            for key, value in mapping.items():
+                size = sys.getsizeof(value)
+                if size > max_size:
+                    continue
+
+                old = self.data.pop(key, None)
+                if old is not None:
+                    self.size -= old[2]
+
+                self.data[key] = (value, expires, size)
+                self.size += size
+
+            while self.size > max_size:
+                key, (value, expires, size) = self.data.popitem(last=False)
+                self.size -= size
+
+    def delete_many(self, keys):
+        with self.lock:
+            for key in keys:
+                item = self.data.pop(key, None)
+                if item is not None:
+                    self.size -= item[2]
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+            self.size = 0
+
+
+class RenderCache:
+    """
+    Russian doll cache for rendered content blocks.
+    Each content block is cached as a separate fragment, including nested content blocks, so the html of a content
+    block with a NestedField is composed from cached fragments of its nested content blocks.
+    Html is cached with the version of the content block it was rendered for.  Saving a content block bumps the
+    version of the content block and of each content block above it, so only the path from the changed content block
+    to the root is rendered again.
+    Only one process renders the html for a content block at a time.  Html may be refreshed early, before it expires,
+    and stale html may be served while it is rendered again or if rendering fails.  See fetch.
+
+    Optionally an in process LRU cache is used in front of the shared cache, see CONTENT_BLOCKS_RENDER_CACHE_LOCAL.
+    Bumping a version also bumps a generation in the shared cache.  Each process checks the generation at most once
+    per request and clears its LRU cache when it has changed.
+    """
+
+    key_prefix = "content_blocks"
+
+    def __init__(self):
+        self.local_cache = LocalCache()
+        self.request_state = Local()
+        self.stats = Counter()
+        self.stats_lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[settings.CONTENT_BLOCKS_RENDER_CACHE_ALIAS]
+
+    @property
+    def generation_key(self):
+        return f"{self.key_prefix}:generation"
+
+    @staticmethod
+    def ident(content_block_id, fingerprint):
+        """
+        Content blocks are identified by fingerprint so unchanged content blocks share fragments across publishes.
+        """
+        return fingerprint or f"id-{content_block_id}"
+
+    def version_key(self, ident):
+        return f"{self.key_prefix}:version:{ident}"
+
+    def version(self, content_block):
+        """
+        :return: The current version of the content block.  A new version is started if there is none in the cache.
+        """
+        return self.lookup([content_block], {})[content_block.id][1]
+
+    @staticmethod
+    def vary(context):
+        """
+        :return: Hash of the context variables in CONTENT_BLOCKS_RENDER_CACHE_VARY_ON.
+        """
+        values = []
+        for name in settings.CONTENT_BLOCKS_RENDER_CACHE_VARY_ON:
+            value = context.get(name)
+            values.append(str(getattr(value, "pk", value)))
+        return hashlib.md5("|".join(values).encode()).hexdigest()
+
+    def render_key(self, ident, vary):
+        return f"{self.key_prefix}:render:{ident}:{vary}"
+
+    def collection_key(self, slug):
+        return f"{self.key_prefix}:collection:{slug}"
+
+    def collection_memo_key(self, slug, context, extra_context):
+        """
+        Key for the html of a content block collection memoized during a request.
+        """
+        extra = hashlib.md5(
+            "|".join(
+                f"{name}={getattr(value, 'pk', value)}"
+                for name, value in sorted(extra_context.items())
+            ).encode()
+        ).hexdigest()
+        return f"{slug}:{self.vary(context)}:{extra}"
+
+    def collection_render_key(self, memo_key, collection_id, publish_generation):
+        """
+        Key for the html of a content block collection.  The publish generation is part of the key so the html is
+        rendered again whenever the collection is published.
+        """
+        return f"{self.key_prefix}:collection-render:{memo_key}:{collection_id}:{publish_generation}"
+
+    def delete(self, key):
+        """
+        Delete the key from the shared cache and the LRU cache.  The generation is bumped so other processes clear
+        their LRU caches.
+        """
+        self.cache.delete(key)
+        self.local_cache.delete_many([key])
+        self.bump_generation()
+
+    def delete_collection(self, slug):
+        """
+        Forget the collection id and publish generation cached for the slug.
+        """
+        self.delete(self.collection_key(slug))
+
+    def template_fields_key(self, content_block_template_id):
+        """
+        Key for the version of the template fields of a content block template, see TemplateAnalysisServices.
+        """
+        return f"{self.key_prefix}:template-fields:{content_block_template_id}"
+
+    @property
+    def model_choice_key(self):
+        return f"{self.key_prefix}:model-choice-models"
+
+    def lookup(self, content_blocks, context):
+        """
+        Fetch the version and cached html of each content block in one round trip.  Versions missing from the cache
+        are then started, see below.
+        :return: Dict of content block id to (key, version, CachedHtml or None) tuple.
+        """
+        vary = self.vary(context)
+        keys = {}
+        for content_block in content_blocks:
+            ident = self.ident(content_block.id, content_block.fingerprint)
+            keys[content_block.id] = (
+                self.version_key(ident),
+                self.render_key(ident, vary),
+            )
+
+        values = self.get_many(
+            [
+                key
+                for version_and_render_keys in keys.values()
+                for key in version_and_render_keys
+            ]
+        )
+
+        missing = {
+            version_key: time.time_ns()
+            for version_key, render_key in keys.values()
+            if version_key not in values
+        }
+        if missing:
+            # Versions are started from the time so a version lost from the cache is never reused.  add doesn't
+            # replace a version another process started first, the versions are read back to use the one which won.
+            for version_key, version in missing.items():
+                self.cache.add(version_key, version, timeout=None)
+            values.update(self.cache.get_many(list(missing)))
+            for version_key, version in missing.items():
+                values.setdefault(version_key, version)
+
+        return {
+            content_block_id: (render_key, values[version_key], values.get(render_key))
+            for content_block_id, (version_key, render_key) in keys.items()
+        }
+
+    @staticmethod
+    def can_cache(content_block, context):
+        """
+        Only published content blocks are cached and never when the cache_timeout context variable is 0.
+        """
+        if not settings.CONTENT_BLOCKS_RENDER_CACHE:
+            return False
+
+        if context.get("cache_timeout", NOT_SET) == 0:
+            return False
+
+        if content_block.parent_id is None:
+            return not content_block.draft
+
+        return bool(context.get(RENDER_CACHE_CONTEXT_NAME))
+
+    @staticmethod
+    def timeout(context):
+        """
+        :return: The cache_timeout context variable if set, otherwise CONTENT_BLOCKS_RENDER_CACHE_TIMEOUT.
+        """
+        timeout = context.get("cache_timeout", NOT_SET)
+        if timeout is NOT_SET:
+            return settings.CONTENT_BLOCKS_RENDER_CACHE_TIMEOUT
+        return timeout
+
+    def request_started(self):
+        """
+        Called at the start of each request so the generation is checked again.
+        """
+        self.request_state.polled = False
+        self.request_state.memo = {}
+
+    def request_finished(self):
+        """
+        Called at the end of each request so html memoized during the request is not used outside of it.
+        """
+        self.request_state.memo = None
+
+    @property
+    def memo(self):
+        """
+        :return: Dict of html memoized during the current request or None outside of a request.
+        """
+        return getattr(self.request_state, "memo", None)
+
+    def poll(self):
+        """
+        Clear the LRU cache if the generation has changed.  Done at most once per request.  Outside of a request the
+        generation is checked every time.
+        """
+        if getattr(self.request_state, "polled", False):
+            return
+
+        generation = self.cache.get(self.generation_key)
+        if generation != self.local_cache.generation:
+            self.local_cache.clear()
+            self.local_cache.generation = generation
+
+        if hasattr(self.request_state, "polled"):
+            self.request_state.polled = True
+
+    def get_many(self, keys):
+        """
+        Get values from the LRU cache then fetch any misses from the shared cache in one round trip.
+        :return: Dict of key to value for the keys found.
+        """
+        keys = list(keys)
+
+        if not settings.CONTENT_BLOCKS_RENDER_CACHE_LOCAL:
+            return self.cache.get_many(keys)
+
+        self.poll()
+        values = self.local_cache.get_many(keys)
+        missing = [key for key in keys if key not in values]
+
+        if missing:
+            found = self.cache.get_many(missing)
+            # The time left in the shared cache isn't known, so keep the values for at most the full timeout.
+            self.local_cache.set_many(
+                found, timeout=settings.CONTENT_BLOCKS_RENDER_CACHE_TIMEOUT
+            )
+            values.update(found)
+
+        return values
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def set_many(self, mapping, timeout=None):
+        self.cache.set_many(mapping, timeout=timeout)
+        if settings.CONTENT_BLOCKS_RENDER_CACHE_LOCAL:
+            self.local_cache.set_many(mapping, timeout=timeout)
+
+    def set(self, key, value, timeout=None):
+        self.set_many({key: value}, timeout=timeout)
+
+    def record(self, event):
+        with self.stats_lock:
+            self.stats[event] += 1
+        render_cache_event.send(sender=self.__class__, event=event)
+
+    @staticmethod
+    def refresh_early(cached_html, now):
+        """
+        Probabilistic early refresh.  The chance of refreshing grows as the expiry approaches and with the time taken
+        to render, so one request usually refreshes the html before it expires for everyone.
+        """
+        beta = settings.CONTENT_BLOCKS_RENDER_CACHE_EARLY_REFRESH
+        if not beta or cached_html.expires is None:
+            return False
+        return (
+            now - cached_html.delta * beta * math.log(1 - random.random())
+            >= cached_html.expires
+        )
+
+    def lock_key(self, key):
+        return f"{key}:lock"
+
+    def wait(self, key, version):
+        """
+        Wait for another process to render the html.
+        :return: The html or None if it wasn't rendered within CONTENT_BLOCKS_RENDER_CACHE_LOCK_WAIT seconds.
+        """
+        deadline = time.monotonic() + settings.CONTENT_BLOCKS_RENDER_CACHE_LOCK_WAIT
+
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            cached_html = self.cache.get(key)
+            if cached_html is not None and cached_html.version == version:
+                return cached_html.text
+            if self.cache.get(self.lock_key(key)) is None:
+                return None
+
+        return None
+
+    def fetch(self, key, version, cached_html, render, timeout=None):
+        """
+        Get html from the cache or render it.  Only one process renders the html for a key at a time, others serve
+        stale html if allowed or wait for the html to be rendered.
+        :param cached_html: CachedHtml from lookup or None.
+        :param render: Callable which returns the html.
+        :param timeout: Timeout in seconds or None to cache indefinitely.
+        :return: The html.
+        """
+        now = time.time()
+        fresh = (
+            cached_html is not None
+            and cached_html.version == version
+            and (cached_html.expires is None or now < cached_html.expires)
+        )
+
+        if fresh and not self.refresh_early(cached_html, now):
+            self.record("hit")
+            return cached_html.text
+
+        stale_timeout = settings.CONTENT_BLOCKS_RENDER_CACHE_STALE_TIMEOUT
+        can_serve_stale = cached_html is not None and (
+            fresh
+            or stale_timeout
+            and (
+                cached_html.expires is None or now < cached_html.expires + stale_timeout
+            )
+        )
+        lock_key = self.lock_key(key)
+        locked = self.cache.add(
+            lock_key, 1, timeout=settings.CONTENT_BLOCKS_RENDER_CACHE_LOCK_TIMEOUT
+        )
+
+        if not locked:
+            if can_serve_stale:
+                self.record("hit" if fresh else "stale")
+                return cached_html.text
+
+            html = self.wait(key, version)
+            if html is not None:
+                self.record("lock_wait")
+                return html
+
+            self.record("lock_timeout")
+
+        try:
+            start = time.monotonic()
+            try:
+                html = render()
+            except Exception:
+                if not can_serve_stale:
+                    raise
+                logger.exception(f"Could not render {key}, serving stale html.")
+                self.record("stale_error")
+                return cached_html.text
+
+            delta = time.monotonic() - start
+            expires = None if timeout is None else time.time() + timeout
+            self.set(
+                key,
+                CachedHtml(*compress(html), version, expires, delta),
+                timeout=None if timeout is None else timeout + stale_timeout,
+            )
+        finally:
+            if locked:
+                self.cache.delete(lock_key)
+
+        self.record("early_refresh" if fresh else "miss")
+        return html
+
+    def bump_generation(self):
+        try:
+            self.cache.incr(self.generation_key)
+        except ValueError:
+            self.cache.add(self.generation_key, time.time_ns(), timeout=None)
+
+    def touch(self, content_block):
+        """
+        Bump the version of the content block and of the content blocks above it.
+        Nothing is bumped for nested content blocks of drafts.
+        """
+        idents = [self.ident(content_block.id, content_block.fingerprint)]
+        draft = content_block.draft
+
+        # Stops at the first parent which has been deleted.
+        for content_block_id, fingerprint, draft in ContentBlock.objects.ancestors(
+            content_block, "fingerprint", "draft"
+        ):
+            idents.append(self.ident(content_block_id, fingerprint))
+
+        if draft:
+            return
+
+        version_keys = [self.version_key(ident) for ident in idents]
+        self.cache.delete_many(version_keys)
+        self.local_cache.delete_many(version_keys)
+        self.bump_generation()
+
+    @contextlib.contextmanager
+    def untouched(self):
+        """
+        Don't touch content blocks saved or deleted inside the block, see touch_render_cache.  Used when publishing:
+        each published content block is a clone with the same fingerprint, and so the same cache key, as the content
+        block it replaces so unchanged content blocks stay cached.  Changed content blocks have new fingerprints.
+        """
+        untouched = getattr(self.request_state, "untouched", False)
+        self.request_state.untouched = True
+        try:
+            yield
+        finally:
+            self.request_state.untouched = untouched
+
+    @property
+    def touches_skipped(self):
+        """
+        :return: True inside untouched.
+        """
+        return getattr(self.request_state, "untouched", False)
+
+    def touch_on_commit(self, content_block_id, content_block=None):
+        """
+        Touch the content block once the current transaction commits.  A content block saved many times in a
+        transaction, e.g. once for each of its fields, is touched once.
+        :param content_block: The deleted content block, otherwise it is fetched when touched.
+        """
+        pending = getattr(self.request_state, "pending_touches", None)
+        if pending is None:
+            pending = self.request_state.pending_touches = {}
+        if content_block is not None or content_block_id not in pending:
+            pending[content_block_id] = content_block
+        # Callbacks after the first find nothing pending.  Content blocks pending from a rolled back transaction are
+        # touched with the next commit.
+        transaction.on_commit(self.touch_pending)
+
+    def touch_pending(self):
+        """
+        Touch the content blocks waiting for a commit, see touch_on_commit.
+        """
+        pending = getattr(self.request_state, "pending_touches", None)
+        if not pending:
+            return
+        self.request_state.pending_touches = {}
+
+        content_blocks = ContentBlock.objects.in_bulk(
+            [
+                content_block_id
+                for content_block_id, content_block in pending.items()
+                if content_block is None
+            ]
+        )
+        for content_block_id, content_block in pending.items():
+            # Content blocks deleted along with their fields aren't found.
+            content_block = content_block or content_blocks.get(content_block_id)
+            if content_block is not None:
+                self.touch(content_block)
+
+
+render_cache = RenderCache()
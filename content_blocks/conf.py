@@ -20,6 +20,10 @@ class ContentBlocksSettings:
         "django.core.files.storage.FileSystemStorage",
     )
 
+    # Save image, file and video uploads with a name derived from a hash of their content.
+    # Identical uploads are stored once.
+    CONTENT_BLOCKS_CONTENT_HASH_UPLOADS = False
+
     # Set the default status message.  Can be a callable.
     CONTENT_BLOCKS_DEFAULT_STATUS_MESSAGE = ""
 
@@ -35,6 +39,105 @@ class ContentBlocksSettings:
     # Set the cache_timeout when pre rendering
     CONTENT_BLOCKS_PRE_RENDER_CACHE_TIMEOUT = None
 
+    # Cache the rendered html of published content blocks.  Nested content blocks are cached separately.
+    CONTENT_BLOCKS_RENDER_CACHE = False
+    # The cache used by the render cache.
+    CONTENT_BLOCKS_RENDER_CACHE_ALIAS = "default"
+    # Timeout in seconds used when the context has no cache_timeout variable.  None to cache indefinitely.
+    CONTENT_BLOCKS_RENDER_CACHE_TIMEOUT = None
+    # Context variables which change the rendered html e.g. site when rendering for more than one site.
+    CONTENT_BLOCKS_RENDER_CACHE_VARY_ON = ["site"]
+    # Seconds html may be served after it expires while it is rendered again or if rendering fails.  0 to disable.
+    CONTENT_BLOCKS_RENDER_CACHE_STALE_TIMEOUT = 0
+    # Refresh html early with a probability which increases as it nears expiry.  Higher values refresh earlier, 0 to
+    # disable.
+    CONTENT_BLOCKS_RENDER_CACHE_EARLY_REFRESH = 1.0
+    # Seconds a process may hold the lock for rendering html before another process may render it.
+    CONTENT_BLOCKS_RENDER_CACHE_LOCK_TIMEOUT = 10
+    # Seconds to wait for another process to render html when there is no stale html to serve.
+    CONTENT_BLOCKS_RENDER_CACHE_LOCK_WAIT = 2
+    # Compress cached html with "zlib" or "lzma".  None to disable.
+    CONTENT_BLOCKS_RENDER_CACHE_COMPRESS = None
+    # Only compress html of at least this many bytes.
+    CONTENT_BLOCKS_RENDER_CACHE_COMPRESS_MIN_SIZE = 16 * 1024
+    # Keep recently used cache values in memory in each process, in front of the shared cache.
+    CONTENT_BLOCKS_RENDER_CACHE_LOCAL = False
+    # Approximate max size in bytes of the in memory cache of each process.
+    CONTENT_BLOCKS_RENDER_CACHE_LOCAL_MAX_SIZE = 32 * 1024 * 1024
+
+    # Cache the slug lookup and rendered html of content_block_collection template tags.  Html is rendered at most
+    # once per request for each collection.  Uses the render cache alias and timeout.
+    CONTENT_BLOCKS_COLLECTION_CACHE = False
+
+    # Invalidate the render cache, collection cache and publish generation of published content blocks when an object
+    # chosen in one of their model choice fields is saved or deleted.
+    CONTENT_BLOCKS_MODEL_CHOICE_INVALIDATION = True
+    # Labels of the models which can be chosen in model choice fields, e.g. ["shop.Product"].  When set invalidation is
+    # only connected to the post_save and post_delete signals of these models.  When None any model can be chosen and
+    # saving an object of any model checks whether it can be chosen, see ModelChoiceServices.model_labels.
+    CONTENT_BLOCKS_MODEL_CHOICES = None
+    # Options for fetching objects chosen in model choice fields when rendering, keyed by "app_label.model_name".
+    # e.g. {"shop.product": {"select_related": ["brand"], "prefetch_related": ["images"]}}
+    CONTENT_BLOCKS_MODEL_CHOICE_QUERYSETS = {}
+
+    # Copy the fields of published content blocks to a small read only table on publish and render published content
+    # blocks from it.  Content blocks published before this is enabled are rendered from their fields until they are
+    # published again.
+    CONTENT_BLOCKS_PUBLISHED_FIELDS = False
+
+    # Database alias, e.g. of a read replica, which public content block queries are read from: visible(), collection
+    # lookups and rendering.  Nested content blocks are read from the database of the content block they are nested
+    # in.  The editor, publishing and cleanup use the default database.  Add
+    # "content_blocks.routers.ReadDatabaseRouter" to DATABASE_ROUTERS and
+    # "content_blocks.middleware.ReadDatabaseMiddleware" to MIDDLEWARE when set.
+    CONTENT_BLOCKS_READ_DATABASE = None
+    # Seconds a browser reads from the default database after publishing so its changes are shown straight away.
+    CONTENT_BLOCKS_READ_DATABASE_STICKY_TIMEOUT = 30
+
+    # Upload files and videos from the content block editor in chunks ahead of saving the content block.
+    CONTENT_BLOCKS_CHUNKED_UPLOADS = True
+    # Size of each chunk in bytes.
+    CONTENT_BLOCKS_CHUNKED_UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024
+    # Max size of a chunked upload in bytes. None for no limit.
+    CONTENT_BLOCKS_CHUNKED_UPLOAD_MAX_SIZE = None
+    # Directory where chunks are assembled, it must be shared by all workers. Defaults to the temp dir.
+    CONTENT_BLOCKS_CHUNKED_UPLOAD_DIR = None
+    # Incomplete or unused chunked uploads are deleted after this many seconds.
+    CONTENT_BLOCKS_CHUNKED_UPLOAD_EXPIRY = 24 * 60 * 60
+
+    # Process image uploads.  Images larger than the max dimensions are downscaled, images are re-encoded at the
+    # upload quality and EXIF data is stripped.  Set max dimensions to None to keep the original size.
+    CONTENT_BLOCKS_PROCESS_IMAGE_UPLOADS = False
+    CONTENT_BLOCKS_IMAGE_UPLOAD_MAX_DIMENSIONS = (2560, 2560)
+    CONTENT_BLOCKS_IMAGE_UPLOAD_QUALITY = 85
+    CONTENT_BLOCKS_IMAGE_UPLOAD_STRIP_EXIF = True
+    # Remove comments, metadata and whitespace between tags from SVG uploads.
+    CONTENT_BLOCKS_MINIFY_SVG_UPLOADS = False
+
+    # Named image rendition specs. Each spec has a list of widths and an optional format e.g. "WEBP".
+    # When format is None the format of the original image is used.
+    CONTENT_BLOCKS_IMAGE_RENDITIONS = {
+        "thumbnail": {"widths": [320], "format": "WEBP"},
+        "default": {"widths": [480, 960, 1440, 1920], "format": "WEBP"},
+    }
+    # Generate image renditions on publish.
+    CONTENT_BLOCKS_GENERATE_RENDITIONS = True
+    # Encoder quality used for lossy rendition formats.
+    CONTENT_BLOCKS_RENDITION_QUALITY = 80
+    # Max number of workers used to generate renditions.
+    CONTENT_BLOCKS_RENDITION_WORKERS = 4
+    # Pool used to resize and encode renditions. "thread" or "process".
+    CONTENT_BLOCKS_RENDITION_EXECUTOR = "thread"
+    # Seconds before renditions which could not be generated when rendering are tried again.
+    CONTENT_BLOCKS_RENDITION_FAILURE_TIMEOUT = 300
+
+    # Delete the content block fields of deleted content block template fields after the template field is deleted,
+    # in the same request.  When True they are left for the delete_content_block_template_fields management command,
+    # which must be run regularly e.g. from cron.  The fields are hidden until they are deleted.
+    CONTENT_BLOCKS_DEFER_TEMPLATE_FIELD_DELETION = False
+    # Number of content block fields deleted in each transaction.
+    CONTENT_BLOCKS_TEMPLATE_FIELD_DELETION_CHUNK_SIZE = 500
+
     def __getattribute__(self, name):
         try:
             return getattr(django_settings, name)
@@ -0,0 +1,49 @@
+"""
+Content Blocks decorators.py
+"""
+from functools import wraps
+
+from django.views.decorators.http import condition
+
+from content_blocks.models import ContentBlockCollection
+from content_blocks.services.content_block import ValidatorServices
+
+
+def content_blocks_condition(get_parent, collections=()):
+    """
+    Conditional GET for views rendering the published content blocks of a ContentBlockParentModel.
+    ETag and Last-Modified are set on responses and requests with a matching If-None-Match or If-Modified-Since
+    get a 304 response.  The validators change when content blocks are published, hidden, shown or deleted and when
+    objects chosen in model choice fields are modified.
+    The parent is set as request.content_blocks_parent so the view doesn't need to fetch it again.
+
+    :param get_parent: Callable taking the view arguments which returns the parent object. Return None to skip
+        conditional processing e.g. for previews.
+    :param collections: Slugs of the content block collections also rendered by the view, e.g. by its base template.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            parent = request.content_blocks_parent = get_parent(
+                request, *args, **kwargs
+            )
+            if parent is None:
+                return view(request, *args, **kwargs)
+
+            etag, last_modified = ValidatorServices.combined_validators(
+                [
+                    parent,
+                    *ContentBlockCollection.objects.filter(
+                        slug__in=collections
+                    ).order_by("slug"),
+                ]
+            )
+            return condition(
+                etag_func=lambda *a, **kw: etag,
+                last_modified_func=lambda *a, **kw: last_modified,
+            )(view)(request, *args, **kwargs)
+
+        return inner
+
+    return decorator
@@ -1,14 +1,34 @@
+import hashlib
+import logging
+import posixpath
+import re
+import tempfile
 import xml.etree.ElementTree as et
 from pathlib import Path
 
 from django import forms
 from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile, File
 from django.core.validators import (
     FileExtensionValidator,
     get_available_image_extensions,
 )
 from django.db import models
-from django.db.models.fields.files import FieldFile
+from django.db.models.fields.files import FieldFile, ImageFieldFile
+from PIL import Image, ImageOps
+
+from content_blocks.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Formats we re-encode.  Other formats (e.g. animated GIF) are stored as uploaded.
+PROCESS_IMAGE_FORMATS = ["JPEG", "PNG", "WEBP"]
+
+SVG_MINIFY_PATTERNS = [
+    (re.compile(r"<!--.*?-->", re.DOTALL), ""),
+    (re.compile(r"<metadata\b.*?</metadata>", re.DOTALL), ""),
+    (re.compile(r">\s+<"), "><"),
+]
 
 
 def validate_svg(f):
@@ -29,6 +49,110 @@ def validate_svg(f):
     return f
 
 
+def minify_svg(f):
+    """
+    Remove comments, metadata and whitespace between tags from an SVG file.
+    :return: Tuple of the minified file and the number of bytes saved.
+    """
+    f.seek(0)
+    original = f.read()
+    svg = original.decode("utf-8") if isinstance(original, bytes) else original
+
+    for pattern, replacement in SVG_MINIFY_PATTERNS:
+        svg = pattern.sub(replacement, svg)
+
+    minified = svg.strip().encode("utf-8")
+    return ContentFile(minified, name=f.name), len(original) - len(minified)
+
+
+def process_image(f):
+    """
+    Downscale an image to fit CONTENT_BLOCKS_IMAGE_UPLOAD_MAX_DIMENSIONS, re-encode it at
+    CONTENT_BLOCKS_IMAGE_UPLOAD_QUALITY and strip EXIF data.
+    JPEG images are decoded at a reduced scale via Image.draft and other formats are reduced before resampling so
+    memory use is bounded by the target size rather than the original size.  The processed image is written to a
+    spooled temporary file.
+    :return: Tuple of the processed file and the number of bytes saved.  The original file is returned if processing
+    would not make it smaller, unless EXIF data is stripped from it, or the image can't be processed.
+    """
+    max_dimensions = settings.CONTENT_BLOCKS_IMAGE_UPLOAD_MAX_DIMENSIONS
+    original_size = f.size
+    f.seek(0)
+
+    with Image.open(f) as image:
+        image_format = image.format
+        if image_format not in PROCESS_IMAGE_FORMATS or getattr(
+            image, "is_animated", False
+        ):
+            f.seek(0)
+            return f, 0
+
+        icc_profile = image.info.get("icc_profile")
+        exif = image.getexif()
+
+        resized = False
+        if max_dimensions and (
+            image.width > max_dimensions[0] or image.height > max_dimensions[1]
+        ):
+            image.draft(image.mode, max_dimensions)
+            image.thumbnail(max_dimensions, Image.LANCZOS, reducing_gap=3.0)
+            resized = True
+
+        stripped = False
+        if settings.CONTENT_BLOCKS_IMAGE_UPLOAD_STRIP_EXIF:
+            image = ImageOps.exif_transpose(image)
+            stripped = bool(exif)
+            exif = None
+
+        save_kwargs = {"quality": settings.CONTENT_BLOCKS_IMAGE_UPLOAD_QUALITY}
+        if icc_profile:
+            save_kwargs["icc_profile"] = icc_profile
+        if exif:
+            save_kwargs["exif"] = exif
+        if image_format == "PNG":
+            save_kwargs["optimize"] = True
+
+        processed = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        image.save(processed, format=image_format, **save_kwargs)
+
+    processed_size = processed.tell()
+    if not resized and not stripped and processed_size >= original_size:
+        processed.close()
+        f.seek(0)
+        return f, 0
+
+    processed.seek(0)
+    # The processed image may be larger if only its EXIF data was stripped.
+    return File(processed, name=f.name), max(original_size - processed_size, 0)
+
+
+def process_upload(f):
+    """
+    Upload processing stage for image uploads, as configured in settings.
+    :param f: The uploaded File.
+    :return: Tuple of the file to save and the number of bytes saved.
+    """
+    bytes_saved = 0
+
+    if Path(f.name).suffix.lower() == ".svg":
+        if settings.CONTENT_BLOCKS_MINIFY_SVG_UPLOADS:
+            f, bytes_saved = minify_svg(f)
+    elif settings.CONTENT_BLOCKS_PROCESS_IMAGE_UPLOADS:
+        try:
+            f, bytes_saved = process_image(f)
+        except (OSError, Image.DecompressionBombError):
+            logger.exception(f"Could not process image upload {f.name}.")
+
+    f.seek(0)
+
+    if bytes_saved:
+        logger.info(f"Processed image upload {f.name}, saved {bytes_saved} bytes.")
+
+    return f, bytes_saved
+
+
 class SVGAndImageFieldFormField(forms.ImageField):
     default_validators = [
         FileExtensionValidator(
@@ -45,14 +169,72 @@ class SVGAndImageFieldFormField(forms.ImageField):
         return f
 
 
+def content_hash(f):
+    """
+    :return: sha256 hex digest of the file content, read in chunks.
+    """
+    hasher = hashlib.sha256()
+    for chunk in f.chunks():
+        hasher.update(chunk)
+    f.seek(0)
+    return hasher.hexdigest()
+
+
+def content_hash_name(directory, name, digest):
+    """
+    :return: The content addressed name for a file e.g. content-blocks/images/ab/ab12...ef.jpg
+    """
+    extension = Path(name).suffix.lower()
+    return posixpath.join(directory, digest[:2], f"{digest}{extension}")
+
+
+class ContentHashFieldFileMixin:
+    """
+    When CONTENT_BLOCKS_CONTENT_HASH_UPLOADS is True files are saved with a name derived from a hash of their content,
+    in the upload_to directory.  Identical files map to one stored object and the storage write is skipped if the
+    object already exists.
+    """
+
+    def save(self, name, content, save=True):
+        if not settings.CONTENT_BLOCKS_CONTENT_HASH_UPLOADS:
+            return super().save(name, content, save=save)
+
+        directory = posixpath.dirname(self.field.generate_filename(self.instance, name))
+        name = content_hash_name(directory, name, content_hash(content))
+
+        if not self.storage.exists(name):
+            name = self.storage.save(name, content, max_length=self.field.max_length)
+
+        self.name = name
+        setattr(self.instance, self.field.attname, self.name)
+        self._committed = True
+
+        if save:
+            self.instance.save()
+
+
+class ContentHashFieldFile(ContentHashFieldFileMixin, FieldFile):
+    pass
+
+
+class ContentHashFileField(models.FileField):
+    attr_class = ContentHashFieldFile
+
+
+class SVGAndImageFieldFile(ContentHashFieldFileMixin, ImageFieldFile):
+    pass
+
+
 class SVGAndImageField(models.ImageField):
+    attr_class = SVGAndImageFieldFile
+
     def formfield(self, **kwargs):
         defaults = {"form_class": SVGAndImageFieldFormField}
         defaults.update(kwargs)
         return super().formfield(**defaults)
 
 
-class FieldVideo(FieldFile):
+class FieldVideo(ContentHashFieldFileMixin, FieldFile):
     @property
     def file_extension(self):
         return Path(self.name).suffix[1:]
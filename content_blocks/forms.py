@@ -1,8 +1,11 @@
+import functools
+
 from django import forms
 from django.apps import apps
 from django.contrib.contenttypes.models import ContentType
 from django.db import transaction
 
+from content_blocks.cache import render_cache
 from content_blocks.conf import settings
 from content_blocks.models import (
     ContentBlock,
@@ -10,8 +13,18 @@ from content_blocks.models import (
     ContentBlockField,
     ContentBlockFields,
     ContentBlockTemplate,
+    ContentBlockTemplateField,
+)
+from content_blocks.routers import use_primary_database
+from content_blocks.services.content_block import (
+    CloneServices,
+    PublishedFieldsServices,
+    PublishGenerationServices,
+    RenderServices,
 )
-from content_blocks.services.content_block import CloneServices, RenderServices
+from content_blocks.services.image import RenditionServices
+from content_blocks.services.upload import ChunkedUploadFile, ChunkedUploadServices
+from content_blocks.widgets import ChunkedFileWidget
 
 if apps.is_installed("django.contrib.sites"):
     from django.contrib.sites.models import Site
@@ -129,7 +142,22 @@ class NewNestedBlockForm(NewContentBlockFormBase):
     """
 
     parent = forms.ModelChoiceField(
-        widget=forms.HiddenInput(), queryset=ContentBlockField.objects.all()
+        widget=forms.HiddenInput(),
+        queryset=ContentBlockField.objects.all(),
+        required=False,
+    )
+
+    # Identify virtual nested fields, which have no parent yet.  See ContentBlock.fields.
+    content_block = forms.ModelChoiceField(
+        widget=forms.HiddenInput(), queryset=ContentBlock.objects.all(), required=False
+    )
+
+    template_field = forms.ModelChoiceField(
+        widget=forms.HiddenInput(),
+        queryset=ContentBlockTemplateField.objects.filter(
+            field_type=ContentBlockFields.NESTED_FIELD
+        ),
+        required=False,
     )
 
     auto_id = False
@@ -142,13 +170,48 @@ class NewNestedBlockForm(NewContentBlockFormBase):
         except KeyError:
             return ContentBlockTemplate.objects.all()
 
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get("parent") is not None:
+            return cleaned_data
+
+        content_block = cleaned_data.get("content_block")
+        template_field = cleaned_data.get("template_field")
+        if (
+            content_block is None
+            or template_field is None
+            or template_field.content_block_template_id
+            != content_block.content_block_template_id
+        ):
+            raise forms.ValidationError("Select a nested field to add the block to.")
+        return cleaned_data
+
+    def get_parent(self):
+        """
+        :return: The nested field to add the block to.  Virtual nested fields are saved here.
+        """
+        if self.cleaned_data["parent"] is not None:
+            return self.cleaned_data["parent"]
+
+        template_field = self.cleaned_data["template_field"]
+        parent, created = ContentBlockField.objects.get_or_create(
+            content_block=self.cleaned_data["content_block"],
+            template_field=template_field,
+            defaults={
+                "field_type": template_field.field_type,
+                "model_choice_content_type": template_field.model_choice_content_type,
+            },
+        )
+        return parent
+
     def save(self):
         # todo call service class
-        return self.create_content_block(
-            self.cleaned_data["content_block_template"],
-            draft=False,
-            parent=self.cleaned_data["parent"],
-        )
+        with transaction.atomic():
+            return self.create_content_block(
+                self.cleaned_data["content_block_template"],
+                draft=False,
+                parent=self.get_parent(),
+            )
 
 
 class ContentBlockForm(forms.Form):
@@ -171,6 +234,7 @@ class ContentBlockForm(forms.Form):
 
     def __init__(self, *args, **kwargs):
         self.content_block = kwargs.pop("content_block")
+        self.user = kwargs.pop("user", None)
         kwargs["auto_id"] = f"id_%s_{self.content_block.id}"
         super().__init__(*args, **kwargs)
         self.set_fields()
@@ -181,6 +245,8 @@ class ContentBlockForm(forms.Form):
         for key, field in self.content_block.fields.items():
             form_field = field.form_field
             if form_field:
+                if isinstance(form_field.widget, ChunkedFileWidget):
+                    form_field.widget.user = self.user
                 self.fields[key] = form_field
 
     def save(self):
@@ -197,9 +263,55 @@ class ContentBlockForm(forms.Form):
 
             # We no longer manage the cache here as drafts and nested blocks are not cached.
 
+        # Chunked uploads have been saved to storage so the temporary files are no longer needed.
+        for value in self.cleaned_data.values():
+            if isinstance(value, ChunkedUploadFile):
+                value.close()
+                ChunkedUploadServices.delete(value.chunked_upload)
+
         return self.content_block
 
 
+class ChunkedUploadForm(forms.Form):
+    """
+    Form for receiving one chunk of a chunked upload.
+    Omit the token to start a new upload and omit the chunk to get the current offset of an upload.
+    """
+
+    token = forms.UUIDField(required=False)
+    filename = forms.CharField(max_length=255, required=False)
+    size = forms.IntegerField(min_value=0, required=False)
+    offset = forms.IntegerField(min_value=0, required=False)
+    chunk = forms.FileField(required=False, allow_empty_file=True)
+
+    def clean(self):
+        cleaned_data = super().clean()
+
+        if not cleaned_data.get("token") and (
+            not cleaned_data.get("filename") or cleaned_data.get("size") is None
+        ):
+            raise forms.ValidationError(
+                "A filename and size are required to start an upload."
+            )
+
+        return cleaned_data
+
+    def save(self, user=None):
+        token = self.cleaned_data["token"]
+
+        if not token:
+            token = ChunkedUploadServices.create(
+                self.cleaned_data["filename"], self.cleaned_data["size"], user=user
+            ).token
+
+        return ChunkedUploadServices.append(
+            token,
+            self.cleaned_data["offset"] or 0,
+            self.cleaned_data["chunk"],
+            user=user,
+        )
+
+
 class PublishContentBlocksForm(ParentModelForm):
     """
     Form for publishing content blocks.
@@ -208,7 +320,7 @@ class PublishContentBlocksForm(ParentModelForm):
 
     def save(self):
         # todo refactor to service class
-        with transaction.atomic():
+        with transaction.atomic(), render_cache.untouched():
             sites = (
                 list(Site.objects.all())
                 if apps.is_installed("django.contrib.sites")
@@ -216,16 +328,41 @@ class PublishContentBlocksForm(ParentModelForm):
             )
             self.parent.content_blocks.published().delete()
 
+            new_content_blocks = []
             for content_block in self.parent.content_blocks.drafts():
                 new_content_block = CloneServices.clone_content_block(
                     content_block, attrs={"draft": False}
                 )
                 self.parent.content_blocks.add(new_content_block)
+                new_content_blocks.append(new_content_block)
+
+            PublishGenerationServices.bump(self.parent)
 
-                if settings.CONTENT_BLOCKS_PRE_RENDER:
+            if settings.CONTENT_BLOCKS_PUBLISHED_FIELDS:
+                PublishedFieldsServices.store(new_content_blocks)
+
+            transaction.on_commit(
+                functools.partial(self.prepare, new_content_blocks, sites)
+            )
+
+    @staticmethod
+    def prepare(content_blocks, sites):
+        """
+        Generate renditions for and pre render the published content blocks.  Run once publishing is committed so
+        storage I/O isn't done while publishing holds its row locks.  Renditions are generated first so pre rendering
+        doesn't generate them one image at a time.
+        """
+        with use_primary_database():
+            if settings.CONTENT_BLOCKS_GENERATE_RENDITIONS:
+                RenditionServices.generate_many(
+                    RenditionServices.image_names(content_blocks)
+                )
+
+            if settings.CONTENT_BLOCKS_PRE_RENDER:
+                for content_block in content_blocks:
                     for site in sites:
                         RenderServices.render_content_block(
-                            new_content_block,
+                            content_block,
                             context={
                                 "cache_timeout": settings.CONTENT_BLOCKS_PRE_RENDER_CACHE_TIMEOUT,
                                 "site": site,
@@ -240,7 +377,7 @@ class ResetContentBlocksForm(ParentModelForm):
 
     def save(self):
         # todo refactor to service class
-        with transaction.atomic():
+        with transaction.atomic(), render_cache.untouched():
             self.parent.content_blocks.drafts().delete()
 
             for content_block in self.parent.content_blocks.published():
@@ -249,6 +386,8 @@ class ResetContentBlocksForm(ParentModelForm):
                 )
                 self.parent.content_blocks.add(new_content_block)
 
+            PublishGenerationServices.bump(self.parent)
+
 
 class ImportContentBlocksForm(ParentModelForm):
     """
@@ -272,3 +411,5 @@ class ImportContentBlocksForm(ParentModelForm):
             for content_block in self.cleaned_data["master"].content_blocks.drafts():
                 new_content_block = CloneServices.clone_content_block(content_block)
                 self.parent.content_blocks.add(new_content_block)
+
+            PublishGenerationServices.bump(self.parent)
@@ -0,0 +1,111 @@
+import secrets
+import time
+
+from django.core.management import BaseCommand
+
+from content_blocks.cache import CODECS, compress, decompress
+from content_blocks.models import ContentBlock
+from content_blocks.services.content_block import RenderServices
+
+SYNTHETIC_PARAGRAPH = (
+    "<p>Content blocks are rendered to html and cached. Large content blocks such as galleries and rich text can "
+    "be several hundred kilobytes each, for every site they are rendered for.</p>"
+)
+
+
+def synthetic_fragments():
+    """
+    :return: Fragments like those rendered by gallery and rich text content blocks.
+    """
+    gallery = "".join(
+        f'<figure class="gallery-item"><img src="/media/content-blocks/images/{name}.jpg" '
+        f'srcset="/media/content-blocks/renditions/default/{name}-480w.webp 480w, '
+        f"/media/content-blocks/renditions/default/{name}-960w.webp 960w, "
+        f'/media/content-blocks/renditions/default/{name}-1920w.webp 1920w" alt="Gallery image {i}" '
+        f'loading="lazy"><figcaption>Gallery image {i}</figcaption></figure>'
+        for i, name in enumerate(secrets.token_hex(32) for _ in range(200))
+    )
+    rich_text = SYNTHETIC_PARAGRAPH * 500
+    small = SYNTHETIC_PARAGRAPH * 4
+    return [f'<div class="gallery">{gallery}</div>', rich_text, small]
+
+
+class Command(BaseCommand):
+    """
+    Measure the CPU time and memory saved by compressing rendered content blocks in the render cache.
+    See CONTENT_BLOCKS_RENDER_CACHE_COMPRESS.
+    """
+
+    help = "Benchmark render cache compression codecs on rendered content blocks."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=100,
+            help="Max number of published content blocks to render.",
+        )
+        parser.add_argument(
+            "--synthetic",
+            action="store_true",
+            help="Use generated gallery and rich text fragments instead of published content blocks.",
+        )
+        parser.add_argument(
+            "--min-size",
+            type=int,
+            default=0,
+            help="Only compress fragments of at least this many bytes.",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=10,
+            help="Number of times to compress and decompress each fragment.",
+        )
+
+    def fragments(self, limit):
+        content_blocks = ContentBlock.objects.visible().filter(parent__isnull=True)[
+            :limit
+        ]
+        return [
+            html
+            for html in RenderServices.render_content_blocks(content_blocks)
+            if html
+        ]
+
+    def handle(self, *args, **options):
+        fragments = None if options["synthetic"] else self.fragments(options["limit"])
+        if not fragments:
+            self.stdout.write("Using synthetic fragments.")
+            fragments = synthetic_fragments()
+
+        original_size = sum(len(html.encode()) for html in fragments)
+        self.stdout.write(
+            f"{len(fragments)} fragments, {original_size / 1024:.1f} KB.\n\n"
+            f"{'codec':<8}{'stored KB':>12}{'ratio':>8}{'compress ms':>14}{'decompress ms':>16}"
+        )
+
+        for codec in [None, *CODECS]:
+            compress_time = decompress_time = 0
+            stored_size = 0
+
+            for html in fragments:
+                start = time.perf_counter()
+                for _ in range(options["repeat"]):
+                    value, value_codec = compress(
+                        html, codec=codec, min_size=options["min_size"]
+                    )
+                compress_time += time.perf_counter() - start
+
+                start = time.perf_counter()
+                for _ in range(options["repeat"]):
+                    decompress(value, value_codec)
+                decompress_time += time.perf_counter() - start
+
+                stored_size += len(value if value_codec else value.encode())
+
+            runs = len(fragments) * options["repeat"]
+            self.stdout.write(
+                f"{codec or 'none':<8}{stored_size / 1024:>12.1f}{stored_size / original_size:>8.2f}"
+                f"{compress_time * 1000 / runs:>14.3f}{decompress_time * 1000 / runs:>16.3f}"
+            )
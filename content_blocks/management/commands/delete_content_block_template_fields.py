@@ -0,0 +1,59 @@
+from django.core.management import BaseCommand
+
+from content_blocks.models import TemplateFieldDeletion
+from content_blocks.services.content_block_template import TemplateFieldDeletionServices
+
+
+class Command(BaseCommand):
+    """
+    Delete content block template fields which have been deleted in the admin or by an import, along with the content
+    block fields of every content block using them.  Fields are deleted in chunks, each in its own transaction, and an
+    interrupted deletion is resumed from the last chunk.  Run regularly e.g. from cron when
+    CONTENT_BLOCKS_DEFER_TEMPLATE_FIELD_DELETION is True.
+    """
+
+    help = "Delete queued content block template fields and their content block fields."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            help="Number of content block fields deleted in each transaction. "
+            "Defaults to CONTENT_BLOCKS_TEMPLATE_FIELD_DELETION_CHUNK_SIZE.",
+        )
+        parser.add_argument(
+            "--retry-failed",
+            action="store_true",
+            help="Also run deletions which failed.",
+        )
+
+    def handle(self, *args, **options):
+        verbosity = int(options["verbosity"])
+
+        def progress(deletion):
+            if (
+                verbosity > 1
+                and deletion.status == TemplateFieldDeletion.Status.RUNNING
+            ):
+                self.stdout.write(
+                    f"{deletion}: {deletion.processed}/{deletion.total} ({deletion.progress}%)"
+                )
+
+        deletions = TemplateFieldDeletionServices.run_all(
+            chunk_size=options["chunk_size"],
+            retry_failed=options["retry_failed"],
+            progress=progress,
+        )
+
+        if verbosity > 0:
+            for deletion in deletions:
+                self.stdout.write(
+                    f"{deletion.status:<8} {deletion}"
+                    + (f" {deletion.error}" if deletion.error else "")
+                )
+            failed = [
+                d for d in deletions if d.status == TemplateFieldDeletion.Status.FAILED
+            ]
+            self.stdout.write(
+                f"{len(deletions) - len(failed)} template fields deleted, {len(failed)} failed."
+            )
@@ -0,0 +1,54 @@
+from django.core.management import BaseCommand
+
+from content_blocks.services.media import MEDIA_FIELDS, MediaServices
+
+
+class Command(BaseCommand):
+    """
+    Move existing image, file and video media to content hash names so identical files are stored once.
+    Use with CONTENT_BLOCKS_CONTENT_HASH_UPLOADS = True.
+    """
+
+    help = "Migrate content block media files to content hash names."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--field",
+            action="append",
+            choices=MEDIA_FIELDS,
+            help="Media field to migrate. Can be used more than once. Defaults to all.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Number of files to hash in parallel.",
+        )
+        parser.add_argument(
+            "--keep-originals",
+            action="store_true",
+            help="Don't delete the original files.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="List the files which would be migrated without changing anything.",
+        )
+
+    def handle(self, *args, **options):
+        verbosity = int(options["verbosity"])
+
+        for field_name in options["field"] or MEDIA_FIELDS:
+            migrated = MediaServices.content_hash_media(
+                field_name,
+                workers=options["workers"],
+                delete=not options["keep_originals"],
+                dry_run=options["dry_run"],
+            )
+
+            if verbosity > 1:
+                for name, new_name in migrated:
+                    self.stdout.write(f"{name} -> {new_name or '?'}")
+
+            if verbosity > 0:
+                self.stdout.write(f"{len(migrated)} {field_name} files migrated.")
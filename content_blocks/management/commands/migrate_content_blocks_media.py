@@ -0,0 +1,92 @@
+from django.core.files.storage import get_storage_class
+from django.core.management import BaseCommand, CommandError
+
+from content_blocks.models import MediaMigration
+from content_blocks.services.media import MEDIA_FIELDS, MediaServices
+
+
+class Command(BaseCommand):
+    """
+    Copy image, file and video media from another storage backend to the storage configured for content blocks.
+    e.g. after changing CONTENT_BLOCKS_STORAGE from FileSystemStorage to a bucket.
+    The migration can be resumed, files which have already been copied are skipped.
+    """
+
+    help = "Copy content block media files from a source storage to the configured storage."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source",
+            required=True,
+            help="Dotted path of the storage class to copy from.",
+        )
+        parser.add_argument(
+            "--source-option",
+            action="append",
+            default=[],
+            metavar="KEY=VALUE",
+            help="Keyword argument for the source storage e.g. location=/old/media. Can be used more than once.",
+        )
+        parser.add_argument(
+            "--field",
+            action="append",
+            choices=MEDIA_FIELDS,
+            help="Media field to migrate. Can be used more than once. Defaults to all.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="Number of files to copy in parallel.",
+        )
+        parser.add_argument(
+            "--rewrite",
+            nargs=2,
+            metavar=("OLD_PREFIX", "NEW_PREFIX"),
+            help="Rewrite names starting with OLD_PREFIX to start with NEW_PREFIX.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="List the files which would be copied without changing anything.",
+        )
+
+    def handle(self, *args, **options):
+        verbosity = int(options["verbosity"])
+
+        try:
+            source_options = dict(
+                option.split("=", 1) for option in options["source_option"]
+            )
+        except ValueError:
+            raise CommandError("Source options must be in the form KEY=VALUE.")
+
+        source = get_storage_class(options["source"])(**source_options)
+        source_key = " ".join([options["source"]] + sorted(options["source_option"]))[
+            :255
+        ]
+
+        for field_name in options["field"] or MEDIA_FIELDS:
+            migrations = MediaServices.migrate_media(
+                field_name,
+                source,
+                source_key,
+                workers=options["workers"],
+                rewrite=options["rewrite"],
+                dry_run=options["dry_run"],
+            )
+
+            if verbosity > 1:
+                for migration in migrations:
+                    self.stdout.write(
+                        f"{migration.status or '?':<8} {migration.name} -> {migration.new_name or '?'}"
+                        + (f" {migration.error}" if migration.error else "")
+                    )
+
+            if verbosity > 0:
+                failed = [
+                    m for m in migrations if m.status == MediaMigration.Status.FAILED
+                ]
+                self.stdout.write(
+                    f"{len(migrations) - len(failed)} {field_name} files copied, {len(failed)} failed."
+                )
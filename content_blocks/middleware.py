@@ -0,0 +1,53 @@
+"""
+Content Blocks middleware.py
+"""
+from content_blocks.conf import settings
+from content_blocks.routers import use_primary_database
+
+# Signed cookie set on the responses of views which change published content blocks.
+PRIMARY_DATABASE_COOKIE = "content_blocks_primary"
+PRIMARY_DATABASE_COOKIE_SALT = "content_blocks.middleware.primary_database"
+
+
+def stick_to_primary_database(response):
+    """
+    Read public content block queries from the primary database for the next requests of the browser, so the
+    changes it just made are shown before they reach CONTENT_BLOCKS_READ_DATABASE.
+    """
+    if settings.CONTENT_BLOCKS_READ_DATABASE is None:
+        return response
+
+    response.set_signed_cookie(
+        PRIMARY_DATABASE_COOKIE,
+        "1",
+        salt=PRIMARY_DATABASE_COOKIE_SALT,
+        max_age=settings.CONTENT_BLOCKS_READ_DATABASE_STICKY_TIMEOUT,
+        httponly=True,
+        samesite="Lax",
+    )
+    return response
+
+
+class ReadDatabaseMiddleware:
+    """
+    Read public content block queries from the primary database for requests with a cookie set by
+    stick_to_primary_database.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if (
+            settings.CONTENT_BLOCKS_READ_DATABASE is not None
+            and request.get_signed_cookie(
+                PRIMARY_DATABASE_COOKIE,
+                default=None,
+                salt=PRIMARY_DATABASE_COOKIE_SALT,
+                max_age=settings.CONTENT_BLOCKS_READ_DATABASE_STICKY_TIMEOUT,
+            )
+        ):
+            with use_primary_database():
+                return self.get_response(request)
+
+        return self.get_response(request)
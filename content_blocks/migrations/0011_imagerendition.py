@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content_blocks', '0010_alter_contentblockfield_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageRendition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('create_date', models.DateTimeField(auto_now_add=True, verbose_name='Creation Date')),
+                ('mod_date', models.DateTimeField(auto_now=True, verbose_name='Last Modified')),
+                ('source', models.CharField(db_index=True, max_length=255)),
+                ('spec', models.CharField(max_length=64)),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('format', models.CharField(max_length=16)),
+                ('name', models.CharField(max_length=255)),
+            ],
+            options={
+                'ordering': ['width'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='imagerendition',
+            constraint=models.UniqueConstraint(fields=('source', 'spec', 'width'), name='unique_source_spec_width'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:07
+
+import content_blocks.fields
+import content_blocks.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("content_blocks", "0011_imagerendition"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="contentblockfield",
+            name="file",
+            field=content_blocks.fields.ContentHashFileField(
+                blank=True,
+                storage=content_blocks.models.file_storage,
+                upload_to="content-blocks/files",
+            ),
+        ),
+    ]
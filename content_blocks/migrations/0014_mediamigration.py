@@ -0,0 +1,56 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("content_blocks", "0013_chunkedupload"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MediaMigration",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "create_date",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Creation Date"
+                    ),
+                ),
+                (
+                    "mod_date",
+                    models.DateTimeField(auto_now=True, verbose_name="Last Modified"),
+                ),
+                ("field_name", models.CharField(max_length=16)),
+                ("source", models.CharField(max_length=255)),
+                ("name", models.CharField(max_length=255)),
+                ("new_name", models.CharField(blank=True, max_length=255)),
+                ("size", models.PositiveBigIntegerField(blank=True, null=True)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[("copied", "Copied"), ("failed", "Failed")],
+                        max_length=16,
+                    ),
+                ),
+                ("error", models.TextField(blank=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="mediamigration",
+            constraint=models.UniqueConstraint(
+                fields=("field_name", "source", "name"),
+                name="unique_field_name_source_name",
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("content_blocks", "0014_mediamigration"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="contentblock",
+            name="fingerprint",
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("content_blocks", "0015_contentblock_fingerprint"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PublishGeneration",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "create_date",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Creation Date"
+                    ),
+                ),
+                (
+                    "mod_date",
+                    models.DateTimeField(auto_now=True, verbose_name="Last Modified"),
+                ),
+                ("object_id", models.PositiveIntegerField()),
+                ("generation", models.PositiveIntegerField(default=0)),
+                (
+                    "content_type",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="contenttypes.contenttype",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="publishgeneration",
+            constraint=models.UniqueConstraint(
+                fields=("content_type", "object_id"),
+                name="unique_publish_generation_parent",
+            ),
+        ),
+    ]
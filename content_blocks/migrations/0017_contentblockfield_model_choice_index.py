@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("content_blocks", "0016_publishgeneration"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="contentblockfield",
+            index=models.Index(
+                fields=["model_choice_content_type", "model_choice_object_id"],
+                name="content_blocks_model_choice",
+            ),
+        ),
+    ]
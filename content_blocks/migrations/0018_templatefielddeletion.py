@@ -0,0 +1,87 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("content_blocks", "0017_contentblockfield_model_choice_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TemplateFieldDeletion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "create_date",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Creation Date"
+                    ),
+                ),
+                (
+                    "mod_date",
+                    models.DateTimeField(auto_now=True, verbose_name="Last Modified"),
+                ),
+                ("name", models.CharField(max_length=255)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("pending", "Pending"),
+                            ("running", "Running"),
+                            ("done", "Done"),
+                            ("failed", "Failed"),
+                        ],
+                        default="pending",
+                        max_length=16,
+                    ),
+                ),
+                ("last_id", models.PositiveBigIntegerField(default=0)),
+                ("processed", models.PositiveIntegerField(default=0)),
+                ("total", models.PositiveIntegerField(default=0)),
+                ("error", models.TextField(blank=True)),
+            ],
+            options={
+                "ordering": ["-create_date"],
+                "abstract": False,
+            },
+        ),
+        migrations.RemoveConstraint(
+            model_name="contentblocktemplatefield",
+            name="unique_key_content_block_template",
+        ),
+        migrations.AddField(
+            model_name="contentblocktemplatefield",
+            name="deleting",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddConstraint(
+            model_name="contentblocktemplatefield",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("deleting", False)),
+                fields=("key", "content_block_template"),
+                name="unique_key_content_block_template",
+            ),
+        ),
+        migrations.AddField(
+            model_name="templatefielddeletion",
+            name="template_field",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="content_blocks.contentblocktemplatefield",
+            ),
+        ),
+    ]
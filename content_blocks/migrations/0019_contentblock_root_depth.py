@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("content_blocks", "0018_templatefielddeletion"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="contentblock",
+            name="depth",
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="contentblock",
+            name="root",
+            field=models.ForeignKey(
+                blank=True,
+                editable=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="descendants",
+                to="content_blocks.contentblock",
+            ),
+        ),
+    ]
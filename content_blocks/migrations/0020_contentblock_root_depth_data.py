@@ -0,0 +1,59 @@
+# Generated by Django 4.2.30 on 2026-10-19 18:12
+
+from django.db import migrations, transaction
+
+# Content blocks read or updated in each query.
+CHUNK_SIZE = 1000
+
+
+def forwards(apps, schema_editor):
+    """
+    Set the root and depth of nested content blocks a level at a time, starting with those nested in top level
+    content blocks.
+    """
+    ContentBlock = apps.get_model("content_blocks", "ContentBlock")
+
+    # Content block id to the id of its root for the level above.
+    level = {
+        content_block_id: content_block_id
+        for content_block_id in ContentBlock.objects.filter(
+            parent__isnull=True
+        ).values_list("id", flat=True)
+    }
+    depth = 1
+
+    while level:
+        parent_ids = list(level)
+        next_level = {}
+        for i in range(0, len(parent_ids), CHUNK_SIZE):
+            for content_block_id, parent_block_id in ContentBlock.objects.filter(
+                parent__content_block_id__in=parent_ids[i : i + CHUNK_SIZE]
+            ).values_list("id", "parent__content_block_id"):
+                next_level[content_block_id] = level[parent_block_id]
+
+        content_blocks = [
+            ContentBlock(id=content_block_id, root_id=root_id, depth=depth)
+            for content_block_id, root_id in next_level.items()
+        ]
+        for i in range(0, len(content_blocks), CHUNK_SIZE):
+            with transaction.atomic():
+                ContentBlock.objects.bulk_update(
+                    content_blocks[i : i + CHUNK_SIZE], ["root", "depth"]
+                )
+
+        level = next_level
+        depth += 1
+
+
+class Migration(migrations.Migration):
+    # Each chunk is updated in its own transaction so large tables aren't locked for the whole backfill.
+    atomic = False
+
+    dependencies = [
+        ("content_blocks", "0019_contentblock_root_depth"),
+    ]
+
+    operations = [
+        # The columns are removed when 0019 is reversed.
+        migrations.RunPython(forwards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("content_blocks", "0020_contentblock_root_depth_data"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="contentblock",
+            index=models.Index(
+                condition=models.Q(("draft", False), ("visible", True)),
+                fields=["position"],
+                name="content_blocks_published",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="contentblock",
+            index=models.Index(
+                condition=models.Q(("draft", True)),
+                fields=["position"],
+                name="content_blocks_drafts",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="contentblock",
+            index=models.Index(
+                condition=models.Q(
+                    ("draft", False), ("saved", True), ("visible", True)
+                ),
+                fields=["parent", "position"],
+                name="content_blocks_nested",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="contentblockfield",
+            index=models.Index(
+                fields=["content_block", "template_field"],
+                name="content_blocks_field_block",
+            ),
+        ),
+        # Dropped once content_blocks_field_block, which covers it, has been created.
+        migrations.AlterField(
+            model_name="contentblockfield",
+            name="content_block",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="content_block_fields",
+                to="content_blocks.contentblock",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="contentblockfield",
+            index=models.Index(
+                condition=models.Q(("image", ""), _negated=True),
+                fields=["image"],
+                name="content_blocks_field_image",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="contentblockfield",
+            index=models.Index(
+                condition=models.Q(("file", ""), _negated=True),
+                fields=["file"],
+                name="content_blocks_field_file",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="contentblockfield",
+            index=models.Index(
+                condition=models.Q(("video", ""), _negated=True),
+                fields=["video"],
+                name="content_blocks_field_video",
+            ),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-19 17:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("content_blocks", "0021_content_block_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PublishedFields",
+            fields=[
+                (
+                    "content_block",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="published_fields",
+                        serialize=False,
+                        to="content_blocks.contentblock",
+                    ),
+                ),
+                ("fields", models.JSONField(default=dict)),
+            ],
+            options={
+                "verbose_name_plural": "Published fields",
+            },
+        ),
+    ]
@@ -4,14 +4,20 @@ Content Blocks models.py
 import functools
 import json
 import logging
+import uuid
+from collections.abc import MutableMapping
 
 from django import forms
 from django.apps import apps
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
+from django.core.files.base import File
 from django.core.files.storage import get_storage_class
 from django.core.validators import RegexValidator
 from django.db import models
+from django.db.models import Q
+from django.db.models.fields.files import FieldFile
+from django.db.models.functions import Coalesce
 from django.forms.utils import pretty_name
 from django.template.exceptions import TemplateDoesNotExist
 from django.template.loader import get_template
@@ -27,11 +33,14 @@ from content_blocks.abstract_models import (
 )
 from content_blocks.conf import settings
 from content_blocks.fields import (
+    ContentHashFileField,
     SVGAndImageField,
     SVGAndImageFieldFormField,
     VideoField,
+    process_upload,
 )
-from content_blocks.widgets import FileWidget
+from content_blocks.routers import read_database
+from content_blocks.widgets import ChunkedFileWidget, FileWidget
 
 logger = logging.getLogger(__name__)
 
@@ -67,7 +76,12 @@ class ContentBlockFields(models.TextChoices):
 
 class ContentBlockFieldManager(models.Manager):
     def get_queryset(self):
-        return super().get_queryset().select_related("template_field")
+        return (
+            super()
+            .get_queryset()
+            .select_related("template_field")
+            .filter(template_field__deleting=False)
+        )
 
 
 def get_storage(field_type):
@@ -113,6 +127,8 @@ class ContentBlockField(models.Model, CloneMixin):
         "content_blocks.ContentBlock",
         on_delete=models.CASCADE,
         related_name="content_block_fields",
+        # Covered by content_blocks_field_block.
+        db_index=False,
     )
 
     # duplicate from template_field here because it can't be changed on template field and seems impossible to have
@@ -125,7 +141,7 @@ class ContentBlockField(models.Model, CloneMixin):
     image = SVGAndImageField(
         upload_to="content-blocks/images", blank=True, storage=image_storage
     )
-    file = models.FileField(
+    file = ContentHashFileField(
         upload_to="content-blocks/files", blank=True, storage=file_storage
     )
     choice = models.CharField(max_length=256, blank=True)
@@ -148,6 +164,35 @@ class ContentBlockField(models.Model, CloneMixin):
 
     class Meta:
         ordering = ["template_field__position"]
+        indexes = [
+            # Find the content blocks which chose an object when it is saved or deleted.
+            models.Index(
+                fields=["model_choice_content_type", "model_choice_object_id"],
+                name="content_blocks_model_choice",
+            ),
+            # The fields of content blocks, joined to their template fields.
+            models.Index(
+                fields=["content_block", "template_field"],
+                name="content_blocks_field_block",
+            ),
+            # Find the fields using a media file before it is deleted or renamed.  Most fields have no media so
+            # empty names are left out, queries must exclude them to use these indexes.
+            models.Index(
+                fields=["image"],
+                condition=~Q(image=""),
+                name="content_blocks_field_image",
+            ),
+            models.Index(
+                fields=["file"],
+                condition=~Q(file=""),
+                name="content_blocks_field_file",
+            ),
+            models.Index(
+                fields=["video"],
+                condition=~Q(video=""),
+                name="content_blocks_field_video",
+            ),
+        ]
 
     def __init_subclass__(subcls):
         """
@@ -176,6 +221,7 @@ class ContentBlockField(models.Model, CloneMixin):
             "template_name",
             "preview_template_name",
             "label",
+            "nested_blocks",
         ]
         if item in polymorph_attrs:
             self.polymorph()
@@ -233,6 +279,14 @@ class ContentBlockField(models.Model, CloneMixin):
     def key(self):
         return self.template_field.key
 
+    @property
+    def editor_id(self):
+        """
+        :return: Id of the field in the editor.  Virtual fields have no pk yet so the content block and template field
+        ids are used.
+        """
+        return f"{self.content_block_id}_{self.template_field_id}"
+
 
 class TextField(ContentBlockField):
     class Meta:
@@ -328,6 +382,9 @@ class ImageField(ContentBlockField):
         return self.image
 
     def save_value(self, value):
+        if isinstance(value, File) and not isinstance(value, FieldFile):
+            # A new upload
+            value, _ = process_upload(value)
         self.image = None if value is False else value
         self.save()
         return value
@@ -364,7 +421,9 @@ class FileField(ContentBlockField):
             initial=self.file,
             required=self.template_field.required,
             help_text=self.template_field.help_text,
-            widget=FileWidget(),
+            widget=ChunkedFileWidget()
+            if settings.CONTENT_BLOCKS_CHUNKED_UPLOADS
+            else FileWidget(),
         )
 
 
@@ -391,7 +450,9 @@ class VideoField(ContentBlockField):
             initial=self.video,
             required=self.template_field.required,
             help_text=self.template_field.help_text,
-            widget=FileWidget(),
+            widget=ChunkedFileWidget()
+            if settings.CONTENT_BLOCKS_CHUNKED_UPLOADS
+            else FileWidget(),
         )
 
 
@@ -523,7 +584,26 @@ class NestedField(ContentBlockField):
         """
         :return: Nested content blocks which we can then call render or access context on.
         """
-        return self.content_blocks.nested()
+        if self.pk is None:
+            # A virtual field, see ContentBlock.fields.
+            return ContentBlock.objects.none()
+        if "content_blocks" in getattr(self, "_prefetched_objects_cache", {}):
+            # Prefetched with the nested filter when rendering, see PrefetchServices.
+            return self.content_blocks.all()
+        return self.content_blocks.nested().using(self._state.db)
+
+    @property
+    def nested_blocks(self):
+        """
+        :return: All nested content blocks for the editor, including hidden and unsaved.
+        """
+        if self.pk is None:
+            # A virtual field, saved when the first nested content block is added.  See NewNestedBlockForm.
+            return ContentBlock.objects.none()
+        return self.content_blocks.prefetch_related(
+            "content_block_fields",
+            "content_block_template__content_block_template_fields",
+        ).select_related("content_block_template")
 
 
 def optimise_queryset(func):
@@ -537,26 +617,109 @@ def optimise_queryset(func):
     def wrapper(self):
         return (
             func(self)
-            .prefetch_related("content_block_fields")
+            .prefetch_related(
+                "content_block_fields",
+                "content_block_template__content_block_template_fields",
+            )
             .select_related("content_block_template")
         )
 
     return wrapper
 
 
-class ContentBlockManager(VisibleManager):
+def optimise_render_queryset(func):
+    """
+    Decorator to optimise querysets of content blocks which are rendered.  Fields are not prefetched here, they are
+    prefetched when rendered by PrefetchServices which only loads the fields used by the template of each content
+    block.
+    """
+
+    @functools.wraps(func)
+    def wrapper(self):
+        return func(self).select_related("content_block_template")
+
+    return wrapper
+
+
+class ContentBlockQuerySet(models.QuerySet):
+    def render_batch(self):
+        """
+        Fetch the content blocks as a batch so the first to be rendered prefetches nested content blocks and model
+        choice objects for all of them.  See PrefetchServices.  Use when rendering the content blocks one at a time,
+        e.g. {% for content_block in content_blocks.render_batch %}{% render_content_block content_block %}, the
+        render_content_blocks template tag already batches them.
+        :return: List of the content blocks.
+        """
+        from content_blocks.services.content_block import PrefetchServices
+
+        content_blocks = list(self)
+        PrefetchServices.batch(content_blocks)
+        return content_blocks
+
+    def trees(self):
+        """
+        :return: QuerySet of the content blocks and every other content block in their trees, top level and nested,
+        in one query.
+        """
+        roots = self.annotate(tree_root=Coalesce("root_id", "id")).values("tree_root")
+        return self.model.objects.using(self.db).filter(
+            Q(id__in=roots) | Q(root_id__in=roots)
+        )
+
+    def descendants(self, content_block):
+        """
+        :return: QuerySet of the content blocks nested below the content block in one query.  If the content block
+        is nested itself content blocks in other branches of its tree which are nested more deeply are included.
+        """
+        return self.filter(
+            root_id=content_block.root_id or content_block.id,
+            depth__gt=content_block.depth,
+        )
+
+    def ancestors(self, content_block, *fields):
+        """
+        Fetch the content blocks above a nested content block in one query.
+        :param fields: Names of the fields to fetch.
+        :return: List of (id, *fields) tuples, the parent content block first and the top level content block last.
+        """
+        if content_block.parent_id is None:
+            return []
+
+        field_blocks = {}
+        for field_id, parent_id, *values in (
+            self.filter(
+                Q(id=content_block.root_id) | Q(root_id=content_block.root_id),
+                depth__lt=content_block.depth,
+            )
+            .order_by()
+            .values_list("content_block_fields__id", "parent_id", "id", *fields)
+        ):
+            field_blocks[field_id] = (parent_id, tuple(values))
+
+        ancestors = []
+        parent_id = content_block.parent_id
+        while parent_id in field_blocks:
+            parent_id, values = field_blocks[parent_id]
+            ancestors.append(values)
+        return ancestors
+
+
+class ContentBlockManager(VisibleManager.from_queryset(ContentBlockQuerySet)):
     # todo consider moving some of these to service classes. Only need to keep those used in templates here?
     #   Could also take more care with optimisation and only apply it when needed.
 
-    @optimise_queryset
+    def get_queryset(self):
+        return ContentBlockQuerySet(self.model, using=self._db)
+
+    @optimise_render_queryset
     def visible(self):
         """
         Visible published only.
-        Used in templates to render published content blocks.
+        Used in templates to render published content blocks.  Read from CONTENT_BLOCKS_READ_DATABASE.
         """
-        return super().visible().filter(draft=False)
+        return super().visible().filter(draft=False).using(read_database() or self._db)
 
-    @optimise_queryset
+    @optimise_render_queryset
     def previews(self):
         """
         Visible drafts only. Exclude those which haven't been saved via the editor yet (empties).
@@ -564,10 +727,12 @@ class ContentBlockManager(VisibleManager):
         """
         return super().visible().filter(draft=True, saved=True)
 
-    @optimise_queryset
+    @optimise_render_queryset
     def nested(self):
         """
-        Used in the context for NestedField objects. Visible but with unsaved excluded.
+        Used in the context for NestedField objects. Visible but with unsaved excluded.  Read from the database the
+        content block they are nested in was read from, so CONTENT_BLOCKS_READ_DATABASE for visible content blocks
+        and the default database for drafts.
         """
         return super().visible().filter(draft=False, saved=True)
 
@@ -588,6 +753,105 @@ class ContentBlockManager(VisibleManager):
         return self.get_queryset().filter(draft=True)
 
 
+class ContentBlockRenderField:
+    """
+    Read only content block field used when rendering.  Holds only the key, type and value of the field rather than
+    every column of a ContentBlockField, see PrefetchServices.  The value of a model choice field is the content type
+    and object ids until the chosen object is fetched.  The value of a nested field is its nested content blocks.
+    """
+
+    __slots__ = ["id", "key", "field_type", "value"]
+
+    def __init__(self, id, key, field_type, value):
+        self.id = id
+        self.key = key
+        self.field_type = field_type
+        self.value = value
+
+    @property
+    def context_value(self):
+        if settings.CONTENT_BLOCKS_MARK_SAFE and self.field_type in [
+            ContentBlockFields.TEXT_FIELD,
+            ContentBlockFields.CONTENT_FIELD,
+        ]:
+            return mark_safe(self.value)
+        return self.value
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {self.key}: {self.field_type}>"
+
+
+class ContentBlockContext(MutableMapping):
+    """
+    Template context of a ContentBlock.  The value of each field is computed from its context_value the first time
+    its key is read, so fields a template never reads cost nothing.
+    """
+
+    def __init__(self, content_block):
+        self.content_block = content_block
+        self.values = {"css_class": content_block.css_class}
+        self.deleted = set()
+
+    @cached_property
+    def fields(self):
+        from content_blocks.services.content_block import PrefetchServices
+
+        PrefetchServices.resolve(self.content_block)
+        return {
+            key: field
+            for key, field in self.content_block.fields.items()
+            if key not in self.deleted
+        }
+
+    def field(self, key):
+        """
+        :return: The field with the key or None.  Fields the template of the content block was found to use are
+        loaded by PrefetchServices as ContentBlockRenderFields in render_fields, any other field loads every field.
+        """
+        from content_blocks.services.content_block import PrefetchServices
+
+        if key in self.deleted:
+            return None
+
+        PrefetchServices.resolve(self.content_block)
+        render_fields = getattr(self.content_block, "render_fields", None)
+        if render_fields is not None and key in self.content_block.render_keys:
+            return render_fields.get(key)
+        return self.fields.get(key)
+
+    def __getitem__(self, key):
+        if key not in self.values:
+            field = self.field(key)
+            if field is None:
+                raise KeyError(key)
+            self.values[key] = field.context_value
+        return self.values[key]
+
+    def __setitem__(self, key, value):
+        self.deleted.discard(key)
+        self.values[key] = value
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        self.deleted.add(key)
+        self.values.pop(key, None)
+        self.__dict__.get("fields", {}).pop(key, None)
+
+    def __contains__(self, key):
+        return key in self.values or self.field(key) is not None
+
+    def __iter__(self):
+        yield from self.fields
+        yield from (key for key in self.values if key not in self.fields)
+
+    def __len__(self):
+        return len(self.fields.keys() | self.values.keys())
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {self.content_block}: {list(self)}>"
+
+
 class ContentBlock(PositionModel, AutoDateModel, VisibleModel, CloneMixin):
     """
     Content Block Model
@@ -606,6 +870,17 @@ class ContentBlock(PositionModel, AutoDateModel, VisibleModel, CloneMixin):
         blank=True,
         null=True,
     )
+    # The top level content block of the tree a nested content block is in and how deeply it is nested.  None and 0
+    # for top level content blocks.  Set on save so a whole tree can be fetched, cloned or deleted with one query.
+    root = models.ForeignKey(
+        "self",
+        on_delete=models.CASCADE,
+        related_name="descendants",
+        blank=True,
+        null=True,
+        editable=False,
+    )
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
 
     name = models.CharField(
         max_length=320,
@@ -620,8 +895,47 @@ class ContentBlock(PositionModel, AutoDateModel, VisibleModel, CloneMixin):
 
     saved = models.BooleanField(blank=True, default=False)
 
+    # Hash of the template and field values, including nested content blocks.  Set when cloned e.g. on publish.
+    # Unlike the id this is the same after a publish if nothing has changed, so it can be used as a cache key.
+    fingerprint = models.CharField(max_length=64, blank=True, editable=False)
+
     context_name = "content_block"
 
+    class Meta(PositionModel.Meta):
+        indexes = [
+            # Published content blocks, see ContentBlockManager.visible.
+            models.Index(
+                fields=["position"],
+                condition=Q(draft=False, visible=True),
+                name="content_blocks_published",
+            ),
+            # Draft content blocks, see ContentBlockManager.drafts.
+            models.Index(
+                fields=["position"],
+                condition=Q(draft=True),
+                name="content_blocks_drafts",
+            ),
+            # Nested content blocks of nested fields, see ContentBlockManager.nested.
+            models.Index(
+                fields=["parent", "position"],
+                condition=Q(draft=False, visible=True, saved=True),
+                name="content_blocks_nested",
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.parent_id is not None and self.root_id is None:
+            parent_block_id, root_id, depth = (
+                ContentBlockField._base_manager.filter(id=self.parent_id)
+                .values_list(
+                    "content_block_id", "content_block__root_id", "content_block__depth"
+                )
+                .get()
+            )
+            self.root_id = root_id or parent_block_id
+            self.depth = depth + 1
+        super().save(*args, **kwargs)
+
     @cached_property
     def template(self):
         """
@@ -633,27 +947,43 @@ class ContentBlock(PositionModel, AutoDateModel, VisibleModel, CloneMixin):
     def fields(self):
         """
         Create/cache a dict of key to content block field objects.
+        Template fields added after the content block was created have no ContentBlockField until a value is saved.
+        They get an unsaved field with the default value instead, see virtual_field.
         """
-        nested_fields = {}
-        fields = {}
-        for field in self.content_block_fields.all():
-            fields[field.template_field.key] = field
-            if field.template_field.field_type == ContentBlockFields.NESTED_FIELD:
-                nested_fields[field.template_field.key] = field
+        fields = {
+            field.template_field.key: field for field in self.content_block_fields.all()
+        }
+        for (
+            template_field
+        ) in self.content_block_template.content_block_template_fields.all():
+            if template_field.key not in fields:
+                fields[template_field.key] = self.virtual_field(template_field)
+
+        return dict(
+            sorted(fields.items(), key=lambda item: item[1].template_field.position)
+        )
 
-        self.__dict__["nested_fields"] = nested_fields
-        return fields
+    def virtual_field(self, template_field):
+        """
+        :return: Unsaved ContentBlockField for the template field with the default value.  It is saved by save_value.
+        """
+        return ContentBlockField(
+            content_block=self,
+            template_field=template_field,
+            field_type=template_field.field_type,
+            model_choice_content_type_id=template_field.model_choice_content_type_id,
+        )
 
     @cached_property
     def nested_fields(self):
         """
-        Create/cache a dict of nested fields.  If self.fields has already been called this is already cached.
+        Create/cache a dict of nested fields.  Nested fields which haven't been saved yet are virtual fields, they are
+        saved when their first nested content block is added.
         """
         return {
-            field.template_field.key: field
-            for field in self.content_block_fields.filter(
-                template_field__field_type=ContentBlockFields.NESTED_FIELD
-            )
+            key: field
+            for key, field in self.fields.items()
+            if field.field_type == ContentBlockFields.NESTED_FIELD
         }
 
     @cached_property
@@ -661,9 +991,15 @@ class ContentBlock(PositionModel, AutoDateModel, VisibleModel, CloneMixin):
         """
         Return dictionary of template context for this content block
         """
-        context = {key: field.context_value for key, field in self.fields.items()}
-        context["css_class"] = self.css_class
-        return context
+        return dict(self.lazy_context)
+
+    @cached_property
+    def lazy_context(self):
+        """
+        Return a mapping of template context for this content block.  Values are computed as they are read.  Used when
+        rendering the content block.
+        """
+        return ContentBlockContext(self)
 
     @cached_property
     def can_render(self):
@@ -719,6 +1055,10 @@ class ContentBlockTemplate(PositionModel, AutoDateModel, VisibleModel):
 
 
 class ContentBlockTemplateFieldManager(models.Manager):
+    def get_queryset(self):
+        # Fields being deleted by a TemplateFieldDeletion are hidden along with their content block fields.
+        return super().get_queryset().filter(deleting=False)
+
     def get_by_natural_key(self, key, content_block_template_name):
         return self.get(
             key=key, content_block_template__name=content_block_template_name
@@ -781,10 +1121,14 @@ class ContentBlockTemplateField(PositionModel):
         ContentType, on_delete=models.CASCADE, blank=True, null=True
     )
 
+    # Set when the field is queued for deletion, see TemplateFieldDeletion.
+    deleting = models.BooleanField(default=False, editable=False)
+
     class Meta(PositionModel.Meta):
         constraints = [
             models.UniqueConstraint(
                 fields=["key", "content_block_template"],
+                condition=Q(deleting=False),
                 name="unique_key_content_block_template",
             )
         ]
@@ -829,8 +1173,21 @@ class ContentBlockParentModel(models.Model):
 
     def delete(self, using=None, keep_parents=False):
         self.content_blocks.all().delete()
+        PublishGeneration.objects.filter(
+            content_type=ContentType.objects.get_for_model(self), object_id=self.pk
+        ).delete()
         return super().delete(using=using, keep_parents=keep_parents)
 
+    @property
+    def publish_generation(self):
+        """
+        A number which changes whenever the published content blocks change.  Use it in cache keys for anything
+        derived from the content blocks.
+        """
+        from content_blocks.services.content_block import PublishGenerationServices
+
+        return PublishGenerationServices.generation(self)
+
 
 class ContentBlockCollection(AutoDateModel, ContentBlockParentModel):
     """
@@ -849,3 +1206,172 @@ class ContentBlockCollection(AutoDateModel, ContentBlockParentModel):
 
     def __str__(self):
         return self.name or self.slug
+
+
+class ImageRendition(AutoDateModel):
+    """
+    A resized copy of an image used by ImageField, generated according to a named rendition spec.
+    See CONTENT_BLOCKS_IMAGE_RENDITIONS.  Recording renditions here means templates can build a srcset without
+    touching storage.
+    """
+
+    source = models.CharField(max_length=255, db_index=True)
+    spec = models.CharField(max_length=64)
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    format = models.CharField(max_length=16)
+    name = models.CharField(max_length=255)
+
+    class Meta:
+        ordering = ["width"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["source", "spec", "width"],
+                name="unique_source_spec_width",
+            )
+        ]
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def url(self):
+        return image_storage().url(self.name)
+
+
+class ChunkedUpload(AutoDateModel):
+    """
+    A file uploaded in chunks from the content block editor ahead of saving the content block form.
+    Chunks are appended to a temporary file which is referenced by token when the form is saved.
+    """
+
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, blank=True, null=True
+    )
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    completed = models.BooleanField(default=False)
+
+    def __str__(self):
+        return self.filename
+
+
+class MediaMigration(AutoDateModel):
+    """
+    Progress of copying a media file from a source storage to the configured storage.
+    See the migrate_content_blocks_media management command.  Copied files are skipped when a migration is resumed.
+    """
+
+    class Status(models.TextChoices):
+        COPIED = "copied"
+        FAILED = "failed"
+
+    field_name = models.CharField(max_length=16)
+    source = models.CharField(max_length=255)
+    name = models.CharField(max_length=255)
+    new_name = models.CharField(max_length=255, blank=True)
+    size = models.PositiveBigIntegerField(blank=True, null=True)
+    status = models.CharField(max_length=16, choices=Status.choices)
+    error = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["field_name", "source", "name"],
+                name="unique_field_name_source_name",
+            )
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class PublishGeneration(AutoDateModel):
+    """
+    Counts changes to the published content blocks of a ContentBlockParentModel.
+    Bumped on publish, reset, import and when content blocks are hidden, shown or deleted.
+    """
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    parent = GenericForeignKey("content_type", "object_id")
+    generation = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["content_type", "object_id"],
+                name="unique_publish_generation_parent",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.content_type} {self.object_id}: {self.generation}"
+
+
+class PublishedFields(models.Model):
+    """
+    Read only copy of the fields of a published content block, written on publish.  Published content blocks are
+    rendered from one row of this small table each rather than from the ContentBlockField table which they share
+    with drafts.  See CONTENT_BLOCKS_PUBLISHED_FIELDS.
+    """
+
+    content_block = models.OneToOneField(
+        ContentBlock,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="published_fields",
+    )
+    # Dict of key to [id, field type, dict of the columns used by the field type].
+    fields = models.JSONField(default=dict)
+
+    class Meta:
+        verbose_name_plural = "Published fields"
+
+    def __str__(self):
+        return str(self.content_block_id)
+
+
+class TemplateFieldDeletion(AutoDateModel):
+    """
+    Progress of deleting a ContentBlockTemplateField and its ContentBlockField.
+    Fields are deleted in chunks, each in its own transaction, ordered by id so an interrupted deletion resumes from
+    last_id.  See the delete_content_block_template_fields management command.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = "pending"
+        RUNNING = "running"
+        DONE = "done"
+        FAILED = "failed"
+
+    template_field = models.ForeignKey(
+        ContentBlockTemplateField,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name="+",
+    )
+    # The template field is gone once the deletion is done so keep its name.
+    name = models.CharField(max_length=255)
+    status = models.CharField(
+        max_length=16, choices=Status.choices, default=Status.PENDING
+    )
+    last_id = models.PositiveBigIntegerField(default=0)
+    processed = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def progress(self):
+        """
+        :return: Percentage of the content block fields which have been deleted.
+        """
+        if self.status == self.Status.DONE or not self.total:
+            return 100
+        return min(100, int(self.processed * 100 / self.total))
@@ -0,0 +1,65 @@
+"""
+Content Blocks routers.py
+"""
+import contextlib
+from contextvars import ContextVar
+
+from django.db import DEFAULT_DB_ALIAS
+
+from content_blocks.conf import settings
+
+# Set while public content block queries must see writes made to the primary database.
+_primary = ContextVar("content_blocks_primary", default=False)
+
+
+def read_database():
+    """
+    :return: The database alias public content block queries are read from.  None, to let the database routers
+    choose, if CONTENT_BLOCKS_READ_DATABASE isn't set or reads are pinned to the primary database.
+    """
+    if _primary.get():
+        return None
+    return settings.CONTENT_BLOCKS_READ_DATABASE
+
+
+@contextlib.contextmanager
+def use_primary_database():
+    """
+    Read public content block queries from the primary database inside the block.
+    """
+    token = _primary.set(True)
+    try:
+        yield
+    finally:
+        _primary.reset(token)
+
+
+class ReadDatabaseRouter:
+    """
+    Database router for CONTENT_BLOCKS_READ_DATABASE.  Objects read from the read database are saved to the default
+    database and may be related to objects from the default database.
+    """
+
+    def db_for_read(self, model, **hints):
+        return None
+
+    def db_for_write(self, model, **hints):
+        instance = hints.get("instance")
+        if (
+            instance is not None
+            and settings.CONTENT_BLOCKS_READ_DATABASE is not None
+            and instance._state.db == settings.CONTENT_BLOCKS_READ_DATABASE
+        ):
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if settings.CONTENT_BLOCKS_READ_DATABASE is not None and {
+            obj1._state.db,
+            obj2._state.db,
+        } <= {DEFAULT_DB_ALIAS, settings.CONTENT_BLOCKS_READ_DATABASE}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None
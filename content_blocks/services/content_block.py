@@ -1,6 +1,59 @@
-from django.template.loader import render_to_string
+import functools
+import hashlib
+import json
+import operator
+import time
 
-from content_blocks.models import ContentBlockFields
+from django.apps import apps
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import (
+    Count,
+    DateTimeField,
+    F,
+    Max,
+    Prefetch,
+    Q,
+    prefetch_related_objects,
+)
+from django.template import TemplateDoesNotExist, defaulttags, loader_tags
+from django.template.base import FilterExpression, TextNode, Variable, VariableNode
+from django.template.library import InclusionNode, SimpleNode
+from django.template.loader import get_template, render_to_string
+from django.templatetags.cache import CacheNode
+from django.templatetags.static import StaticNode
+from django.utils import timezone
+from django.utils.safestring import mark_safe
+
+from content_blocks.cache import RENDER_CACHE_CONTEXT_NAME, render_cache
+from content_blocks.conf import settings
+from content_blocks.models import (
+    ContentBlock,
+    ContentBlockCollection,
+    ContentBlockField,
+    ContentBlockFields,
+    ContentBlockParentModel,
+    ContentBlockRenderField,
+    ContentBlockTemplateField,
+    PublishedFields,
+    PublishGeneration,
+)
+from content_blocks.routers import read_database
+
+# ContentBlockField attributes which hold the value of a field.
+FINGERPRINT_FIELD_ATTRS = [
+    "text",
+    "content",
+    "checkbox",
+    "image",
+    "file",
+    "choice",
+    "video",
+    "embedded_video",
+    "iframe",
+    "model_choice_content_type_id",
+    "model_choice_object_id",
+]
 
 
 class ContentBlockFilters:
@@ -21,25 +74,146 @@ class RenderServices:
         :context: Dictionary of context to render the template with.
         :return: Rendered html for the content block.
         """
+        return RenderServices.render_content_blocks([content_block], context=context)[0]
+
+    @staticmethod
+    def render_content_blocks(content_blocks, context=None):
+        """
+        Render the html for many ContentBlock.  Cached html for all the content blocks is fetched in one go.
+        :context: Dictionary of context to render the templates with.
+        :return: List of rendered html, one for each content block.
+        """
+        context = context or {}
+        content_blocks = list(content_blocks)
+        PrefetchServices.batch(content_blocks)
+
+        cached = render_cache.lookup(
+            [
+                content_block
+                for content_block in content_blocks
+                if content_block.can_render
+                and render_cache.can_cache(content_block, context)
+            ],
+            context,
+        )
+        timeout = render_cache.timeout(context)
+        html = []
+
+        for content_block in content_blocks:
+            if content_block.id not in cached:
+                html.append(RenderServices.render_html(content_block, dict(context)))
+                continue
+
+            key, version, cached_html = cached[content_block.id]
+            content_block_html = render_cache.fetch(
+                key,
+                version,
+                cached_html,
+                functools.partial(
+                    RenderServices.render_html,
+                    content_block,
+                    dict(context),
+                    cache=True,
+                ),
+                timeout=timeout,
+            )
+            html.append(mark_safe(content_block_html))
+
+        return html
+
+    @staticmethod
+    def render_html(content_block, context, cache=False):
+        """
+        Render the template for the ContentBlock without the render cache.
+        :param cache: True if the html will be cached.  Nested content blocks are then cached too.
+        """
         if not content_block.can_render:
             return ""
 
         context = RenderServices.context(content_block, context=context)
-        html = render_to_string(content_block.template, context)
-        return html
+        context[RENDER_CACHE_CONTEXT_NAME] = cache
+        return render_to_string(content_block.template, context)
 
     @staticmethod
     def context(content_block, context=None):
         """
-        Adds the ``ContentBlock.context`` and ``ContentBlock`` to supplied context or creates new context.
+        Adds the ``ContentBlock.lazy_context`` and ``ContentBlock`` to supplied context or creates new context.
         :return: Context dictionary to be used when rendering html.
         """
         context = context or {}
-        context[content_block.context_name] = content_block.context
+        context[content_block.context_name] = content_block.lazy_context
         context[f"{content_block.context_name}_object"] = content_block
         return context
 
 
+class FingerprintServices:
+    """
+    Services for fingerprinting ContentBlock.
+    A fingerprint changes when anything which affects the rendered html of a content block changes.
+    """
+
+    @staticmethod
+    def template_version(template_name):
+        """
+        :return: Hash of the template source or an empty string if the template does not exist.
+        """
+        if not template_name:
+            return ""
+
+        try:
+            template = get_template(template_name)
+        except TemplateDoesNotExist:
+            return ""
+
+        source = getattr(getattr(template, "template", None), "source", None)
+        if source is None:
+            source = template.origin.name  # pragma: no cover
+        return hashlib.sha256(source.encode()).hexdigest()
+
+    @staticmethod
+    def fingerprint(content_block, nested_fingerprints=None, nested_blocks=None):
+        """
+        Hash the template, template source and field values of the content block.  Nested content blocks are
+        included by their fingerprint, position and visibility.  Media is included by name.
+        :param nested_fingerprints: Optional dict of nested content block id to fingerprint, used in place of the
+        stored fingerprint.
+        :param nested_blocks: Optional dict of nested field id to nested content blocks, used in place of querying
+        the nested content blocks of each nested field.
+        :return: Hex digest.
+        """
+        nested_fingerprints = nested_fingerprints or {}
+        data = [
+            content_block.content_block_template.name,
+            content_block.template,
+            FingerprintServices.template_version(content_block.template),
+            content_block.css_class,
+        ]
+
+        for field in content_block.content_block_fields.all():
+            value = [field.template_field.key, field.field_type]
+            value += [str(getattr(field, attr)) for attr in FINGERPRINT_FIELD_ATTRS]
+
+            if field.field_type == ContentBlockFields.NESTED_FIELD:
+                for nested_block in (
+                    field.content_blocks.all()
+                    if nested_blocks is None
+                    else nested_blocks.get(field.id, [])
+                ):
+                    value.append(
+                        [
+                            nested_block.position,
+                            nested_block.visible,
+                            nested_fingerprints.get(nested_block.id)
+                            or nested_block.fingerprint
+                            or FingerprintServices.fingerprint(nested_block),
+                        ]
+                    )
+
+            data.append(value)
+
+        return hashlib.sha256(json.dumps(data).encode()).hexdigest()
+
+
 class CloneServices:
     """
     Services for cloning ContentBlock.
@@ -48,17 +222,1150 @@ class CloneServices:
     @staticmethod
     def clone_content_block(content_block, attrs=None):
         """
-        Clones the given content block and all content block fields.
+        Clones the given content block, its content block fields and nested content blocks.  Nested content blocks
+        and their fields are fetched in two queries however deeply they are nested.
+        """
+        nested_blocks = {}
+        for nested_block in ContentBlock.objects.descendants(
+            content_block
+        ).prefetch_related("content_block_fields"):
+            nested_blocks.setdefault(nested_block.parent_id, []).append(nested_block)
+
+        return CloneServices.clone_tree(content_block, nested_blocks, attrs=attrs)
+
+    @staticmethod
+    def clone_tree(content_block, nested_blocks, attrs=None):
+        """
+        Clones the given content block, its content block fields and the nested content blocks in nested_blocks.
+        :param nested_blocks: Dict of nested field id to nested content blocks.
         """
         new_content_block = content_block.make_clone(attrs=attrs)
+        nested_fingerprints = {}
 
         for field in content_block.content_block_fields.all():
             new_field = field.make_clone(attrs={"content_block": new_content_block})
 
             if field.template_field.field_type == ContentBlockFields.NESTED_FIELD:
-                for nested_block in field.content_blocks.all():
-                    CloneServices.clone_content_block(
-                        nested_block, attrs={"parent": new_field}
+                for nested_block in nested_blocks.get(field.id, []):
+                    new_nested_block = CloneServices.clone_tree(
+                        nested_block,
+                        nested_blocks,
+                        attrs={
+                            "parent": new_field,
+                            "root_id": new_content_block.root_id
+                            or new_content_block.id,
+                            "depth": new_content_block.depth + 1,
+                        },
                     )
+                    nested_fingerprints[nested_block.id] = new_nested_block.fingerprint
+
+        # The clone has the same values, so fingerprint the original to save querying the new fields.
+        new_content_block.fingerprint = FingerprintServices.fingerprint(
+            content_block,
+            nested_fingerprints=nested_fingerprints,
+            nested_blocks=nested_blocks,
+        )
+        new_content_block.save(update_fields=["fingerprint"])
 
         return new_content_block
+
+
+class PublishGenerationServices:
+    """
+    Services for the PublishGeneration of ContentBlockParentModel objects.
+    """
+
+    @staticmethod
+    def generation(parent):
+        """
+        :return: The publish generation of the parent, 0 if its content blocks have never changed.
+        """
+        return (
+            PublishGeneration.objects.filter(
+                content_type=ContentType.objects.get_for_model(parent),
+                object_id=parent.pk,
+            )
+            .values_list("generation", flat=True)
+            .first()
+            or 0
+        )
+
+    @staticmethod
+    def bump(parent):
+        """
+        Increment the publish generation of the parent.
+        """
+        content_type = ContentType.objects.get_for_model(parent)
+        updated = PublishGeneration.objects.filter(
+            content_type=content_type, object_id=parent.pk
+        ).update(generation=F("generation") + 1, mod_date=timezone.now())
+
+        if not updated:
+            _, created = PublishGeneration.objects.get_or_create(
+                content_type=content_type,
+                object_id=parent.pk,
+                defaults={"generation": 1},
+            )
+            if not created:
+                PublishGenerationServices.bump(parent)  # pragma: no cover
+
+        if (
+            isinstance(parent, ContentBlockCollection)
+            and settings.CONTENT_BLOCKS_COLLECTION_CACHE
+        ):
+            render_cache.delete_collection(parent.slug)
+            # Again after commit in case the old generation was cached before the transaction finished.
+            transaction.on_commit(lambda: render_cache.delete_collection(parent.slug))
+
+    @staticmethod
+    def parents(content_block, published=False):
+        """
+        Find the ContentBlockParentModel objects of the content block.  Nested content blocks are followed up to the
+        content block their parent belongs to.
+        :param published: Only find parents of published content blocks.
+        :return: List of parent objects.
+        """
+        content_block_id, draft = content_block.id, content_block.draft
+
+        if content_block.parent_id is not None:
+            row = (
+                ContentBlock.objects.filter(id=content_block.root_id)
+                .values_list("id", "draft")
+                .first()
+            )
+            if row is None:
+                return []
+            content_block_id, draft = row
+
+        if published and draft:
+            return []
+
+        parents = []
+        for model in PublishGenerationServices.parent_models():
+            parents += model._default_manager.filter(
+                content_blocks__id=content_block_id
+            )
+        return parents
+
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def parent_models():
+        """
+        :return: Tuple of the ContentBlockParentModel models.  Cached, the app registry doesn't change once loaded.
+        """
+        return tuple(
+            model
+            for model in apps.get_models()
+            if issubclass(model, ContentBlockParentModel)
+        )
+
+    @staticmethod
+    def bump_content_block(content_block):
+        """
+        Increment the publish generation of the parents of the content block.  Drafts aren't rendered on published
+        pages so their parents are left alone.
+        """
+        for parent in PublishGenerationServices.parents(content_block, published=True):
+            PublishGenerationServices.bump(parent)
+
+
+class ValidatorServices:
+    """
+    Services for the ETag and Last-Modified validators of pages rendering the published content blocks of a
+    ContentBlockParentModel.  Validators are computed with aggregate queries, content blocks are not loaded.
+    """
+
+    @staticmethod
+    def content_block_ids(parent):
+        """
+        :return: Ids of the visible published content blocks of the parent and their visible nested content blocks.
+        """
+        roots = parent.content_blocks.visible().values("id")
+        parent_ids, field_blocks = {}, {}
+        for content_block_id, parent_id, field_id in (
+            # Read from the same database as the subquery, visible() may be read from CONTENT_BLOCKS_READ_DATABASE.
+            ContentBlock.objects.using(roots.db)
+            .filter(Q(id__in=roots) | Q(root_id__in=roots))
+            .filter(visible=True)
+            .order_by("depth")
+            .values_list("id", "parent_id", "content_block_fields__id")
+        ):
+            parent_ids[content_block_id] = parent_id
+            field_blocks[field_id] = content_block_id
+
+        # Nested content blocks of hidden content blocks aren't shown.  Parents come before their nested content blocks
+        # so whether a parent is shown is known first.
+        shown = set()
+        for content_block_id, parent_id in parent_ids.items():
+            if parent_id is None or field_blocks.get(parent_id) in shown:
+                shown.add(content_block_id)
+
+        return list(shown)
+
+    @staticmethod
+    def model_choice_state(content_block_ids):
+        """
+        Objects chosen in model choice fields change the rendered html without a publish.  For each model find how
+        many of the chosen objects still exist and, if the model has an auto_now DateTimeField, when they were last
+        modified.
+        :return: Sorted list of (content type id, object ids, count, last modified) tuples.
+        """
+        chosen = {}
+        for content_type_id, object_id in (
+            ContentBlockField.objects.filter(
+                content_block_id__in=content_block_ids,
+                model_choice_object_id__isnull=False,
+            )
+            .values_list("model_choice_content_type_id", "model_choice_object_id")
+            .distinct()
+        ):
+            chosen.setdefault(content_type_id, set()).add(object_id)
+
+        state = []
+        for content_type_id, object_ids in sorted(chosen.items()):
+            model = ContentType.objects.get_for_id(content_type_id).model_class()
+            if model is None:
+                continue
+
+            aggregates = {"count": Count("pk")}
+            for field in model._meta.concrete_fields:
+                if isinstance(field, DateTimeField) and field.auto_now:
+                    aggregates["last_modified"] = Max(field.attname)
+                    break
+
+            result = model._default_manager.filter(pk__in=object_ids).aggregate(
+                **aggregates
+            )
+            state.append(
+                (
+                    content_type_id,
+                    sorted(object_ids),
+                    result["count"],
+                    result.get("last_modified"),
+                )
+            )
+
+        return state
+
+    @staticmethod
+    def validators(parent):
+        """
+        :return: Tuple of (etag, last_modified) for the published content blocks of the parent.
+        """
+        content_type = ContentType.objects.get_for_model(parent)
+        generation, generation_mod_date = PublishGeneration.objects.filter(
+            content_type=content_type, object_id=parent.pk
+        ).values_list("generation", "mod_date").first() or (0, None)
+
+        content_block_ids = ValidatorServices.content_block_ids(parent)
+        content_blocks = ContentBlock.objects.filter(
+            id__in=content_block_ids
+        ).aggregate(
+            count=Count("id"),
+            mod_date=Max("mod_date"),
+            template_mod_date=Max("content_block_template__mod_date"),
+        )
+        model_choice_state = ValidatorServices.model_choice_state(content_block_ids)
+
+        state = [
+            content_type.id,
+            parent.pk,
+            generation,
+            content_blocks["count"],
+            content_blocks["mod_date"],
+            content_blocks["template_mod_date"],
+            model_choice_state,
+        ]
+        etag = hashlib.md5(str(state).encode()).hexdigest()
+
+        dates = [
+            generation_mod_date,
+            content_blocks["mod_date"],
+            content_blocks["template_mod_date"],
+            *[last_modified for *_, last_modified in model_choice_state],
+        ]
+        last_modified = max([d for d in dates if d is not None], default=None)
+
+        return f'W/"{etag}"', last_modified
+
+    @staticmethod
+    def combined_validators(parents):
+        """
+        :param parents: Parents whose published content blocks are rendered on the same page, e.g. the page and the
+            collections rendered by its layout.
+        :return: Tuple of (etag, last_modified) which changes when the validators of any of the parents change.
+        """
+        validators = [ValidatorServices.validators(parent) for parent in parents]
+        if len(validators) == 1:
+            return validators[0]
+
+        etag = hashlib.md5(
+            "|".join(etag for etag, _ in validators).encode()
+        ).hexdigest()
+        last_modified = max(
+            [last_modified for _, last_modified in validators if last_modified],
+            default=None,
+        )
+        return f'W/"{etag}"', last_modified
+
+
+class CollectionServices:
+    """
+    Services for rendering ContentBlockCollections with the content_block_collection template tag.
+    """
+
+    template = "content_blocks/content_block_collection.html"
+
+    @staticmethod
+    def resolve(slug):
+        """
+        :return: Tuple of (id, publish generation) of the collection with the slug. The id is None if there is no
+            such collection.  Cached until the collection is saved, deleted or published.
+        """
+        key = render_cache.collection_key(slug)
+        resolved = render_cache.get(key)
+        if resolved is not None:
+            return resolved
+
+        collection_id = (
+            ContentBlockCollection.objects.using(read_database())
+            .filter(slug=slug)
+            .values_list("id", flat=True)
+            .first()
+        )
+        # The publish generation is read from the default database, a read database which hasn't caught up with a
+        # publish would have the old generation cached until the next publish.
+        publish_generation = (
+            PublishGeneration.objects.filter(
+                content_type=ContentType.objects.get_for_model(ContentBlockCollection),
+                object_id=collection_id,
+            )
+            .values_list("generation", flat=True)
+            .first()
+            or 0
+        )
+
+        resolved = (collection_id, publish_generation)
+        render_cache.set(key, resolved)
+        return resolved
+
+    @staticmethod
+    def render(slug, context, extra_context=None):
+        """
+        Render the collection with the slug from the cache.  The html is memoized for the rest of the request so
+        collections included more than once are rendered once.
+        :return: The html or None if collections should not be cached.
+        """
+        if (
+            not settings.CONTENT_BLOCKS_COLLECTION_CACHE
+            or context.get("cache_timeout") == 0
+        ):
+            return None
+
+        memo_key = render_cache.collection_memo_key(slug, context, extra_context or {})
+        memo = render_cache.memo
+        if memo is not None and memo_key in memo:
+            return memo[memo_key]
+
+        collection_id, publish_generation = CollectionServices.resolve(slug)
+        key = render_cache.collection_render_key(
+            memo_key, collection_id, publish_generation
+        )
+
+        def render():
+            collection_context = {
+                **context,
+                "slug": slug,
+                "content_block_collection_html": None,
+            }
+            collection = (
+                ContentBlockCollection.objects.using(read_database())
+                .filter(id=collection_id)
+                .first()
+            )
+            if collection is not None:
+                collection_context["content_block_collection"] = collection
+            return render_to_string(CollectionServices.template, collection_context)
+
+        html = mark_safe(
+            render_cache.fetch(
+                key,
+                publish_generation,
+                render_cache.get(key),
+                render,
+                timeout=render_cache.timeout(context),
+            )
+        )
+
+        if memo is not None:
+            memo[memo_key] = html
+        return html
+
+
+class ModelChoiceServices:
+    """
+    Services for invalidating the caches of content blocks which chose an object in a ModelChoiceField when the
+    object is saved or deleted.  Content block fields are found by the index on their model choice columns.
+    """
+
+    @staticmethod
+    def can_be_chosen(model):
+        """
+        :return: True if objects of the model can be chosen in model choice fields.  Checked against
+            CONTENT_BLOCKS_MODEL_CHOICES without touching the cache when it is set.
+        """
+        label = model._meta.concrete_model._meta.label_lower
+        if settings.CONTENT_BLOCKS_MODEL_CHOICES is not None:
+            return label in {
+                chosen.lower() for chosen in settings.CONTENT_BLOCKS_MODEL_CHOICES
+            }
+        return label in ModelChoiceServices.model_labels()
+
+    @staticmethod
+    def model_labels():
+        """
+        :return: Set of "app_label.model_name" labels of the models which can be chosen in model choice fields.
+            Cached until a content block template field is saved or deleted and memoized for the rest of the request,
+            so saving objects of other models costs no queries and at most one cache lookup per request.
+        """
+        memo = render_cache.memo
+        if memo is not None and render_cache.model_choice_key in memo:
+            return memo[render_cache.model_choice_key]
+
+        labels = render_cache.get(render_cache.model_choice_key)
+        if labels is None:
+            labels = {
+                f"{app_label}.{model}"
+                for app_label, model in ContentBlockTemplateField.objects.filter(
+                    model_choice_content_type__isnull=False
+                )
+                .values_list(
+                    "model_choice_content_type__app_label",
+                    "model_choice_content_type__model",
+                )
+                .distinct()
+            }
+            render_cache.set(render_cache.model_choice_key, labels)
+
+        if memo is not None:
+            memo[render_cache.model_choice_key] = labels
+        return labels
+
+    @staticmethod
+    def queryset(model):
+        """
+        :return: QuerySet used to fetch chosen objects of the model.  See CONTENT_BLOCKS_MODEL_CHOICE_QUERYSETS.
+        """
+        options = settings.CONTENT_BLOCKS_MODEL_CHOICE_QUERYSETS.get(
+            model._meta.label_lower, {}
+        )
+        queryset = model._default_manager.all()
+        if options.get("select_related"):
+            queryset = queryset.select_related(*options["select_related"])
+        if options.get("prefetch_related"):
+            queryset = queryset.prefetch_related(*options["prefetch_related"])
+        return queryset
+
+    @staticmethod
+    def prime(fields):
+        """
+        Fetch the chosen objects of the model choice fields with one query per model and cache them on the fields so
+        ``model_choice`` doesn't query for each field.
+        """
+        model_choice = ContentBlockField._meta.get_field("model_choice")
+        render_fields = [
+            field for field in fields if isinstance(field, ContentBlockRenderField)
+        ]
+        fields = [
+            field
+            for field in fields
+            if not isinstance(field, ContentBlockRenderField)
+            and not model_choice.is_cached(field)
+        ]
+
+        object_ids = {}
+        for content_type_id, object_id in [field.value for field in render_fields] + [
+            (field.model_choice_content_type_id, field.model_choice_object_id)
+            for field in fields
+        ]:
+            object_ids.setdefault(content_type_id, set()).add(object_id)
+
+        objects = {}
+        for content_type_id, ids in object_ids.items():
+            model = ContentType.objects.get_for_id(content_type_id).model_class()
+            if model is not None:
+                objects[content_type_id] = ModelChoiceServices.queryset(model).in_bulk(
+                    ids
+                )
+
+        for field in render_fields:
+            content_type_id, object_id = field.value
+            field.value = objects.get(content_type_id, {}).get(object_id)
+
+        for field in fields:
+            obj = objects.get(field.model_choice_content_type_id, {}).get(
+                field.model_choice_object_id
+            )
+            if obj is not None:
+                model_choice.set_cached_value(field, obj)
+
+    @staticmethod
+    def content_blocks(instance):
+        """
+        :return: QuerySet of content blocks with a model choice field set to the instance.
+        """
+        return (
+            ContentBlock.objects.filter(
+                content_block_fields__model_choice_content_type=ContentType.objects.get_for_model(
+                    instance
+                ),
+                content_block_fields__model_choice_object_id=instance.pk,
+            )
+            .only("id", "fingerprint", "parent_id", "root_id", "depth", "draft")
+            .distinct()
+        )
+
+    @staticmethod
+    def invalidate(instance):
+        """
+        Touch the render cache of the published content blocks which chose the instance and bump the publish
+        generation of their parents.
+        """
+        if not isinstance(instance.pk, int):
+            return
+
+        for content_block in ModelChoiceServices.content_blocks(instance):
+            if settings.CONTENT_BLOCKS_RENDER_CACHE:
+                render_cache.touch(content_block)
+
+            for parent in PublishGenerationServices.parents(
+                content_block, published=True
+            ):
+                PublishGenerationServices.bump(parent)
+
+
+class PrefetchServices:
+    """
+    Services for fetching everything needed to render many content blocks in a few queries.  Content blocks rendered
+    together by render_content_blocks or fetched by ContentBlockQuerySet.render_batch are batched and the first of
+    them to have a field read from its context resolves the whole batch: nested content blocks are prefetched a level
+    at a time and the objects chosen in model choice fields at every level are fetched with one query per model.
+    Content blocks served from a cache never resolve their batch.
+    """
+
+    @staticmethod
+    def batch(content_blocks):
+        """
+        Batch the content blocks which aren't already in a batch.
+        """
+        batch = [
+            content_block
+            for content_block in content_blocks
+            if not hasattr(content_block, "_content_batch")
+        ]
+        for content_block in batch:
+            content_block._content_batch = batch
+
+    @staticmethod
+    def resolve(content_block):
+        """
+        Prefetch the batch of the content block unless it has been already.
+        """
+        if not getattr(content_block, "_content_resolved", False):
+            PrefetchServices.prefetch(
+                getattr(content_block, "_content_batch", [content_block])
+            )
+
+    @staticmethod
+    def prefetch(content_blocks):
+        """
+        Prefetch the fields and nested content blocks of the content blocks and fetch the objects chosen in their
+        model choice fields.
+        """
+        level = list(content_blocks)
+        model_choice_fields = []
+
+        while level:
+            PrefetchServices.prefetch_fields(level)
+            nested_fields = {}
+
+            for content_block in level:
+                content_block._content_resolved = True
+                render_fields = getattr(content_block, "render_fields", None)
+                fields = (
+                    content_block.content_block_fields.all()
+                    if render_fields is None
+                    else render_fields.values()
+                )
+                for field in fields:
+                    if field.field_type == ContentBlockFields.NESTED_FIELD:
+                        nested_fields.setdefault(content_block._state.db, []).append(
+                            field
+                        )
+                    elif field.field_type == ContentBlockFields.MODEL_CHOICE_FIELD:
+                        if isinstance(field, ContentBlockRenderField):
+                            if field.value[1] is None:
+                                field.value = None
+                            else:
+                                model_choice_fields.append(field)
+                        elif field.model_choice_object_id is not None:
+                            model_choice_fields.append(field)
+
+            for using, fields in nested_fields.items():
+                PrefetchServices.prefetch_nested(fields, using=using)
+            level = [
+                content_block
+                for fields in nested_fields.values()
+                for field in fields
+                for content_block in (
+                    field.value
+                    if isinstance(field, ContentBlockRenderField)
+                    else field.content_blocks.all()
+                )
+                if not getattr(content_block, "_content_resolved", False)
+            ]
+
+        ModelChoiceServices.prime(model_choice_fields)
+
+    @staticmethod
+    def prefetch_nested(fields, using=None):
+        """
+        Prefetch the nested content blocks of nested fields.  ContentBlockRenderFields get a list of the nested
+        content blocks.
+        :param using: Database alias the content blocks of the fields were read from.  Nested content blocks are read
+        from the same database so previews of drafts don't read from CONTENT_BLOCKS_READ_DATABASE.
+        """
+        queryset = ContentBlock.objects.nested().using(using)
+        render_fields = [
+            field for field in fields if isinstance(field, ContentBlockRenderField)
+        ]
+        prefetch_related_objects(
+            [
+                field
+                for field in fields
+                if not isinstance(field, ContentBlockRenderField)
+            ],
+            Prefetch("content_blocks", queryset=queryset),
+        )
+        if not render_fields:
+            return
+
+        nested = {}
+        for content_block in queryset.filter(
+            parent_id__in=[field.id for field in render_fields if field.id is not None]
+        ):
+            nested.setdefault(content_block.parent_id, []).append(content_block)
+
+        for field in render_fields:
+            # Virtual fields, see ContentBlock.fields, have no id and no nested content blocks.
+            field.value = nested.get(field.id, [])
+
+    @staticmethod
+    def prefetch_render_fields(partial, render_fields, missing):
+        """
+        Add the fields of the content blocks to ``render_fields`` with only the columns their plans need.  Keys of
+        fields with an unexpected type are added to ``missing``.
+        """
+        if not partial:
+            return
+
+        plans = {
+            content_block.content_block_template_id: plan
+            for content_block, plan in partial.items()
+        }
+        condition = functools.reduce(
+            operator.or_,
+            [
+                Q(
+                    content_block__content_block_template_id=template_id,
+                    template_field__key__in=keys,
+                )
+                for template_id, (keys, _, _) in plans.items()
+            ],
+        )
+        columns = sorted(set().union(*[columns for _, columns, _ in plans.values()]))
+        rows = (
+            ContentBlockField.objects.using(next(iter(partial))._state.db)
+            .filter(condition, content_block_id__in={cb.id for cb in partial})
+            .values_list(
+                "id", "content_block_id", "template_field__key", "field_type", *columns
+            )
+            .iterator()
+        )
+        for field_id, content_block_id, key, field_type, *values in rows:
+            if not set(
+                TemplateAnalysisServices.FIELD_TYPE_COLUMNS.get(field_type, [None])
+            ).issubset(columns):
+                # The type of the field isn't one the template fields said to expect, load every field instead.
+                missing.setdefault(content_block_id, set()).add(key)
+                continue
+            render_fields.setdefault(content_block_id, {})[
+                key
+            ] = ContentBlockRenderField(
+                field_id,
+                key,
+                field_type,
+                TemplateAnalysisServices.value(field_type, dict(zip(columns, values))),
+            )
+
+    @staticmethod
+    def prefetch_fields(content_blocks):
+        """
+        Prefetch the fields of the content blocks.  Content blocks with a template which has been analysed only get
+        the fields their template uses, with only the columns those fields need, in ``render_fields``.
+        """
+        content_blocks = list(content_blocks)
+        versions = TemplateAnalysisServices.template_fields_versions(
+            {
+                content_block.content_block_template_id
+                for content_block in content_blocks
+            }
+        )
+        full, partial, plans = [], {}, {}
+        for content_block in content_blocks:
+            # Planned once per template rather than once per content block.
+            content_block_template = content_block.content_block_template
+            if content_block_template.id not in plans:
+                plans[content_block_template.id] = TemplateAnalysisServices.plan(
+                    content_block_template, versions[content_block_template.id]
+                )
+            plan = plans[content_block_template.id]
+            if plan is None or "content_block_fields" in getattr(
+                content_block, "_prefetched_objects_cache", {}
+            ):
+                full.append(content_block)
+            else:
+                partial[content_block] = plan
+
+        prefetch_related_objects(full, "content_block_fields")
+        prefetch_related_objects(
+            [content_block.content_block_template for content_block in full],
+            "content_block_template_fields",
+        )
+
+        if not partial:
+            return
+
+        render_fields, missing = {}, {}
+        published = {}
+        if settings.CONTENT_BLOCKS_PUBLISHED_FIELDS:
+            # Read from the database the content blocks were, see CONTENT_BLOCKS_READ_DATABASE.
+            published = dict(
+                PublishedFields.objects.using(next(iter(partial))._state.db)
+                .filter(content_block_id__in=[cb.id for cb in partial if not cb.draft])
+                .values_list("content_block_id", "fields")
+            )
+        for content_block, (keys, _, _) in partial.items():
+            if content_block.id in published:
+                render_fields[content_block.id] = {
+                    key: ContentBlockRenderField(
+                        field_id,
+                        key,
+                        field_type,
+                        TemplateAnalysisServices.value(field_type, row),
+                    )
+                    for key, (field_id, field_type, row) in published[
+                        content_block.id
+                    ].items()
+                    if key in keys
+                }
+
+        PrefetchServices.prefetch_render_fields(
+            {cb: plan for cb, plan in partial.items() if cb.id not in published},
+            render_fields,
+            missing,
+        )
+
+        for content_block, (keys, _, field_types) in partial.items():
+            content_block.render_keys = keys - missing.get(content_block.id, set())
+            content_block.render_fields = render_fields.setdefault(content_block.id, {})
+            for key, field_type in field_types.items():
+                if (
+                    key in content_block.render_keys
+                    and key not in content_block.render_fields
+                ):
+                    # The template field was added after the content block was created, see ContentBlock.fields.
+                    content_block.render_fields[key] = ContentBlockRenderField(
+                        None,
+                        key,
+                        field_type,
+                        TemplateAnalysisServices.value(field_type, {}),
+                    )
+
+
+class PublishedFieldsServices:
+    """
+    Services for the read only copies of the fields of published content blocks, see
+    CONTENT_BLOCKS_PUBLISHED_FIELDS.
+    """
+
+    @staticmethod
+    def store(content_blocks):
+        """
+        Copy the fields of the content blocks and their nested content blocks to PublishedFields.
+        """
+        ids = list(
+            ContentBlock.objects.filter(
+                id__in=[content_block.id for content_block in content_blocks]
+            )
+            .trees()
+            .values_list("id", flat=True)
+        )
+        columns = sorted(
+            set().union(*TemplateAnalysisServices.FIELD_TYPE_COLUMNS.values())
+        )
+        rows = (
+            ContentBlockField.objects.filter(content_block_id__in=ids)
+            .order_by()
+            .values_list(
+                "id", "content_block_id", "template_field__key", "field_type", *columns
+            )
+            .iterator()
+        )
+        fields = {content_block_id: {} for content_block_id in ids}
+        for field_id, content_block_id, key, field_type, *values in rows:
+            row = dict(zip(columns, values))
+            fields[content_block_id][key] = [
+                field_id,
+                field_type,
+                {
+                    column: row[column]
+                    for column in TemplateAnalysisServices.FIELD_TYPE_COLUMNS.get(
+                        field_type, ()
+                    )
+                },
+            ]
+
+        with transaction.atomic():
+            PublishedFieldsServices.forget(ids)
+            PublishedFields.objects.bulk_create(
+                [
+                    PublishedFields(content_block_id=content_block_id, fields=value)
+                    for content_block_id, value in fields.items()
+                ]
+            )
+
+    @staticmethod
+    def forget(content_block_ids):
+        """
+        Delete the copies of the fields of the content blocks, they are rendered from their fields until published
+        again.
+        """
+        PublishedFields.objects.filter(content_block_id__in=content_block_ids).delete()
+
+
+class TemplateAnalysisServices:
+    """
+    Services for finding which fields a content block template uses by walking the compiled template.  Templates
+    are analysed once each time they are compiled.  When the analysis can't be sure, e.g. the template passes the
+    whole of content_block to another tag or uses tags it doesn't know, every field is used.
+    """
+
+    # Columns needed for the value of each field type.
+    FIELD_TYPE_COLUMNS = {
+        ContentBlockFields.TEXT_FIELD: ("text",),
+        ContentBlockFields.CONTENT_FIELD: ("content",),
+        ContentBlockFields.IMAGE_FIELD: ("image",),
+        ContentBlockFields.NESTED_FIELD: (),
+        ContentBlockFields.CHECKBOX_FIELD: ("checkbox",),
+        ContentBlockFields.CHOICE_FIELD: ("choice",),
+        ContentBlockFields.MODEL_CHOICE_FIELD: (
+            "model_choice_content_type",
+            "model_choice_object_id",
+        ),
+        ContentBlockFields.FILE_FIELD: ("file",),
+        ContentBlockFields.VIDEO_FIELD: ("video",),
+        ContentBlockFields.EMBEDDED_VIDEO_FIELD: ("embedded_video",),
+        ContentBlockFields.IFRAME_FIELD: ("iframe",),
+    }
+    FILE_COLUMNS = {"image", "file", "video"}
+
+    # Nodes which only read the context through their expressions and child nodelists.
+    KNOWN_NODES = (
+        TextNode,
+        VariableNode,
+        CacheNode,
+        StaticNode,
+        loader_tags.BlockNode,
+        defaulttags.AutoEscapeControlNode,
+        defaulttags.CommentNode,
+        defaulttags.CsrfTokenNode,
+        defaulttags.CycleNode,
+        defaulttags.FilterNode,
+        defaulttags.FirstOfNode,
+        defaulttags.ForNode,
+        defaulttags.IfChangedNode,
+        defaulttags.IfNode,
+        defaulttags.LoadNode,
+        defaulttags.NowNode,
+        defaulttags.RegroupNode,
+        defaulttags.SpacelessNode,
+        defaulttags.TemplateTagNode,
+        defaulttags.URLNode,
+        defaulttags.VerbatimNode,
+        defaulttags.WidthRatioNode,
+        defaulttags.WithNode,
+    )
+
+    # Attributes of content_block_object which don't read fields.
+    OBJECT_ATTRS = {"id", "pk", "fingerprint", "css_class", "name", "position"}
+
+    # Template tags of this app which are given the context but don't read content_block from it.
+    CONTEXT_SAFE_MODULES = {"content_blocks.templatetags.content_blocks"}
+
+    class Undecidable(Exception):
+        pass
+
+    @staticmethod
+    def compiled_template(template_name):
+        """
+        :return: The compiled django Template or None.
+        """
+        try:
+            template = get_template(template_name)
+        except TemplateDoesNotExist:
+            return None
+
+        template = getattr(template, "template", None)
+        if getattr(template, "nodelist", None) is None:
+            return None
+        return template
+
+    @staticmethod
+    def used_keys(template_name):
+        """
+        :return: Frozenset of the keys of content_block used by the template or None if every field may be used.
+        """
+        if not template_name:
+            return None
+
+        template = TemplateAnalysisServices.compiled_template(template_name)
+        if template is None:
+            return None
+        return TemplateAnalysisServices.template_keys(template)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def template_keys(template):
+        """
+        :return: used_keys of a compiled django Template.  Cached by template, the cached template loader compiles a
+        template again when its source changes.
+        """
+        return TemplateAnalysisServices.analyse(template.nodelist, {template.name})
+
+    @staticmethod
+    def analyse(nodelist, seen=frozenset()):
+        """
+        :return: Frozenset of the keys of content_block used by the nodes or None if every field may be used.
+        """
+        keys = set()
+        try:
+            TemplateAnalysisServices.walk(nodelist, keys, set(seen))
+        except TemplateAnalysisServices.Undecidable:
+            return None
+        return frozenset(keys)
+
+    @staticmethod
+    def plan(content_block_template, version=None):
+        """
+        :param version: Version of the template fields, see template_fields_versions.  Looked up when not given.
+        :return: Tuple of (keys, columns, field_types) to load for content blocks of the template or None to load
+        every field.  field_types is a dict of the used keys of the template fields to their field type.
+        """
+        keys = TemplateAnalysisServices.used_keys(content_block_template.template)
+        if keys is None:
+            return None
+        if version is None:
+            version = TemplateAnalysisServices.template_fields_versions(
+                [content_block_template.id]
+            )[content_block_template.id]
+        return TemplateAnalysisServices.field_plan(
+            content_block_template.id, keys, version
+        )
+
+    @staticmethod
+    def template_fields_versions(content_block_template_ids):
+        """
+        Plans are cached in each process by the version of the template fields in the shared cache, so every process
+        plans again when a template field is saved or deleted, see forget_template_plans.  Versions are memoized for
+        the rest of the request.
+        :return: Dict of content block template id to the version of its template fields.
+        """
+        memo = render_cache.memo
+        if memo is None:
+            memo = {}
+        keys = {
+            content_block_template_id: render_cache.template_fields_key(
+                content_block_template_id
+            )
+            for content_block_template_id in content_block_template_ids
+        }
+
+        missing = [key for key in keys.values() if key not in memo]
+        if missing:
+            found = render_cache.get_many(missing)
+            for key in missing:
+                if key not in found:
+                    # Started from the time so a version lost from the cache is never reused.  add keeps a version
+                    # another process started first.
+                    render_cache.cache.add(key, time.time_ns(), timeout=None)
+                    found[key] = render_cache.cache.get(key, time.time_ns())
+            memo.update(found)
+
+        return {
+            content_block_template_id: memo[key]
+            for content_block_template_id, key in keys.items()
+        }
+
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def field_plan(content_block_template_id, keys, version):
+        """
+        :return: plan for the keys of the content block template.  Cached until the version of the template fields
+        changes.
+        """
+        field_types = dict(
+            ContentBlockTemplateField.objects.filter(
+                content_block_template_id=content_block_template_id, key__in=keys
+            ).values_list("key", "field_type")
+        )
+        columns = set()
+        for field_type in field_types.values():
+            columns.update(
+                TemplateAnalysisServices.FIELD_TYPE_COLUMNS.get(field_type, ())
+            )
+        return keys, frozenset(columns), field_types
+
+    @staticmethod
+    def value(field_type, row):
+        """
+        :param row: Dict of the columns fetched for a field.
+        :return: The value of a ContentBlockRenderField.  Files are wrapped the same way as the model field would.
+        Model choice fields get a tuple of the content type and object ids and nested fields get None until
+        PrefetchServices fetches them.
+        """
+        columns = TemplateAnalysisServices.FIELD_TYPE_COLUMNS.get(field_type, ())
+        if not columns:
+            return None
+        if len(columns) > 1:
+            return tuple(row.get(column) for column in columns)
+
+        column = columns[0]
+        model_field = ContentBlockField._meta.get_field(column)
+        # Virtual fields, see ContentBlock.fields, have no row and get the empty value of the column.
+        value = row[column] if column in row else model_field.get_default()
+        if column in TemplateAnalysisServices.FILE_COLUMNS:
+            return model_field.attr_class(None, model_field, value or "")
+        return value
+
+    @staticmethod
+    def walk(nodelist, keys, seen, shadowed=False):
+        """
+        Add the keys of content_block used by the nodes to keys.
+        :param seen: Names of templates already walked, to stop include loops.
+        :param shadowed: True inside a for or with tag which replaces content_block.
+        :raises Undecidable: If the fields used can't be determined.
+        """
+        for node in nodelist:
+            if isinstance(node, loader_tags.ExtendsNode):
+                TemplateAnalysisServices.walk_template(node.parent_name, keys, seen)
+            elif isinstance(node, loader_tags.IncludeNode):
+                TemplateAnalysisServices.walk_template(node.template, keys, seen)
+            elif isinstance(node, (SimpleNode, InclusionNode)):
+                if (
+                    node.takes_context
+                    and node.func.__module__
+                    not in TemplateAnalysisServices.CONTEXT_SAFE_MODULES
+                ):
+                    raise TemplateAnalysisServices.Undecidable
+            elif not isinstance(node, TemplateAnalysisServices.KNOWN_NODES):
+                raise TemplateAnalysisServices.Undecidable
+
+            for value in vars(node).values():
+                TemplateAnalysisServices.check(value, keys, shadowed)
+
+            if isinstance(node, defaulttags.IfNode):
+                for condition, child_nodelist in node.conditions_nodelists:
+                    TemplateAnalysisServices.check_condition(condition, keys, shadowed)
+                    TemplateAnalysisServices.walk(child_nodelist, keys, seen, shadowed)
+                continue
+
+            child_shadowed = shadowed
+            if isinstance(node, defaulttags.ForNode):
+                child_shadowed = shadowed or "content_block" in node.loopvars
+            elif isinstance(node, defaulttags.WithNode):
+                child_shadowed = shadowed or "content_block" in node.extra_context
+
+            for attr in node.child_nodelists:
+                child_nodelist = getattr(node, attr, None)
+                if child_nodelist:
+                    TemplateAnalysisServices.walk(
+                        child_nodelist, keys, seen, child_shadowed
+                    )
+
+    @staticmethod
+    def walk_template(filter_expression, keys, seen):
+        """
+        Walk an extended or included template.  Only templates with a constant name can be walked.
+        """
+        name = getattr(filter_expression, "var", None)
+        if not isinstance(name, str) or filter_expression.filters:
+            raise TemplateAnalysisServices.Undecidable
+        if name in seen:
+            return
+
+        template = TemplateAnalysisServices.compiled_template(name)
+        if template is None:
+            raise TemplateAnalysisServices.Undecidable
+        TemplateAnalysisServices.walk(template.nodelist, keys, seen | {name})
+
+    @staticmethod
+    def check_condition(condition, keys, shadowed):
+        """
+        Check the expressions of an if tag condition, a tree of operators with literals at the leaves.
+        """
+        if condition is None:
+            return
+        TemplateAnalysisServices.check(
+            getattr(condition, "value", None), keys, shadowed
+        )
+        for attr in ["first", "second"]:
+            TemplateAnalysisServices.check_condition(
+                getattr(condition, attr, None), keys, shadowed
+            )
+
+    @staticmethod
+    def check(value, keys, shadowed):
+        """
+        Add the keys of content_block used by a node attribute, which may be a filter expression or a collection of
+        them.
+        """
+        if isinstance(value, (list, tuple)):
+            for item in value:
+                TemplateAnalysisServices.check(item, keys, shadowed)
+            return
+        if isinstance(value, dict):
+            for item in value.values():
+                TemplateAnalysisServices.check(item, keys, shadowed)
+            return
+        if not isinstance(value, FilterExpression):
+            return
+
+        variables = [value.var] + [
+            arg for _, args in value.filters for is_variable, arg in args if is_variable
+        ]
+        for variable in variables:
+            if not isinstance(variable, Variable) or not variable.lookups:
+                continue
+
+            name, *lookups = variable.lookups
+            if name == "content_block" and not shadowed:
+                if not lookups or lookups[0] in ["items", "keys", "values"]:
+                    raise TemplateAnalysisServices.Undecidable
+                keys.add(lookups[0])
+            elif name == "content_block_object":
+                if (
+                    not lookups
+                    or lookups[0] not in TemplateAnalysisServices.OBJECT_ATTRS
+                ):
+                    raise TemplateAnalysisServices.Undecidable
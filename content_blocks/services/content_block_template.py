@@ -1,21 +1,25 @@
 """
-Functions to import and export (from/to JSON)
+Functions to import and export (from/to JSON) and delete content block template fields
 """
 import itertools
+import logging
 from pathlib import Path
 
 from django.core import serializers
 from django.core.management import call_command
 from django.db import transaction
 
+from content_blocks.conf import settings
 from content_blocks.models import (
-    ContentBlock,
     ContentBlockField,
     ContentBlockTemplate,
     ContentBlockTemplateField,
+    TemplateFieldDeletion,
 )
 from content_blocks.signals import post_import
 
+logger = logging.getLogger(__name__)
+
 
 class ImportExportServices:
     """
@@ -48,41 +52,26 @@ class ImportExportServices:
         )
 
     # Import ContentBlockTemplate
-    @staticmethod
-    def add_new_content_block_template_field(content_block_template_field):
-        """
-        Add ContentBlockField object for the new ContentBlockTemplateField.
-        """
-        content_blocks = ContentBlock.objects.filter(
-            content_block_template=content_block_template_field.content_block_template
-        )
-
-        # Create a new field for existing content blocks
-        for content_block in content_blocks:
-            ContentBlockField.objects.create(
-                template_field=content_block_template_field,
-                content_block=content_block,
-                field_type=content_block_template_field.field_type,
-            )
-
     @staticmethod
     def delete_old_content_block_template_fields(imported_pks):
         """
-        For each ContentBlockTemplate specified in the json import delete any related ContentBlockTemplateField
-        that is not specified in the json.
+        For each ContentBlockTemplate specified in the json import queue any related ContentBlockTemplateField
+        that is not specified in the json for deletion.
         """
-        ContentBlockTemplateField.objects.filter(
+        for template_field in ContentBlockTemplateField.objects.filter(
             content_block_template_id__in=imported_pks[ContentBlockTemplate],
         ).exclude(
             id__in=imported_pks[ContentBlockTemplateField],
-        ).delete()
+        ):
+            TemplateFieldDeletionServices.queue(template_field)
 
     @staticmethod
     def import_content_block_templates(stream_or_string, verbosity=0):
         """
         Takes a stream or string and imports it.  Syncs ContentBlockField for ContentBlockTemplate imported by
-        deleting ContentBlockField which aren't in the imported data but are in the database. And by creating
-        ContentBlockField for ContentBlockTemplateField which are in the imported data but aren't in the database.
+        deleting ContentBlockField which aren't in the imported data but are in the database.  ContentBlockTemplateField
+        which are in the imported data but aren't in the database are virtual fields of existing content blocks until a
+        value is saved, see ContentBlock.fields.
         :param verbosity: verbosity option passed to called commands defaults to 0.
         :param stream_or_string:
         """
@@ -94,19 +83,8 @@ class ImportExportServices:
                     # Ignore any objects that aren't ContentBlockTemplate or ContentBlockTemplateField
                     continue
 
-                created = obj.object.pk is None
-                if not created:
-                    # Double check because tests show the above is not always enough
-                    model = type(obj.object)
-                    created = not model.objects.filter(pk=obj.object.pk).exists()
-
                 obj.save()
 
-                if created and isinstance(obj.object, ContentBlockTemplateField):
-                    ImportExportServices.add_new_content_block_template_field(
-                        obj.object
-                    )
-
                 imported_pks[obj.object.__class__].append(obj.object.pk)
 
             ImportExportServices.delete_old_content_block_template_fields(imported_pks)
@@ -128,3 +106,131 @@ class ImportExportServices:
 
         with filepath.open() as file:
             ImportExportServices.import_content_block_templates(file, verbosity)
+
+
+class TemplateFieldDeletionServices:
+    """
+    Service for deleting ContentBlockTemplateField.  Deleting a template field deletes the ContentBlockField of every
+    content block using it, removing their media and nested content blocks, so this is done in chunks outside the
+    request.
+    """
+
+    @staticmethod
+    def queue(template_field):
+        """
+        Hide the template field and its content block fields and queue them for deletion.
+        :return: The TemplateFieldDeletion.
+        """
+        with transaction.atomic():
+            template_field.deleting = True
+            template_field.save(update_fields=["deleting"])
+            deletion = TemplateFieldDeletion.objects.create(
+                template_field=template_field,
+                name=f"{template_field.content_block_template} - {template_field}"[
+                    :255
+                ],
+                total=ContentBlockField._base_manager.filter(
+                    template_field=template_field
+                ).count(),
+            )
+
+        if not settings.CONTENT_BLOCKS_DEFER_TEMPLATE_FIELD_DELETION:
+            transaction.on_commit(lambda: TemplateFieldDeletionServices.run(deletion))
+
+        return deletion
+
+    @staticmethod
+    def run_chunk(deletion_id, chunk_size):
+        """
+        Delete the next chunk of content block fields in a transaction.  The template field is deleted once it has no
+        content block fields left.
+        :return: The updated TemplateFieldDeletion.
+        """
+        with transaction.atomic():
+            # Locked so chunks aren't deleted twice when more than one process runs deletions.
+            deletion = TemplateFieldDeletion.objects.select_for_update().get(
+                id=deletion_id
+            )
+            if deletion.status == TemplateFieldDeletion.Status.DONE:
+                return deletion
+
+            ids = list(
+                ContentBlockField._base_manager.filter(
+                    template_field_id=deletion.template_field_id,
+                    id__gt=deletion.last_id,
+                )
+                .order_by("id")
+                .values_list("id", flat=True)[:chunk_size]
+            )
+
+            if ids:
+                # Deleted one by one by the collector so cleanup_media and other pre_delete receivers run.
+                ContentBlockField._base_manager.filter(id__in=ids).delete()
+                deletion.last_id = ids[-1]
+                deletion.processed += len(ids)
+                deletion.status = TemplateFieldDeletion.Status.RUNNING
+            else:
+                ContentBlockTemplateField._base_manager.filter(
+                    id=deletion.template_field_id
+                ).delete()
+                deletion.template_field = None
+                deletion.status = TemplateFieldDeletion.Status.DONE
+
+            deletion.error = ""
+            deletion.save()
+
+        return deletion
+
+    @staticmethod
+    def run(deletion, chunk_size=None, progress=None):
+        """
+        Delete the content block fields and template field of a TemplateFieldDeletion.  Resumes from the last chunk
+        deleted if the deletion was interrupted.
+        :param chunk_size: Defaults to CONTENT_BLOCKS_TEMPLATE_FIELD_DELETION_CHUNK_SIZE.
+        :param progress: Optional callable which is passed the TemplateFieldDeletion after each chunk.
+        :return: The updated TemplateFieldDeletion.
+        """
+        chunk_size = (
+            chunk_size or settings.CONTENT_BLOCKS_TEMPLATE_FIELD_DELETION_CHUNK_SIZE
+        )
+
+        while deletion.status != TemplateFieldDeletion.Status.DONE:
+            try:
+                deletion = TemplateFieldDeletionServices.run_chunk(
+                    deletion.id, chunk_size
+                )
+            except Exception as e:  # noqa
+                logger.exception(f"Could not delete {deletion}.")
+                TemplateFieldDeletion.objects.filter(id=deletion.id).update(
+                    status=TemplateFieldDeletion.Status.FAILED, error=str(e)
+                )
+                deletion.refresh_from_db()
+                return deletion
+
+            if progress:
+                progress(deletion)
+
+        return deletion
+
+    @staticmethod
+    def run_all(chunk_size=None, retry_failed=False, progress=None):
+        """
+        Run every TemplateFieldDeletion which isn't done, oldest first.
+        :param retry_failed: Also run deletions which failed.
+        :return: List of the TemplateFieldDeletion run.
+        """
+        statuses = [
+            TemplateFieldDeletion.Status.PENDING,
+            TemplateFieldDeletion.Status.RUNNING,
+        ]
+        if retry_failed:
+            statuses.append(TemplateFieldDeletion.Status.FAILED)
+
+        return [
+            TemplateFieldDeletionServices.run(
+                deletion, chunk_size=chunk_size, progress=progress
+            )
+            for deletion in TemplateFieldDeletion.objects.filter(
+                status__in=statuses
+            ).order_by("id")
+        ]
@@ -0,0 +1,311 @@
+"""
+Services for images used by ImageField.
+"""
+import io
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from hashlib import md5
+from pathlib import PurePosixPath
+
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from content_blocks.conf import settings
+from content_blocks.models import (
+    ContentBlock,
+    ContentBlockField,
+    ContentBlockFields,
+    ImageRendition,
+    image_storage,
+)
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS_DIR = "content-blocks/renditions"
+
+FORMAT_EXTENSIONS = {"JPEG": "jpg", "WEBP": "webp", "PNG": "png", "GIF": "gif"}
+
+
+def render_renditions(data, widths, image_format=None, quality=80):
+    """
+    Resize image data to each of the given widths.  Images are never upscaled, widths larger than the original are
+    replaced with the original width.
+    This is a module level function so that it can be sent to a process pool.
+    :param data: Bytes of the original image.
+    :param widths: Iterable of widths in pixels.
+    :param image_format: Pillow format name to encode with, defaults to the format of the original.
+    :param quality: Encoder quality for lossy formats.
+    :return: List of (width, height, format, bytes) tuples.
+    """
+    with Image.open(io.BytesIO(data)) as original:
+        image_format = (image_format or original.format or "PNG").upper()
+        image = ImageOps.exif_transpose(original)
+
+        if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        original_width, original_height = image.size
+        renditions = []
+
+        for width in sorted({min(w, original_width) for w in widths}):
+            height = max(1, round(original_height * width / original_width))
+            resized = (
+                image
+                if width == original_width
+                else image.resize((width, height), Image.LANCZOS)
+            )
+            buffer = io.BytesIO()
+            resized.save(buffer, format=image_format, quality=quality)
+            renditions.append((width, height, image_format, buffer.getvalue()))
+
+    return renditions
+
+
+class RenditionServices:
+    """
+    Services for generating and finding image renditions.
+    Renditions are defined by the named specs in CONTENT_BLOCKS_IMAGE_RENDITIONS.
+    """
+
+    @staticmethod
+    def can_render(name):
+        """
+        :return: True if renditions can be generated for the image name. SVGs are not rasterised.
+        """
+        return bool(name) and PurePosixPath(name).suffix.lower() != ".svg"
+
+    @staticmethod
+    def rendition_name(name, spec, width, image_format):
+        """
+        :return: The storage name for a rendition of the image name.
+        """
+        extension = FORMAT_EXTENSIONS.get(image_format, image_format.lower())
+        stem = PurePosixPath(name).with_suffix("")
+        return f"{RENDITIONS_DIR}/{spec}/{stem}-{width}w.{extension}"
+
+    @staticmethod
+    def render_files(name, specs, process_pool=None):
+        """
+        Read the image from storage, generate renditions for each spec and save them to storage.
+        Does no database work, so it is safe to run in a worker thread.
+        :param process_pool: Optional executor used to resize and encode.
+        :return: List of dicts suitable for creating ImageRendition objects.
+        """
+        storage = image_storage()
+
+        with storage.open(name) as f:
+            data = f.read()
+
+        files = []
+        for spec in specs:
+            spec_settings = settings.CONTENT_BLOCKS_IMAGE_RENDITIONS[spec]
+            args = (
+                data,
+                spec_settings["widths"],
+                spec_settings.get("format"),
+                settings.CONTENT_BLOCKS_RENDITION_QUALITY,
+            )
+            if process_pool is not None:
+                renditions = process_pool.submit(render_renditions, *args).result()
+            else:
+                renditions = render_renditions(*args)
+
+            for width, height, image_format, content in renditions:
+                rendition_name = RenditionServices.rendition_name(
+                    name, spec, width, image_format
+                )
+                if storage.exists(rendition_name):
+                    storage.delete(rendition_name)
+
+                files.append(
+                    {
+                        "source": name,
+                        "spec": spec,
+                        "width": width,
+                        "height": height,
+                        "format": image_format,
+                        "name": storage.save(rendition_name, ContentFile(content)),
+                    }
+                )
+
+        return files
+
+    @staticmethod
+    def record(name, specs, files):
+        """
+        Record generated rendition files, replacing any existing renditions for the given specs.
+        :return: List of ImageRendition objects.
+        """
+        ImageRendition.objects.filter(source=name, spec__in=specs).exclude(
+            name__in=[f["name"] for f in files]
+        ).delete()
+
+        return [
+            ImageRendition.objects.update_or_create(
+                source=f["source"], spec=f["spec"], width=f["width"], defaults=f
+            )[0]
+            for f in files
+        ]
+
+    @staticmethod
+    def generate(name, specs=None):
+        """
+        Generate renditions for a single image in this thread.
+        :param specs: List of spec names, defaults to all specs.
+        :return: List of ImageRendition objects.
+        """
+        specs = specs or list(settings.CONTENT_BLOCKS_IMAGE_RENDITIONS)
+        files = RenditionServices.render_files(name, specs)
+        return RenditionServices.record(name, specs, files)
+
+    @staticmethod
+    def generate_many(names, specs=None, force=False):
+        """
+        Generate renditions for many images using a pool of workers.
+        Storage reads and writes are done in a thread pool, resizing and encoding is done in the same threads or in a
+        process pool depending on CONTENT_BLOCKS_RENDITION_EXECUTOR.  Database writes are done in this thread.
+        :param names: Iterable of image names.
+        :param specs: List of spec names, defaults to all specs.
+        :param force: Regenerate renditions which already exist.
+        :return: Number of images renditions were generated for.
+        """
+        specs = specs or list(settings.CONTENT_BLOCKS_IMAGE_RENDITIONS)
+        names = [n for n in dict.fromkeys(names) if RenditionServices.can_render(n)]
+
+        existing = set()
+        if not force:
+            existing = set(
+                ImageRendition.objects.filter(source__in=names, spec__in=specs)
+                .values_list("source", "spec")
+                .distinct()
+            )
+
+        jobs = {}
+        for name in names:
+            missing = [spec for spec in specs if (name, spec) not in existing]
+            if missing:
+                jobs[name] = missing
+
+        if not jobs:
+            return 0
+
+        workers = settings.CONTENT_BLOCKS_RENDITION_WORKERS
+        process_pool = (
+            ProcessPoolExecutor(max_workers=workers)
+            if settings.CONTENT_BLOCKS_RENDITION_EXECUTOR == "process"
+            else None
+        )
+
+        generated = 0
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = {
+                    pool.submit(
+                        RenditionServices.render_files, name, job_specs, process_pool
+                    ): name
+                    for name, job_specs in jobs.items()
+                }
+                for future in as_completed(futures):
+                    name = futures[future]
+                    try:
+                        files = future.result()
+                    except Exception:  # noqa
+                        logger.exception(f"Could not generate renditions for {name}.")
+                        continue
+
+                    RenditionServices.record(name, jobs[name], files)
+                    generated += 1
+        finally:
+            if process_pool is not None:
+                process_pool.shutdown()
+
+        return generated
+
+    @staticmethod
+    def renditions(name, spec):
+        """
+        Get the renditions of an image for the given spec.  Renditions are generated if none exist.
+        :return: List of ImageRendition ordered by width.  Empty if the spec isn't in CONTENT_BLOCKS_IMAGE_RENDITIONS.
+        """
+        if spec not in settings.CONTENT_BLOCKS_IMAGE_RENDITIONS:
+            logger.error(f"Unknown image rendition spec {spec!r}.")
+            return []
+
+        renditions = list(ImageRendition.objects.filter(source=name, spec=spec))
+
+        if not renditions and RenditionServices.can_render(name):
+            failure_cache = caches[settings.CONTENT_BLOCKS_RENDER_CACHE_ALIAS]
+            failure_key = RenditionServices.failure_key(name, spec)
+            if failure_cache.get(failure_key):
+                return []
+
+            try:
+                renditions = RenditionServices.generate(name, [spec])
+            except (OSError, ValueError, Image.DecompressionBombError):
+                logger.exception(f"Could not generate renditions for {name}.")
+                # Don't try again on every render of a broken image.
+                failure_cache.set(
+                    failure_key,
+                    True,
+                    timeout=settings.CONTENT_BLOCKS_RENDITION_FAILURE_TIMEOUT,
+                )
+
+        return renditions
+
+    @staticmethod
+    def failure_key(name, spec):
+        """
+        :return: Cache key recording that renditions of the image name could not be generated for the spec.
+        """
+        return (
+            f"content_blocks:rendition_failure:{md5(name.encode()).hexdigest()}:{spec}"
+        )
+
+    @staticmethod
+    def srcset(name, spec):
+        """
+        :return: srcset attribute value for the image name and spec.
+        """
+        return ", ".join(
+            f"{rendition.url} {rendition.width}w"
+            for rendition in RenditionServices.renditions(name, spec)
+        )
+
+    @staticmethod
+    def delete(name):
+        """
+        Delete all renditions of the image name from storage and the database.
+        """
+        storage = image_storage()
+        renditions = ImageRendition.objects.filter(source=name)
+        for rendition_name in renditions.values_list("name", flat=True):
+            storage.delete(rendition_name)
+        renditions.delete()
+
+    @staticmethod
+    def image_names(content_blocks):
+        """
+        Find the names of all images used by the content blocks, including those in nested content blocks.
+        :param content_blocks: Iterable of ContentBlock.
+        :return: List of image names.
+        """
+        names = []
+        content_block_ids = [content_block.id for content_block in content_blocks]
+
+        while content_block_ids:
+            names += (
+                ContentBlockField.objects.filter(
+                    content_block_id__in=content_block_ids,
+                    field_type=ContentBlockFields.IMAGE_FIELD,
+                )
+                .exclude(image="")
+                .values_list("image", flat=True)
+            )
+            content_block_ids = list(
+                ContentBlock.objects.filter(
+                    parent__content_block_id__in=content_block_ids
+                ).values_list("id", flat=True)
+            )
+
+        return names
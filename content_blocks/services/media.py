@@ -0,0 +1,324 @@
+"""
+Services for media files used by ImageField, FileField and VideoField.
+"""
+import itertools
+import logging
+import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
+from django.core.files.base import File
+from django.db.models import Case, CharField, Value, When
+
+from content_blocks.conf import settings
+from content_blocks.fields import content_hash, content_hash_name
+from content_blocks.models import (
+    ContentBlockField,
+    ImageRendition,
+    MediaMigration,
+    PublishedFields,
+)
+
+logger = logging.getLogger(__name__)
+
+# ContentBlockField attributes which hold media files.
+MEDIA_FIELDS = ["image", "file", "video"]
+
+CONTENT_HASH_NAME_RE = re.compile(r"(^|/)([0-9a-f]{2})/\2[0-9a-f]{62}(\.\w+)?$")
+
+
+class MediaServices:
+    """
+    Services for managing stored media files.
+    """
+
+    @staticmethod
+    def media_field(field_name):
+        """
+        :return: The model field for the given media field name.
+        """
+        return ContentBlockField._meta.get_field(field_name)
+
+    @staticmethod
+    def media_names(field_name):
+        """
+        :return: Distinct non-empty names used by ContentBlockField for the media field.
+        """
+        return list(
+            ContentBlockField._base_manager.exclude(**{field_name: ""})
+            .order_by()
+            .values_list(field_name, flat=True)
+            .distinct()
+        )
+
+    @staticmethod
+    def is_content_hash_name(name):
+        return bool(CONTENT_HASH_NAME_RE.search(name))
+
+    @staticmethod
+    def forget_published_fields(fields):
+        """
+        Delete the PublishedFields of the content blocks of the fields, update() doesn't send the signals which would.
+        """
+        if settings.CONTENT_BLOCKS_PUBLISHED_FIELDS:
+            PublishedFields.objects.filter(
+                content_block_id__in=fields.values("content_block_id")
+            ).delete()
+
+    @staticmethod
+    def rename(field_name, old_name, new_name):
+        """
+        Point all ContentBlockField using old_name at new_name.  Uses update() so cleanup signals are not sent.
+        :return: Number of rows updated.
+        """
+        fields = ContentBlockField._base_manager.filter(
+            **{field_name: old_name}
+        ).exclude(**{field_name: ""})
+        MediaServices.forget_published_fields(fields)
+        updated = fields.update(**{field_name: new_name})
+        if field_name == "image":
+            ImageRendition.objects.filter(source=old_name).update(source=new_name)
+        return updated
+
+    @staticmethod
+    def rename_many(field_name, names, batch_size=500):
+        """
+        Bulk version of rename.  Rows are updated with one query per batch.
+        :param names: Dict of old_name: new_name.
+        :return: Number of rows updated.
+        """
+        names = [(old, new) for old, new in names.items() if old != new]
+        updated = 0
+
+        def case(attr, batch):
+            return Case(
+                *[When(**{attr: old}, then=Value(new)) for old, new in batch],
+                output_field=CharField(),
+            )
+
+        for i in range(0, len(names), batch_size):
+            batch = names[i:][:batch_size]
+            old_names = [old for old, new in batch]
+            fields = ContentBlockField._base_manager.filter(
+                **{f"{field_name}__in": old_names}
+            ).exclude(**{field_name: ""})
+            MediaServices.forget_published_fields(fields)
+            updated += fields.update(**{field_name: case(field_name, batch)})
+
+            if field_name == "image":
+                for attr in ["source", "name"]:
+                    ImageRendition.objects.filter(**{f"{attr}__in": old_names}).update(
+                        **{attr: case(attr, batch)}
+                    )
+
+        return updated
+
+    @staticmethod
+    def store_content_hashed(field_name, name):
+        """
+        Copy a stored file to its content hash name, skipping the write if that already exists.
+        Does no database work, so it is safe to run in a worker thread.
+        :return: The content hash name.
+        """
+        field = MediaServices.media_field(field_name)
+        storage = field.storage
+
+        with storage.open(name) as f:
+            digest = content_hash(f)
+            directory = name.rsplit("/", 1)[0] if "/" in name else field.upload_to
+            new_name = content_hash_name(directory, name, digest)
+
+            if not storage.exists(new_name):
+                new_name = storage.save(new_name, f, max_length=field.max_length)
+
+        return new_name
+
+    @staticmethod
+    def content_hash_media(field_name, workers=4, delete=True, dry_run=False):
+        """
+        Move existing media to content hash names so identical files are stored once.
+        Files are hashed and copied in a pool of worker threads, rows are updated in this thread.
+        :param field_name: One of MEDIA_FIELDS.
+        :param workers: Max number of worker threads.
+        :param delete: Delete the original files once they are no longer used.
+        :param dry_run: Don't change anything, just return the names which would be migrated.
+        :return: List of (old_name, new_name) tuples for the files migrated.
+        """
+        names = [
+            name
+            for name in MediaServices.media_names(field_name)
+            if not MediaServices.is_content_hash_name(name)
+        ]
+
+        if dry_run:
+            return [(name, None) for name in names]
+
+        storage = MediaServices.media_field(field_name).storage
+        migrated = []
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(MediaServices.store_content_hashed, field_name, name): name
+                for name in names
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    new_name = future.result()
+                except Exception:  # noqa
+                    logger.exception(f"Could not content hash {name}.")
+                    continue
+
+                if new_name == name:
+                    continue  # pragma: no cover
+
+                MediaServices.rename(field_name, name, new_name)
+                migrated.append((name, new_name))
+
+        if delete:
+            for name, new_name in migrated:
+                storage.delete(name)
+
+        return migrated
+
+    @staticmethod
+    def migration_names(field_name):
+        """
+        :return: Names to copy when migrating the media field, including image renditions.
+        """
+        names = MediaServices.media_names(field_name)
+        if field_name == "image":
+            names += ImageRendition.objects.order_by().values_list("name", flat=True)
+        return list(dict.fromkeys(names))
+
+    @staticmethod
+    def rewrite_name(name, rewrite=None):
+        """
+        :param rewrite: Optional (old_prefix, new_prefix) tuple.
+        :return: name with old_prefix replaced by new_prefix.
+        """
+        if rewrite:
+            old_prefix, new_prefix = rewrite
+            if name.startswith(old_prefix):
+                return new_prefix + name.split(old_prefix, 1)[1]
+        return name
+
+    @staticmethod
+    def copy_to_storage(name, source, target, new_name, max_length=None):
+        """
+        Stream a file from the source storage to the target storage and check the sizes match.
+        A file already in the target with the same name and size is assumed to be a copy from an earlier run.
+        Does no database work, so it is safe to run in a worker thread.
+        :return: (name in the target storage, size) tuple.
+        """
+        size = source.size(name)
+
+        if target.exists(new_name) and target.size(new_name) == size:
+            return new_name, size
+
+        with source.open(name, "rb") as f:
+            stored_name = target.save(new_name, File(f), max_length=max_length)
+
+        if target.size(stored_name) != size:
+            target.delete(stored_name)
+            raise OSError(f"Size of {stored_name} does not match {name}.")
+
+        return stored_name, size
+
+    @staticmethod
+    def migrate_media(
+        field_name, source, source_key, workers=4, rewrite=None, dry_run=False
+    ):
+        """
+        Copy media used by content blocks from the source storage to the storage configured for the field.
+        Files are streamed between storages by a bounded pool of worker threads, so only a few files are open at a
+        time however many there are.  Progress is recorded in MediaMigration, files which have been copied are
+        skipped when the migration is run again.  Content block fields are then pointed at the new names in bulk.
+        :param field_name: One of MEDIA_FIELDS.
+        :param source: Storage to copy from.
+        :param source_key: String identifying the source storage in MediaMigration.
+        :param workers: Max number of worker threads.
+        :param rewrite: Optional (old_prefix, new_prefix) tuple used to rewrite names.
+        :param dry_run: Don't change anything, just return unsaved MediaMigration for the files to copy.
+        :return: List of MediaMigration for the files copied or failed by this run.
+        """
+        field = MediaServices.media_field(field_name)
+        target = field.storage
+        migrations = MediaMigration.objects.filter(
+            field_name=field_name, source=source_key
+        )
+        copied = migrations.filter(status=MediaMigration.Status.COPIED)
+        done = set(itertools.chain(*copied.values_list("name", "new_name")))
+
+        names = [
+            name
+            for name in MediaServices.migration_names(field_name)
+            if name not in done
+        ]
+
+        if dry_run:
+            return [
+                MediaMigration(
+                    field_name=field_name,
+                    source=source_key,
+                    name=name,
+                    new_name=MediaServices.rewrite_name(name, rewrite),
+                )
+                for name in names
+            ]
+
+        results = []
+        names = iter(names)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = {}
+            while True:
+                # Keep at most two files per worker in flight.
+                for name in itertools.islice(names, workers * 2 - len(pending)):
+                    future = pool.submit(
+                        MediaServices.copy_to_storage,
+                        name,
+                        source,
+                        target,
+                        MediaServices.rewrite_name(name, rewrite),
+                        field.max_length,
+                    )
+                    pending[future] = name
+
+                if not pending:
+                    break
+
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = pending.pop(future)
+                    try:
+                        new_name, size = future.result()
+                        defaults = {
+                            "new_name": new_name,
+                            "size": size,
+                            "status": MediaMigration.Status.COPIED,
+                            "error": "",
+                        }
+                    except Exception as e:  # noqa
+                        logger.exception(f"Could not copy {name}.")
+                        defaults = {
+                            "new_name": "",
+                            "size": None,
+                            "status": MediaMigration.Status.FAILED,
+                            "error": str(e),
+                        }
+
+                    results.append(
+                        MediaMigration.objects.update_or_create(
+                            field_name=field_name,
+                            source=source_key,
+                            name=name,
+                            defaults=defaults,
+                        )[0]
+                    )
+
+        # Includes files copied by earlier runs in case a run was interrupted before renaming.
+        MediaServices.rename_many(
+            field_name, dict(copied.values_list("name", "new_name"))
+        )
+
+        return results
@@ -0,0 +1,165 @@
+"""
+Services for chunked uploads from the content block editor.
+"""
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.core.files.base import File
+from django.db import transaction
+from django.utils import timezone
+
+from content_blocks.conf import settings
+from content_blocks.models import ChunkedUpload
+
+
+class ChunkedUploadFile(File):
+    """
+    File for a completed ChunkedUpload.  Used as the form value in place of an UploadedFile.  The temporary file is
+    opened when first read so nothing is left open if the form is invalid.
+    """
+
+    def __init__(self, chunked_upload):
+        self.chunked_upload = chunked_upload
+        self._file = None
+        super().__init__(None, name=chunked_upload.filename)
+        self.mode = "rb"
+
+    @property
+    def file(self):
+        if self._file is None:
+            self._file = ChunkedUploadServices.path(self.chunked_upload).open("rb")
+        return self._file
+
+    @file.setter
+    def file(self, value):
+        self._file = value
+
+    @property
+    def size(self):
+        return self.chunked_upload.size
+
+    @property
+    def closed(self):
+        return self._file is None or self._file.closed
+
+    def open(self, mode=None):
+        if self.closed:
+            self._file = None
+        else:
+            self.seek(0)
+        return self
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+class ChunkedUploadServices:
+    """
+    Services for receiving files in chunks and assembling them in a temporary file.
+    """
+
+    @staticmethod
+    def path(chunked_upload):
+        """
+        :return: Path to the temporary file for the chunked upload.
+        """
+        directory = Path(
+            settings.CONTENT_BLOCKS_CHUNKED_UPLOAD_DIR or tempfile.gettempdir()
+        )
+        return directory / "content_blocks_uploads" / f"{chunked_upload.token}.part"
+
+    @staticmethod
+    def create(filename, size, user=None):
+        """
+        Start a new chunked upload.
+        """
+        max_size = settings.CONTENT_BLOCKS_CHUNKED_UPLOAD_MAX_SIZE
+        if max_size is not None and size > max_size:
+            raise ValidationError(f"Uploads must be no larger than {max_size} bytes.")
+
+        ChunkedUploadServices.delete_expired()
+
+        chunked_upload = ChunkedUpload.objects.create(
+            filename=Path(filename).name, size=size, user=user, completed=size == 0
+        )
+
+        path = ChunkedUploadServices.path(chunked_upload)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.touch()
+
+        return chunked_upload
+
+    @staticmethod
+    def append(token, offset, chunk, user=None):
+        """
+        Append a chunk to the upload if it starts at the current offset.  Chunks at any other offset are ignored, the
+        caller should resume from the returned offset.
+        :param token: Token of the ChunkedUpload.
+        :param offset: Offset of the chunk in bytes.
+        :param chunk: File like object with chunks() or None to just get the current offset.
+        :return: The ChunkedUpload.
+        """
+        with transaction.atomic():
+            chunked_upload = ChunkedUpload.objects.select_for_update().get(
+                token=token, user=user
+            )
+
+            if chunk is None or chunked_upload.completed:
+                return chunked_upload
+
+            if offset != chunked_upload.offset:
+                return chunked_upload
+
+            if chunked_upload.offset + chunk.size > chunked_upload.size:
+                raise ValidationError("Chunk exceeds the size of the upload.")
+
+            with ChunkedUploadServices.path(chunked_upload).open("ab") as f:
+                f.truncate(chunked_upload.offset)
+                for data in chunk.chunks():
+                    f.write(data)
+
+            chunked_upload.offset += chunk.size
+            chunked_upload.completed = chunked_upload.offset == chunked_upload.size
+            chunked_upload.save()
+
+        return chunked_upload
+
+    @staticmethod
+    def open(token, user=None):
+        """
+        :return: ChunkedUploadFile for the completed upload with the given token uploaded by the user, or None.
+        """
+        try:
+            chunked_upload = ChunkedUpload.objects.get(
+                token=token, user=user, completed=True
+            )
+        except (ChunkedUpload.DoesNotExist, ValidationError):
+            return None
+
+        if not ChunkedUploadServices.path(chunked_upload).is_file():
+            return None
+
+        return ChunkedUploadFile(chunked_upload)
+
+    @staticmethod
+    def delete(chunked_upload):
+        """
+        Delete the chunked upload and its temporary file.
+        """
+        ChunkedUploadServices.path(chunked_upload).unlink(missing_ok=True)
+        chunked_upload.delete()
+
+    @staticmethod
+    def delete_expired():
+        """
+        Delete chunked uploads older than CONTENT_BLOCKS_CHUNKED_UPLOAD_EXPIRY.
+        """
+        expired = ChunkedUpload.objects.filter(
+            create_date__lt=timezone.now()
+            - timedelta(seconds=settings.CONTENT_BLOCKS_CHUNKED_UPLOAD_EXPIRY)
+        )
+        for chunked_upload in expired:
+            ChunkedUploadServices.delete(chunked_upload)
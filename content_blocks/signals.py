@@ -1,20 +1,51 @@
 """
 Content blocks app signals.py
 """
-from django.db.models.signals import pre_delete, pre_save
+from django.apps import apps
+from django.core.signals import request_finished, request_started
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import Signal, receiver
 
+from content_blocks.cache import render_cache
+from content_blocks.conf import settings
 from content_blocks.models import (
+    ContentBlock,
+    ContentBlockCollection,
     ContentBlockField,
     ContentBlockFields,
+    ContentBlockTemplateField,
     FileField,
     ImageField,
     VideoField,
 )
+from content_blocks.services.content_block import (
+    ModelChoiceServices,
+    PublishedFieldsServices,
+)
+from content_blocks.services.image import RenditionServices
 
 # A signal we can send after an import finishes.
 post_import = Signal()
 
+# Objects in these apps are never chosen in model choice fields.
+MODEL_CHOICE_IGNORE_APPS = {
+    "admin",
+    "content_blocks",
+    "contenttypes",
+    "migrations",
+    "sessions",
+}
+
+
+def media_fields(object_type, name):
+    """
+    :return: QuerySet of the content block fields using the media file.  Fields waiting to be deleted by a
+    TemplateFieldDeletion still use their media.  Empty names are excluded so the partial media indexes are used.
+    """
+    return ContentBlockField._base_manager.filter(**{object_type: name}).exclude(
+        **{object_type: ""}
+    )
+
 
 def cleanup_media(sender, instance, delete=False, **kwargs):
     """
@@ -50,11 +81,12 @@ def cleanup_media(sender, instance, delete=False, **kwargs):
             return
 
     if (
-        old_file != new_file
-        and not ContentBlockField.objects.filter(**{object_type: old_file})
-        .exclude(id=instance.id)
-        .exists()
+        old_file
+        and old_file != new_file
+        and not media_fields(object_type, old_file).exclude(id=instance.id).exists()
     ):
+        if object_type == "image":
+            RenditionServices.delete(old_file.name)
         old_file.delete(save=False)
 
 
@@ -72,3 +104,215 @@ def cleanup_media_save(sender, instance, **kwargs):
 @receiver(pre_delete, sender=ContentBlockField, dispatch_uid="cleanup_media_delete")
 def cleanup_media_delete(sender, instance, **kwargs):
     return cleanup_media(sender, instance, delete=True, **kwargs)
+
+
+def touch_render_cache(sender, instance, **kwargs):
+    """
+    Bump the render cache version of the saved or deleted content block and the content blocks above it.
+    Content blocks cloned and deleted by publishing aren't touched, see RenderCache.untouched.
+    """
+    if (
+        kwargs.get("raw", False)
+        or not settings.CONTENT_BLOCKS_RENDER_CACHE
+        or render_cache.touches_skipped
+    ):
+        return
+
+    if isinstance(instance, ContentBlockField):
+        render_cache.touch_on_commit(instance.content_block_id)
+    else:
+        render_cache.touch_on_commit(instance.id, instance)
+
+
+for model in [ContentBlock, ContentBlockField, *ContentBlockField.__subclasses__()]:
+    post_save.connect(
+        touch_render_cache,
+        sender=model,
+        dispatch_uid=f"touch_render_cache_save_{model.__name__}",
+    )
+    post_delete.connect(
+        touch_render_cache,
+        sender=model,
+        dispatch_uid=f"touch_render_cache_delete_{model.__name__}",
+    )
+
+
+def forget_published_fields(sender, instance, **kwargs):
+    """
+    Published content blocks are rendered from their fields until they are published again.  Drafts have no
+    published fields, the editor saves fields with their content block loaded so they are skipped without a query.
+    """
+    if kwargs.get("raw", False) or not settings.CONTENT_BLOCKS_PUBLISHED_FIELDS:
+        return
+
+    content_block_field = ContentBlockField._meta.get_field("content_block")
+    if content_block_field.is_cached(instance) and instance.content_block.draft:
+        return
+
+    PublishedFieldsServices.forget([instance.content_block_id])
+
+
+for model in [ContentBlockField, *ContentBlockField.__subclasses__()]:
+    post_save.connect(
+        forget_published_fields,
+        sender=model,
+        dispatch_uid=f"forget_published_fields_save_{model.__name__}",
+    )
+    post_delete.connect(
+        forget_published_fields,
+        sender=model,
+        dispatch_uid=f"forget_published_fields_delete_{model.__name__}",
+    )
+
+
+@receiver(request_started, dispatch_uid="render_cache_request_started")
+def render_cache_request_started(sender, **kwargs):
+    render_cache.request_started()
+
+
+@receiver(request_finished, dispatch_uid="render_cache_request_finished")
+def render_cache_request_finished(sender, **kwargs):
+    render_cache.request_finished()
+
+
+@receiver(
+    pre_save, sender=ContentBlockCollection, dispatch_uid="collection_cache_pre_save"
+)
+def collection_cache_pre_save(sender, instance, **kwargs):
+    """
+    Forget the cached id of a collection under its old slug when the slug changes.
+    """
+    if kwargs.get("raw", False) or not settings.CONTENT_BLOCKS_COLLECTION_CACHE:
+        return
+
+    old_slug = (
+        ContentBlockCollection.objects.filter(pk=instance.pk)
+        .values_list("slug", flat=True)
+        .first()
+    )
+    if old_slug is not None and old_slug != instance.slug:
+        render_cache.delete_collection(old_slug)
+
+
+@receiver(
+    post_save, sender=ContentBlockCollection, dispatch_uid="collection_cache_save"
+)
+@receiver(
+    post_delete, sender=ContentBlockCollection, dispatch_uid="collection_cache_delete"
+)
+def collection_cache_save_delete(sender, instance, **kwargs):
+    """
+    Forget the cached id of a saved or deleted collection.
+    """
+    if kwargs.get("raw", False) or not settings.CONTENT_BLOCKS_COLLECTION_CACHE:
+        return
+
+    render_cache.delete_collection(instance.slug)
+
+
+def invalidate_model_choice(sender, instance, **kwargs):
+    """
+    Invalidate the caches of published content blocks which chose the saved or deleted object in a model choice field.
+    Connected by connect_model_choice_invalidation.
+    """
+    if (
+        kwargs.get("raw", False)
+        or not settings.CONTENT_BLOCKS_MODEL_CHOICE_INVALIDATION
+        or sender._meta.app_label in MODEL_CHOICE_IGNORE_APPS
+        # Historical models saved by migrations aren't in the app registry.
+        or sender._meta.apps is not apps
+        # Only models chosen in model choice fields are looked up.
+        or not ModelChoiceServices.can_be_chosen(sender)
+    ):
+        return
+
+    ModelChoiceServices.invalidate(instance)
+
+
+def connect_model_choice_invalidation():
+    """
+    Connect invalidate_model_choice to the models in CONTENT_BLOCKS_MODEL_CHOICES so saving objects of other models
+    costs nothing.  When it isn't set any model can be chosen so it is connected to every model.  Called when the app
+    is ready.
+    """
+    if not settings.CONTENT_BLOCKS_MODEL_CHOICE_INVALIDATION:
+        return
+
+    senders = (
+        [None]
+        if settings.CONTENT_BLOCKS_MODEL_CHOICES is None
+        else [apps.get_model(label) for label in settings.CONTENT_BLOCKS_MODEL_CHOICES]
+    )
+    for sender in senders:
+        suffix = "" if sender is None else f"_{sender._meta.label_lower}"
+        post_save.connect(
+            invalidate_model_choice,
+            sender=sender,
+            dispatch_uid=f"model_choice_save{suffix}",
+        )
+        post_delete.connect(
+            invalidate_model_choice,
+            sender=sender,
+            dispatch_uid=f"model_choice_delete{suffix}",
+        )
+
+
+@receiver(
+    post_save, sender=ContentBlockTemplateField, dispatch_uid="model_choice_models_save"
+)
+@receiver(
+    post_delete,
+    sender=ContentBlockTemplateField,
+    dispatch_uid="model_choice_models_delete",
+)
+def forget_model_choice_models(sender, instance, **kwargs):
+    """
+    The models which can be chosen in model choice fields may have changed.
+    """
+    if kwargs.get("raw", False):
+        return
+
+    render_cache.delete(render_cache.model_choice_key)
+    if render_cache.memo is not None:
+        render_cache.memo.pop(render_cache.model_choice_key, None)
+
+
+@receiver(
+    post_save, sender=ContentBlockTemplateField, dispatch_uid="template_plans_save"
+)
+@receiver(
+    post_delete, sender=ContentBlockTemplateField, dispatch_uid="template_plans_delete"
+)
+def forget_template_plans(sender, instance, **kwargs):
+    """
+    The columns used by the fields of the template may have changed.  Deleting the version of its template fields makes
+    every process plan the template again.
+    """
+    key = render_cache.template_fields_key(instance.content_block_template_id)
+    render_cache.delete(key)
+    if render_cache.memo is not None:
+        render_cache.memo.pop(key, None)
+
+
+@receiver(
+    post_save,
+    sender=ContentBlockTemplateField,
+    dispatch_uid="template_published_fields_save",
+)
+@receiver(
+    post_delete,
+    sender=ContentBlockTemplateField,
+    dispatch_uid="template_published_fields_delete",
+)
+def forget_template_published_fields(sender, instance, **kwargs):
+    """
+    The key of the template field may have changed or it may have been queued for deletion.
+    """
+    if kwargs.get("raw", False) or not settings.CONTENT_BLOCKS_PUBLISHED_FIELDS:
+        return
+
+    PublishedFieldsServices.forget(
+        ContentBlock.objects.filter(
+            content_block_template_id=instance.content_block_template_id
+        ).values("id")
+    )
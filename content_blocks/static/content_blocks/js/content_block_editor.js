@@ -361,24 +361,142 @@
       showLoader($loader);
       let title = $form.find(".title input").val();
       showStatus("Saving " + title);
-      $form.ajaxSubmit({
-        success: function (data) {
-          setSaveState($btn, data.saved);
-          renderAjaxResponse(data, $target);
+      uploadChunkedFiles(
+        $form,
+        $loader.find(".progress-bar"),
+        function () {
+          $form.ajaxSubmit({
+            success: function (data) {
+              setSaveState($btn, data.saved);
+              renderAjaxResponse(data, $target);
+              hideLoader($loader);
+
+              if (data.saved) {
+                showStatus(title + " saved");
+              } else {
+                showStatus("Please correct the errors");
+              }
+
+              if (saved_callback && data.saved) {
+                return saved_callback();
+              }
+            },
+            uploadProgress: function (event, position, total, percentComplete) {
+              $loader.find(".progress-bar").width(percentComplete + "%");
+            },
+          });
+        },
+        function () {
+          // The upload failed, the form isn't submitted so it can be saved again.
           hideLoader($loader);
+        }
+      );
+    }
 
-          if (data.saved) {
-            showStatus(title + " saved");
-          } else {
-            showStatus("Please correct the errors");
+    function uploadChunkedFiles($form, $progress_bar, callback, failed_callback) {
+      // Upload files from chunked file inputs ahead of submitting the form, then call callback.
+      // The file input is cleared and the upload token is submitted with the form instead.
+      // If an upload fails failed_callback is called instead and the form isn't submitted.
+      let inputs = $form.find("input[type=file][data-chunked-upload]").toArray();
+      return uploadNextChunkedFile(inputs, $form, $progress_bar, callback, failed_callback);
+    }
+
+    function uploadNextChunkedFile(inputs, $form, $progress_bar, callback, failed_callback) {
+      if (!inputs.length) {
+        return callback();
+      }
+
+      let $input = $(inputs.shift());
+      let file = $input[0].files[0];
+      let next = function () {
+        return uploadNextChunkedFile(inputs, $form, $progress_bar, callback, failed_callback);
+      };
+
+      if (!file) {
+        return next();
+      }
+
+      // Resume a previous attempt at uploading the same file.
+      let signature = [file.name, file.size, file.lastModified].join(":");
+      let token = $input.data("upload_signature") === signature ? $input.data("upload_token") : "";
+
+      uploadChunk(
+        $input,
+        file,
+        token,
+        token ? null : 0,
+        $progress_bar,
+        function (token) {
+          $input.data("upload_signature", signature).data("upload_token", token);
+          $form.find('input[name="' + $input.data("token-input") + '"]').val(token);
+          $input.val("");
+          next();
+        },
+        failed_callback
+      );
+    }
+
+    function uploadErrorMessage(file, error) {
+      // Error messages from the chunked upload view are a list of messages or form errors keyed by field.
+      let messages = [];
+      if (Array.isArray(error)) {
+        messages = error;
+      } else if (error) {
+        $.each(error, function (field, errors) {
+          $.each(errors, function (i, e) {
+            messages.push(e.message || e);
+          });
+        });
+      }
+      return ["Upload of " + file.name + " failed."].concat(messages).join(" ");
+    }
+
+    function uploadChunk($input, file, token, offset, $progress_bar, completed_callback, failed_callback, retries = 3) {
+      // Send the chunk at offset. When offset is null only ask for the current offset of the upload.
+      let chunk_size = parseInt($input.data("chunk-size"));
+      let form_data = new FormData();
+      form_data.append("filename", file.name);
+      form_data.append("size", file.size);
+      if (token) form_data.append("token", token);
+      if (offset !== null) {
+        form_data.append("offset", offset);
+        form_data.append("chunk", file.slice(offset, offset + chunk_size), file.name);
+      }
+
+      $.ajax({
+        url: $input.data("chunked-upload"),
+        type: "POST",
+        data: form_data,
+        processData: false,
+        contentType: false,
+        global: false,
+        success: function (data) {
+          if (data.error) {
+            showStatus(uploadErrorMessage(file, data.error));
+            console.log(data.error);
+            if (failed_callback) failed_callback();
+            return;
           }
 
-          if (saved_callback && data.saved) {
-            return saved_callback();
+          $progress_bar.width(file.size ? (100 * data.offset) / file.size + "%" : "100%");
+
+          if (data.completed) {
+            return completed_callback(data.token);
           }
+          uploadChunk($input, file, data.token, data.offset, $progress_bar, completed_callback, failed_callback);
         },
-        uploadProgress: function (event, position, total, percentComplete) {
-          $loader.find(".progress-bar").width(percentComplete + "%");
+        error: function (xhr) {
+          if (xhr.status === 404) {
+            // The upload has expired, start again.
+            return uploadChunk($input, file, "", 0, $progress_bar, completed_callback, failed_callback, retries);
+          }
+          if (retries > 0) {
+            return setTimeout(function () {
+              uploadChunk($input, file, token, offset, $progress_bar, completed_callback, failed_callback, retries - 1);
+            }, 1000);
+          }
+          showStatus("Upload of " + file.name + " failed. Save again to resume.");
+          if (failed_callback) failed_callback();
         },
       });
     }
@@ -453,30 +571,36 @@
 
       let $form = $($btn.data("form"));
       let $target = $($form.data("target"));
+      let $progress_bar = ($inline_loader || $loader).find(".progress-bar");
 
-      $form.ajaxSubmit({
-        success: function (data) {
-          setSaveState($btn, data.saved);
-          renderAjaxResponse(data, $target, false, function () {
-            let $expander_btn = $btn.siblings(".expand");
-            if ($expander_btn.find("i").hasClass(expand_closed_class)) {
-              $($expander_btn.data("target")).hide();
-            }
-
-            if ($inline_loader) hideLoader($inline_loader);
-            saveNext($buttons, callback, $loader, buttons);
+      uploadChunkedFiles(
+        $form,
+        $progress_bar,
+        function () {
+          $form.ajaxSubmit({
+            success: function (data) {
+              setSaveState($btn, data.saved);
+              renderAjaxResponse(data, $target, false, function () {
+                let $expander_btn = $btn.siblings(".expand");
+                if ($expander_btn.find("i").hasClass(expand_closed_class)) {
+                  $($expander_btn.data("target")).hide();
+                }
+
+                if ($inline_loader) hideLoader($inline_loader);
+                saveNext($buttons, callback, $loader, buttons);
+              });
+            },
+            uploadProgress: function (event, position, total, percentComplete) {
+              $progress_bar.width(percentComplete + "%");
+            },
           });
         },
-        uploadProgress: function (event, position, total, percentComplete) {
-          let $progress_bar;
-          if ($inline_loader) {
-            $progress_bar = $inline_loader.find(".progress-bar");
-          } else {
-            $progress_bar = $loader.find(".progress-bar");
-          }
-          $progress_bar.width(percentComplete + "%");
-        },
-      });
+        function () {
+          // The content block stays unsaved and is shown with the others with errors once the rest are saved.
+          if ($inline_loader) hideLoader($inline_loader);
+          saveNext($buttons, callback, $loader, buttons);
+        }
+      );
     }
 
     function exit(return_url) {
@@ -15,6 +15,8 @@ def new_nested_block_form(parent):
     return NewNestedBlockForm(
         initial={
             "parent": parent,
+            "content_block": parent.content_block_id,
+            "template_field": parent.template_field_id,
         }
     )
 
@@ -2,9 +2,13 @@
 Content blocks template tags.
 """
 from django import template
+from django.db.models.fields.files import FieldFile
+from django.utils.safestring import mark_safe
 
 from content_blocks.models import ContentBlockCollection
-from content_blocks.services.content_block import RenderServices
+from content_blocks.routers import read_database
+from content_blocks.services.content_block import CollectionServices, RenderServices
+from content_blocks.services.image import RenditionServices
 
 register = template.Library()
 
@@ -15,12 +19,22 @@ register = template.Library()
 def content_block_collection(context, content_block_collection_slug, **extra_context):
     """
     Render content blocks for a ContentBlockCollection given the collection's slug.
+    See CONTENT_BLOCKS_COLLECTION_CACHE.
     """
-    context.update({"slug": content_block_collection_slug})
+    context.update(
+        {"slug": content_block_collection_slug, "content_block_collection_html": None}
+    )
     context.update(extra_context)
 
+    html = CollectionServices.render(
+        content_block_collection_slug, context.flatten(), extra_context
+    )
+    if html is not None:
+        context.update({"content_block_collection_html": html})
+        return context.flatten()
+
     try:
-        collection = ContentBlockCollection.objects.get(
+        collection = ContentBlockCollection.objects.using(read_database()).get(
             slug=content_block_collection_slug
         )
         context.update({"content_block_collection": collection})
@@ -39,6 +53,45 @@ def render_content_block(context, content_block, **extra_context):
     return RenderServices.render_content_block(content_block, context=context.flatten())
 
 
-# todo render_content_blocks template tag to render a set of blocks given the parent
+@register.simple_tag(takes_context=True)
+def render_content_blocks(context, content_blocks, **extra_context):
+    """
+    Render many content blocks with request context.  Cached html is fetched for all of them in one go.
+    """
+    context.update(extra_context)
+    return mark_safe(
+        "".join(
+            RenderServices.render_content_blocks(
+                content_blocks, context=context.flatten()
+            )
+        )
+    )
+
+
+@register.simple_tag
+def image_srcset(image, spec="default"):
+    """
+    Return a srcset for an ImageField value using the named rendition spec.
+    Returns an empty string for SVGs or if the image can't be read.
+    """
+    if not isinstance(image, FieldFile) or not image:
+        return ""
+    return RenditionServices.srcset(image.name, spec)
+
+
+@register.simple_tag
+def image_rendition_url(image, spec="thumbnail"):
+    """
+    Return the url of the largest rendition of an ImageField value for the named rendition spec.
+    Falls back to the url of the original image.
+    """
+    if not isinstance(image, FieldFile) or not image:
+        return ""
+
+    renditions = RenditionServices.renditions(image.name, spec)
+    if renditions:
+        return renditions[-1].url
+    return image.url
+
 
 # todo render_content_block_previews template tag as above but renders previews
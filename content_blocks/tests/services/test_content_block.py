@@ -2,10 +2,40 @@
 Tests for ContentBlock services.
 """
 
+from unittest.mock import patch
+
 import pytest
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.db.models.fields.files import FieldFile
+from django.db.models.signals import post_delete, post_save
+from django.template import Template
+from django.test.utils import CaptureQueriesContext
 from faker import Faker
 
-from content_blocks.services.content_block import CloneServices, RenderServices
+from content_blocks.cache import render_cache
+from content_blocks.models import (
+    ContentBlock,
+    ContentBlockCollection,
+    ContentBlockField,
+    ContentBlockFields,
+    ContentBlockRenderField,
+    PublishedFields,
+    PublishGeneration,
+)
+from content_blocks.services.content_block import (
+    CloneServices,
+    FingerprintServices,
+    ModelChoiceServices,
+    PrefetchServices,
+    PublishedFieldsServices,
+    PublishGenerationServices,
+    RenderServices,
+    TemplateAnalysisServices,
+    ValidatorServices,
+)
+from content_blocks.signals import connect_model_choice_invalidation
+from example.pages.models import Page
 
 faker = Faker()
 
@@ -49,7 +79,7 @@ class TestRenderServices:
         context_name = text_content_block.context_name
 
         assert context_name in context.keys()
-        assert context[context_name] == text_content_block.context
+        assert context[context_name] == text_content_block.lazy_context
 
         object_context_name = f"{context_name}_object"
 
@@ -73,7 +103,7 @@ class TestRenderServices:
         context_name = text_content_block.context_name
 
         assert context_name in context.keys()
-        assert context[context_name] == text_content_block.context
+        assert context[context_name] == text_content_block.lazy_context
 
         object_context_name = f"{context_name}_object"
 
@@ -101,3 +131,723 @@ class TestCloneServices:
             == content_block_nested_context[0].content_block_template
         )
         assert new_content_block.context == content_block.context
+
+    @pytest.mark.django_db
+    def test_content_block_clone_tree(self, deeply_nested_content_block):
+        """
+        Nested content blocks of the clone should be in the tree of the clone.
+        """
+        content_block, *_ = deeply_nested_content_block
+
+        new_content_block = CloneServices.clone_content_block(content_block)
+        new_nested_blocks = list(
+            ContentBlock.objects.descendants(new_content_block).order_by("depth")
+        )
+
+        assert [b.depth for b in new_nested_blocks] == [1, 2]
+        assert {b.root_id for b in new_nested_blocks} == {new_content_block.id}
+        assert new_nested_blocks[1].parent.content_block == new_nested_blocks[0]
+        assert new_content_block.fingerprint == FingerprintServices.fingerprint(
+            content_block
+        )
+
+
+class TestFingerprintServices:
+    @pytest.mark.django_db
+    def test_clone_fingerprint(self, nested_content_block):
+        """
+        Clones of an unchanged content block should have the same fingerprint.
+        """
+        content_block, nested_content_block = nested_content_block
+
+        first_clone = CloneServices.clone_content_block(content_block)
+        second_clone = CloneServices.clone_content_block(first_clone)
+
+        assert len(first_clone.fingerprint) == 64
+        assert first_clone.fingerprint == second_clone.fingerprint
+        assert first_clone.fingerprint == FingerprintServices.fingerprint(content_block)
+
+    @pytest.mark.django_db
+    def test_fingerprint_nested_change(self, nested_content_block):
+        """
+        Changing a nested content block should change the fingerprint of its parent.
+        """
+        content_block, nested_content_block = nested_content_block
+        fingerprint = FingerprintServices.fingerprint(content_block)
+
+        nested_content_block.content_block_fields.update(text=faker.text(256))
+
+        assert FingerprintServices.fingerprint(content_block) != fingerprint
+
+    @pytest.mark.django_db
+    def test_fingerprint_nested_visible(self, nested_content_block):
+        content_block, nested_content_block = nested_content_block
+        fingerprint = FingerprintServices.fingerprint(content_block)
+
+        nested_content_block.visible = not nested_content_block.visible
+        nested_content_block.save()
+
+        assert FingerprintServices.fingerprint(content_block) != fingerprint
+
+    @pytest.mark.django_db
+    def test_fingerprint_media(self, populated_image_content_block_field_factory):
+        content_block = (
+            populated_image_content_block_field_factory.create().content_block
+        )
+        fingerprint = FingerprintServices.fingerprint(content_block)
+
+        content_block.content_block_fields.update(image=faker.file_name())
+
+        assert FingerprintServices.fingerprint(content_block) != fingerprint
+
+    @pytest.mark.django_db
+    def test_template_version(self, text_template):
+        template_name = f"content_blocks/content_blocks/{text_template.name}"
+        version = FingerprintServices.template_version(template_name)
+
+        assert len(version) == 64
+        assert FingerprintServices.template_version(faker.file_name()) == ""
+
+
+class TestPublishGenerationServices:
+    @pytest.mark.django_db
+    def test_bump(self, content_block_collection):
+        assert content_block_collection.publish_generation == 0
+
+        PublishGenerationServices.bump(content_block_collection)
+        PublishGenerationServices.bump(content_block_collection)
+
+        assert content_block_collection.publish_generation == 2
+
+    @pytest.mark.django_db
+    def test_parents_nested(self, content_block_collection, nested_content_block):
+        content_block, nested_content_block = nested_content_block
+        content_block_collection.content_blocks.add(content_block)
+
+        assert PublishGenerationServices.parents(nested_content_block) == [
+            content_block_collection
+        ]
+
+    @pytest.mark.django_db
+    def test_parents_deeply_nested(
+        self, content_block_collection, deeply_nested_content_block
+    ):
+        content_block, _, deeply_nested_content_block = deeply_nested_content_block
+        content_block_collection.content_blocks.add(content_block)
+
+        assert PublishGenerationServices.parents(deeply_nested_content_block) == [
+            content_block_collection
+        ]
+
+    def test_parent_models(self):
+        assert ContentBlockCollection in PublishGenerationServices.parent_models()
+        assert ContentBlock not in PublishGenerationServices.parent_models()
+
+    @pytest.mark.django_db
+    def test_parent_delete(self, content_block_collection):
+        PublishGenerationServices.bump(content_block_collection)
+
+        content_block_collection.delete()
+
+        assert PublishGeneration.objects.count() == 0
+
+
+class TestValidatorServices:
+    @pytest.mark.django_db
+    def test_validators_publish(self, content_block_collection, content_block):
+        content_block_collection.content_blocks.add(content_block)
+        etag, last_modified = ValidatorServices.validators(content_block_collection)
+
+        assert etag.startswith('W/"')
+        assert last_modified == content_block.mod_date
+        assert ValidatorServices.validators(content_block_collection)[0] == etag
+
+        PublishGenerationServices.bump(content_block_collection)
+
+        assert ValidatorServices.validators(content_block_collection)[0] != etag
+
+    @pytest.mark.django_db
+    def test_validators_nested(self, content_block_collection, nested_content_block):
+        content_block, nested_content_block = nested_content_block
+        content_block_collection.content_blocks.add(content_block)
+
+        assert set(ValidatorServices.content_block_ids(content_block_collection)) == {
+            content_block.id,
+            nested_content_block.id,
+        }
+
+    @pytest.mark.django_db
+    def test_validators_nested_hidden(
+        self, content_block_collection, deeply_nested_content_block
+    ):
+        """
+        Content blocks nested in hidden content blocks should be left out.
+        """
+        content_block, nested_content_block, _ = deeply_nested_content_block
+        content_block_collection.content_blocks.add(content_block)
+        ContentBlock.objects.filter(id=nested_content_block.id).update(visible=False)
+
+        assert ValidatorServices.content_block_ids(content_block_collection) == [
+            content_block.id
+        ]
+
+    @pytest.mark.django_db
+    def test_validators_model_choice(
+        self,
+        content_block_collection,
+        content_block_collection_factory,
+        content_block,
+        content_block_field_factory,
+    ):
+        """
+        Modifying or deleting an object chosen in a model choice field should change the validators.
+        """
+        chosen = content_block_collection_factory.create()
+        content_block_field_factory.create(
+            content_block=content_block,
+            model_choice_content_type=ContentType.objects.get_for_model(chosen),
+            model_choice_object_id=chosen.id,
+        )
+        content_block_collection.content_blocks.add(content_block)
+        etag, _ = ValidatorServices.validators(content_block_collection)
+
+        chosen.save()
+        modified_etag, last_modified = ValidatorServices.validators(
+            content_block_collection
+        )
+        assert modified_etag != etag
+        assert last_modified == chosen.mod_date
+
+        chosen.delete()
+        assert ValidatorServices.validators(content_block_collection)[0] not in [
+            etag,
+            modified_etag,
+        ]
+
+
+@pytest.fixture
+def model_choice_content_block(
+    content_block_collection,
+    content_block_field_factory,
+    content_block_template_field_factory,
+    page_factory,
+):
+    """
+    Published content block in a collection with a model choice field set to a page.
+    """
+    page = page_factory.create()
+    template_field = content_block_template_field_factory.create(
+        field_type=ContentBlockFields.MODEL_CHOICE_FIELD,
+        model_choice_content_type=ContentType.objects.get_for_model(page),
+    )
+    field = content_block_field_factory.create(
+        template_field=template_field,
+        content_block__content_block_template=template_field.content_block_template,
+        model_choice_content_type=template_field.model_choice_content_type,
+        model_choice_object_id=page.id,
+    )
+    content_block_collection.content_blocks.add(field.content_block)
+    return field.content_block, page
+
+
+class TestModelChoiceServices:
+    @pytest.mark.django_db
+    def test_model_labels(self, model_choice_content_block):
+        assert ModelChoiceServices.model_labels() == {"pages.page"}
+
+    @pytest.mark.django_db
+    def test_content_blocks(self, model_choice_content_block):
+        content_block, page = model_choice_content_block
+
+        assert list(ModelChoiceServices.content_blocks(page)) == [content_block]
+
+    @pytest.mark.django_db
+    def test_save_invalidates(
+        self, settings, content_block_collection, model_choice_content_block
+    ):
+        """
+        Saving the chosen object should bump the render cache version and the publish generation.
+        """
+        settings.CONTENT_BLOCKS_RENDER_CACHE = True
+        content_block, page = model_choice_content_block
+        version = render_cache.version(content_block)
+
+        page.save()
+
+        assert render_cache.version(content_block) != version
+        assert content_block_collection.publish_generation == 1
+
+    @pytest.mark.django_db
+    def test_draft_not_invalidated(
+        self, content_block_collection, model_choice_content_block
+    ):
+        content_block, page = model_choice_content_block
+        content_block.draft = True
+        content_block.save()
+
+        page.delete()
+
+        assert content_block_collection.publish_generation == 0
+
+    @pytest.mark.django_db
+    def test_unrelated_model(self, model_choice_content_block, site_factory):
+        content_block, page = model_choice_content_block
+
+        with patch.object(ModelChoiceServices, "content_blocks") as content_blocks:
+            site_factory.create()
+
+        content_blocks.assert_not_called()
+
+    @pytest.mark.django_db
+    def test_unrelated_model_memoized(self, model_choice_content_block, site_factory):
+        """
+        Saving objects of models which aren't chosen should look up the chosen models once per request.
+        """
+        sites = site_factory.create_batch(3)
+        render_cache.request_started()
+
+        try:
+            with patch.object(
+                render_cache, "get", wraps=render_cache.get
+            ) as get, CaptureQueriesContext(connection) as queries:
+                for site in sites:
+                    site.save()
+        finally:
+            render_cache.request_finished()
+
+        assert get.call_count == 1
+        assert not [query for query in queries if "content_blocks_" in query["sql"]]
+
+    @pytest.mark.django_db
+    def test_model_choices(
+        self,
+        settings,
+        content_block_collection,
+        model_choice_content_block,
+        site_factory,
+    ):
+        """
+        Models not in CONTENT_BLOCKS_MODEL_CHOICES should be ignored without touching the cache.
+        """
+        settings.CONTENT_BLOCKS_MODEL_CHOICES = ["pages.Page"]
+        content_block, page = model_choice_content_block
+
+        with patch.object(render_cache, "get") as get:
+            site_factory.create()
+            assert ModelChoiceServices.can_be_chosen(type(page))
+
+        get.assert_not_called()
+        page.save()
+        assert content_block_collection.publish_generation == 1
+
+    def test_connect_model_choice_invalidation(self, settings):
+        """
+        Invalidation should only be connected to the models in CONTENT_BLOCKS_MODEL_CHOICES.
+        """
+        settings.CONTENT_BLOCKS_MODEL_CHOICES = ["pages.Page"]
+        connect_model_choice_invalidation()
+
+        assert post_save.disconnect(
+            sender=Page, dispatch_uid="model_choice_save_pages.page"
+        )
+        assert post_delete.disconnect(
+            sender=Page, dispatch_uid="model_choice_delete_pages.page"
+        )
+
+
+class TestPrefetchServices:
+    @pytest.fixture
+    def render_model_choice_content_blocks(
+        self,
+        content_block_collection,
+        content_block_template_factory,
+        content_block_template_field_factory,
+        content_block_factory,
+        content_block_field_factory,
+        model_choice_template,
+        page_factory,
+    ):
+        """
+        Make a collection of content blocks each rendering a different page chosen in a model choice field.
+        """
+        template_field = content_block_template_field_factory.create(
+            content_block_template=content_block_template_factory.create(
+                template_filename=model_choice_template.name
+            ),
+            field_type=ContentBlockFields.MODEL_CHOICE_FIELD,
+            key="modelchoicefield",
+            model_choice_content_type=ContentType.objects.get_for_model(
+                page_factory._meta.model
+            ),
+        )
+
+        def make(count):
+            content_block_collection.content_blocks.clear()
+            for page in page_factory.create_batch(count):
+                content_block = content_block_factory.create(
+                    content_block_template=template_field.content_block_template
+                )
+                content_block_field_factory.create(
+                    content_block=content_block,
+                    template_field=template_field,
+                    model_choice_content_type=template_field.model_choice_content_type,
+                    model_choice_object_id=page.id,
+                )
+                content_block_collection.content_blocks.add(content_block)
+
+            with CaptureQueriesContext(connection) as queries:
+                html = RenderServices.render_content_blocks(
+                    content_block_collection.content_blocks.visible()
+                )
+            return html, len(queries)
+
+        return make
+
+    @pytest.mark.django_db
+    def test_model_choice_queries(self, render_model_choice_content_blocks):
+        """
+        The number of queries should not grow with the number of model choice fields.
+        """
+        # Warm up the template loaders.
+        render_model_choice_content_blocks(1)
+
+        _, one_query_count = render_model_choice_content_blocks(1)
+        html, query_count = render_model_choice_content_blocks(5)
+
+        assert all(html)
+        assert query_count == one_query_count == 3
+
+    @pytest.mark.django_db
+    def test_render_batch(
+        self, content_block_collection, render_model_choice_content_blocks
+    ):
+        """
+        Content blocks fetched with render_batch and rendered one at a time should be resolved together.
+        """
+        html, _ = render_model_choice_content_blocks(5)
+        content_blocks = content_block_collection.content_blocks.visible()
+
+        with CaptureQueriesContext(connection) as unbatched_queries:
+            for content_block in content_blocks.all():
+                RenderServices.render_content_block(content_block)
+
+        with CaptureQueriesContext(connection) as queries:
+            assert [
+                RenderServices.render_content_block(content_block)
+                for content_block in content_blocks.render_batch()
+            ] == html
+
+        assert len(queries) == 3
+        assert len(unbatched_queries) > len(queries)
+
+    @pytest.mark.django_db
+    def test_nested(self, nested_content_block, django_assert_num_queries):
+        content_block, nested_content_block = nested_content_block
+        content_block = ContentBlock.objects.nested().get(id=content_block.id)
+
+        PrefetchServices.resolve(content_block)
+
+        nested_field = content_block.lazy_context.field("nestedfield")
+        with django_assert_num_queries(0):
+            assert list(nested_field.context_value) == [nested_content_block]
+
+    @pytest.mark.django_db
+    def test_model_choice_querysets(self, settings, model_choice_content_block):
+        settings.CONTENT_BLOCKS_MODEL_CHOICE_QUERYSETS = {
+            "pages.page": {"prefetch_related": ["content_blocks"]}
+        }
+        content_block, page = model_choice_content_block
+        content_block = ContentBlock.objects.get(id=content_block.id)
+
+        PrefetchServices.resolve(content_block)
+
+        field = content_block.content_block_fields.get()
+        assert field.model_choice == page
+
+
+class TestPublishedFieldsServices:
+    @pytest.fixture
+    def published_text_content_block(
+        self,
+        text_content_block_template,
+        content_block_template_field_factory,
+        content_block_factory,
+        content_block_field_factory,
+    ):
+        template_field = content_block_template_field_factory.create(
+            content_block_template=text_content_block_template, key="textfield"
+        )
+        content_block = content_block_factory.create(
+            content_block_template=text_content_block_template
+        )
+        field = content_block_field_factory.create(
+            content_block=content_block, template_field=template_field
+        )
+        return content_block, field
+
+    @pytest.mark.django_db
+    def test_render(self, settings, published_text_content_block):
+        """
+        Published content blocks should be rendered from their published fields until a field is saved.
+        """
+        settings.CONTENT_BLOCKS_PUBLISHED_FIELDS = True
+        content_block, field = published_text_content_block
+        text = field.text
+        PublishedFieldsServices.store([content_block])
+
+        # update() doesn't send signals so the published fields aren't forgotten.
+        ContentBlockField.objects.filter(id=field.id).update(text=faker.text())
+        content_block = ContentBlock.objects.visible().get(id=content_block.id)
+        PrefetchServices.resolve(content_block)
+
+        assert content_block.render_fields["textfield"].id == field.id
+        assert RenderServices.render_content_block(content_block) == text
+
+        field.refresh_from_db()
+        field.save()
+        assert not PublishedFields.objects.exists()
+
+        content_block = ContentBlock.objects.visible().get(id=content_block.id)
+        assert RenderServices.render_content_block(content_block) == field.text
+
+    @pytest.mark.django_db
+    def test_save_draft_field(self, settings, published_text_content_block):
+        """
+        Drafts have no published fields so saving their fields in the editor shouldn't delete any.
+        """
+        settings.CONTENT_BLOCKS_PUBLISHED_FIELDS = True
+        content_block, field = published_text_content_block
+        content_block.draft = True
+        content_block.save()
+        content_block = ContentBlock.objects.get(id=content_block.id)
+        field = content_block.fields["textfield"]
+
+        with CaptureQueriesContext(connection) as queries:
+            field.save()
+
+        assert not [
+            query
+            for query in queries.captured_queries
+            if PublishedFields._meta.db_table in query["sql"]
+        ]
+
+    @pytest.mark.django_db
+    def test_render_disabled(self, published_text_content_block):
+        content_block, field = published_text_content_block
+        PublishedFieldsServices.store([content_block])
+
+        ContentBlockField.objects.filter(id=field.id).update(text=faker.text())
+        field.refresh_from_db()
+        content_block = ContentBlock.objects.visible().get(id=content_block.id)
+
+        assert RenderServices.render_content_block(content_block) == field.text
+
+    @pytest.mark.django_db
+    def test_store(self, deeply_nested_content_block):
+        content_blocks = deeply_nested_content_block
+
+        PublishedFieldsServices.store(content_blocks[:1])
+
+        published = dict(
+            PublishedFields.objects.values_list("content_block_id", "fields")
+        )
+        assert set(published) == {content_block.id for content_block in content_blocks}
+        for content_block in content_blocks:
+            assert published[content_block.id] == {
+                field.template_field.key: [
+                    field.id,
+                    field.field_type,
+                    {
+                        column: getattr(field, column)
+                        for column in TemplateAnalysisServices.FIELD_TYPE_COLUMNS[
+                            field.field_type
+                        ]
+                    },
+                ]
+                for field in content_block.content_block_fields.all()
+            }
+
+
+class TestTemplateAnalysisServices:
+    @pytest.mark.parametrize(
+        "template, keys",
+        [
+            ("{{ content_block.textfield }}", {"textfield"}),
+            (
+                "{% if content_block.a %}{{ content_block.b|default:content_block.c }}{% endif %}",
+                {"a", "b", "c"},
+            ),
+            (
+                "{% for content_block in content_block.a %}{{ content_block.b }}{% endfor %}",
+                {"a"},
+            ),
+            ("{{ content_block_object.id }}{{ content_block.a.url }}", {"a"}),
+            (
+                "{% load content_blocks %}{% render_content_blocks content_block.a %}",
+                {"a"},
+            ),
+            ("{{ content_block }}", None),
+            ("{% for k, v in content_block.items %}{{ v }}{% endfor %}", None),
+            ("{% with b=content_block %}{{ b.a }}{% endwith %}", None),
+            ("{{ content_block_object.context }}", None),
+            ("{% load i18n %}{% blocktrans %}a{% endblocktrans %}", None),
+            ("{% include template_name %}", None),
+        ],
+    )
+    def test_analyse(self, template, keys):
+        used_keys = TemplateAnalysisServices.analyse(Template(template).nodelist)
+        assert used_keys == (None if keys is None else frozenset(keys))
+
+    @pytest.mark.django_db
+    def test_used_keys(self, text_template):
+        template_name = f"content_blocks/content_blocks/{text_template.name}"
+
+        assert TemplateAnalysisServices.used_keys(template_name) == {"textfield"}
+        assert TemplateAnalysisServices.used_keys(faker.file_name()) is None
+
+    def test_template_keys_cached(self):
+        template = Template("{{ content_block.textfield }}")
+        TemplateAnalysisServices.template_keys(template)
+
+        with patch.object(TemplateAnalysisServices, "analyse") as analyse:
+            assert TemplateAnalysisServices.template_keys(template) == {"textfield"}
+
+        analyse.assert_not_called()
+
+    @pytest.mark.django_db
+    def test_plan_once_per_template(
+        self, text_content_block_template, content_block_factory
+    ):
+        content_blocks = content_block_factory.create_batch(
+            3, content_block_template=text_content_block_template
+        )
+
+        with patch.object(
+            TemplateAnalysisServices, "plan", wraps=TemplateAnalysisServices.plan
+        ) as plan:
+            PrefetchServices.prefetch_fields(content_blocks)
+
+        plan.assert_called_once()
+
+    @pytest.mark.django_db
+    def test_plan_template_fields_version(
+        self, text_content_block_template, content_block_template_field_factory
+    ):
+        """
+        Plans should be made again when another process saves a template field, which deletes the version of the
+        template fields from the shared cache.
+        """
+        content_block_template_field_factory.create(
+            content_block_template=text_content_block_template, key="textfield"
+        )
+        plan = TemplateAnalysisServices.plan(text_content_block_template)
+        assert plan[1] == {"text"}
+        key = render_cache.template_fields_key(text_content_block_template.id)
+        version = render_cache.get(key)
+        assert TemplateAnalysisServices.plan(text_content_block_template) == plan
+
+        # Saved by another process, only the shared cache sees the change.
+        text_content_block_template.content_block_template_fields.update(
+            field_type=ContentBlockFields.CONTENT_FIELD
+        )
+        render_cache.cache.delete(key)
+
+        keys, columns, field_types = TemplateAnalysisServices.plan(
+            text_content_block_template
+        )
+        assert columns == {"content"}
+        assert render_cache.get(key) != version
+
+        content_block_template_field_factory.create(
+            content_block_template=text_content_block_template, key="other"
+        )
+        assert render_cache.get(key) is None
+
+    @pytest.mark.django_db
+    def test_include(self, text_template):
+        template = Template(
+            f"{{% include 'content_blocks/content_blocks/{text_template.name}' %}}"
+        )
+        assert TemplateAnalysisServices.analyse(template.nodelist) == {"textfield"}
+
+    @pytest.mark.django_db
+    def test_render_fields(
+        self,
+        text_content_block_template,
+        content_block_template_field_factory,
+        content_block_factory,
+        content_block_field_factory,
+    ):
+        """
+        Only the fields used by the template should be loaded, as render fields.  Other fields are loaded when read.
+        """
+        text_field, other_field = [
+            content_block_template_field_factory.create(
+                content_block_template=text_content_block_template, key=key
+            )
+            for key in ["textfield", "otherfield"]
+        ]
+        content_block = content_block_factory.create(
+            content_block_template=text_content_block_template
+        )
+        text, other_text = faker.text(), faker.text()
+        content_block_field_factory.create(
+            content_block=content_block, template_field=text_field, text=text
+        )
+        content_block_field_factory.create(
+            content_block=content_block, template_field=other_field, text=other_text
+        )
+        content_block = ContentBlock.objects.visible().get(id=content_block.id)
+
+        PrefetchServices.resolve(content_block)
+
+        assert list(content_block.render_fields) == ["textfield"]
+        assert isinstance(
+            content_block.render_fields["textfield"], ContentBlockRenderField
+        )
+        assert RenderServices.render_content_block(content_block) == text
+        assert content_block.lazy_context["otherfield"] == other_text
+
+    @pytest.mark.django_db
+    def test_render_virtual_fields(
+        self,
+        text_content_block_template,
+        content_block_template_field_factory,
+        content_block_factory,
+    ):
+        """
+        Fields the template uses which the content block has no ContentBlockField for should render the default.
+        """
+        content_block_template_field_factory.create(
+            content_block_template=text_content_block_template, key="textfield"
+        )
+        content_block = content_block_factory.create(
+            content_block_template=text_content_block_template
+        )
+        content_block = ContentBlock.objects.visible().get(id=content_block.id)
+
+        PrefetchServices.resolve(content_block)
+
+        field = content_block.render_fields["textfield"]
+        assert field.id is None
+        assert field.value == ""
+        assert RenderServices.render_content_block(content_block) == ""
+
+    def test_value(self):
+        """
+        Render field values should be the same types the model fields give.
+        """
+        name = faker.file_name(extension="jpg")
+        image = TemplateAnalysisServices.value(
+            ContentBlockFields.IMAGE_FIELD, {"image": name}
+        )
+        assert isinstance(image, FieldFile)
+        assert image.name == name
+
+        assert TemplateAnalysisServices.value(
+            ContentBlockFields.MODEL_CHOICE_FIELD,
+            {"model_choice_content_type": 1, "model_choice_object_id": 2},
+        ) == (1, 2)
+        assert (
+            TemplateAnalysisServices.value(ContentBlockFields.NESTED_FIELD, {}) is None
+        )
@@ -0,0 +1,235 @@
+"""
+Tests for image services.
+"""
+import io
+from unittest.mock import patch
+
+import pytest
+from django.template import Context, Template
+from faker import Faker
+from PIL import Image
+
+from content_blocks.models import ImageRendition, image_storage
+from content_blocks.services.image import RenditionServices, render_renditions
+
+faker = Faker()
+
+
+@pytest.fixture
+def rendition_settings(settings):
+    settings.CONTENT_BLOCKS_IMAGE_RENDITIONS = {
+        "thumbnail": {"widths": [32], "format": "WEBP"},
+        "default": {"widths": [64, 128, 1000], "format": None},
+    }
+    return settings
+
+
+def _image_bytes(size=(300, 200), image_format="PNG"):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color=(155, 0, 0)).save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+class TestRenderRenditions:
+    def test_render_renditions(self):
+        """
+        Should resize to each width keeping the aspect ratio. Widths larger than the original are not upscaled.
+        """
+        renditions = render_renditions(_image_bytes(), [150, 600], "WEBP")
+
+        assert [(r[0], r[1], r[2]) for r in renditions] == [
+            (150, 100, "WEBP"),
+            (300, 200, "WEBP"),
+        ]
+
+        with Image.open(io.BytesIO(renditions[0][3])) as image:
+            assert image.format == "WEBP"
+            assert image.size == (150, 100)
+
+    def test_render_renditions_original_format(self):
+        renditions = render_renditions(_image_bytes(image_format="JPEG"), [100])
+        assert renditions[0][2] == "JPEG"
+
+
+class TestRenditionServices:
+    @pytest.mark.django_db
+    def test_generate(
+        self, rendition_settings, populated_image_content_block_field_factory
+    ):
+        name = populated_image_content_block_field_factory.create().image.name
+
+        renditions = RenditionServices.generate(name)
+
+        assert ImageRendition.objects.count() == len(renditions) == 4
+        assert [r.width for r in renditions if r.spec == "default"] == [64, 128, 300]
+        for rendition in renditions:
+            assert image_storage().exists(rendition.name)
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize("executor", ["thread", "process"])
+    def test_generate_many(
+        self,
+        executor,
+        rendition_settings,
+        populated_image_content_block_field_factory,
+    ):
+        rendition_settings.CONTENT_BLOCKS_RENDITION_EXECUTOR = executor
+        names = [
+            populated_image_content_block_field_factory.create().image.name
+            for _ in range(3)
+        ]
+
+        assert (
+            RenditionServices.generate_many(names + [faker.file_name(extension="svg")])
+            == 3
+        )
+        assert ImageRendition.objects.count() == 12
+
+        # Existing renditions are not regenerated
+        assert RenditionServices.generate_many(names) == 0
+        assert RenditionServices.generate_many(names, force=True) == 3
+        assert ImageRendition.objects.count() == 12
+
+    @pytest.mark.django_db
+    def test_generate_many_missing_file(self, rendition_settings):
+        assert RenditionServices.generate_many([faker.file_name(extension="png")]) == 0
+
+    @pytest.mark.django_db
+    def test_renditions_lazy(
+        self, rendition_settings, populated_image_content_block_field_factory
+    ):
+        """
+        Renditions should be generated on a miss.
+        """
+        name = populated_image_content_block_field_factory.create().image.name
+
+        renditions = RenditionServices.renditions(name, "thumbnail")
+
+        assert len(renditions) == 1
+        assert ImageRendition.objects.filter(source=name).count() == 1
+        assert RenditionServices.renditions(name, "thumbnail") == renditions
+
+    @pytest.mark.django_db
+    def test_renditions_failure(
+        self, rendition_settings, populated_image_content_block_field_factory
+    ):
+        """
+        Images which can't be rendered should be logged and not tried again on every render.
+        """
+        name = populated_image_content_block_field_factory.create().image.name
+
+        with patch.object(
+            RenditionServices,
+            "generate",
+            side_effect=Image.DecompressionBombError("Too large"),
+        ) as generate:
+            assert RenditionServices.renditions(name, "thumbnail") == []
+            assert RenditionServices.renditions(name, "thumbnail") == []
+
+        assert generate.call_count == 1
+        assert RenditionServices.renditions(name, "default")
+        assert not ImageRendition.objects.filter(spec="thumbnail").exists()
+
+    @pytest.mark.django_db
+    def test_srcset(
+        self, rendition_settings, populated_image_content_block_field_factory
+    ):
+        name = populated_image_content_block_field_factory.create().image.name
+        renditions = RenditionServices.generate(name, ["default"])
+
+        assert RenditionServices.srcset(name, "default") == ", ".join(
+            f"{r.url} {r.width}w" for r in renditions
+        )
+
+    @pytest.mark.django_db
+    def test_delete(
+        self, rendition_settings, populated_image_content_block_field_factory
+    ):
+        name = populated_image_content_block_field_factory.create().image.name
+        renditions = RenditionServices.generate(name)
+
+        RenditionServices.delete(name)
+
+        assert not ImageRendition.objects.exists()
+        for rendition in renditions:
+            assert not image_storage().exists(rendition.name)
+
+    @pytest.mark.django_db
+    def test_cleanup_media_deletes_renditions(
+        self, rendition_settings, populated_image_content_block_field_factory
+    ):
+        image_field = populated_image_content_block_field_factory.create()
+        RenditionServices.generate(image_field.image.name)
+
+        image_field.delete()
+
+        assert not ImageRendition.objects.exists()
+
+    @pytest.mark.django_db
+    def test_image_names(
+        self, nested_content_block, populated_image_content_block_field_factory
+    ):
+        content_block, nested_content_block = nested_content_block
+        image_field = populated_image_content_block_field_factory.create(
+            content_block=nested_content_block
+        )
+
+        assert RenditionServices.image_names([content_block]) == [
+            image_field.image.name
+        ]
+
+
+class TestRenditionTemplateTags:
+    @pytest.mark.django_db
+    def test_image_srcset(
+        self, rendition_settings, populated_image_content_block_field_factory
+    ):
+        image = populated_image_content_block_field_factory.create().image
+        template = Template(
+            "{% load content_blocks %}{% image_srcset image 'default' %}"
+        )
+
+        html = template.render(Context({"image": image}))
+
+        assert html == RenditionServices.srcset(image.name, "default")
+
+    @pytest.mark.django_db
+    def test_image_rendition_url(
+        self, rendition_settings, populated_image_content_block_field_factory
+    ):
+        image = populated_image_content_block_field_factory.create().image
+        template = Template(
+            "{% load content_blocks %}{% image_rendition_url image 'thumbnail' %}"
+        )
+
+        html = template.render(Context({"image": image}))
+
+        assert html == ImageRendition.objects.get(source=image.name).url
+
+    @pytest.mark.django_db
+    def test_unknown_spec(
+        self, caplog, rendition_settings, populated_image_content_block_field_factory
+    ):
+        image = populated_image_content_block_field_factory.create().image
+        template = Template(
+            "{% load content_blocks %}{% image_srcset image 'unknown' %}"
+            "|{% image_rendition_url image 'unknown' %}"
+        )
+
+        html = template.render(Context({"image": image}))
+
+        assert html == f"|{image.url}"
+        assert "Unknown image rendition spec 'unknown'." in caplog.text
+        assert not ImageRendition.objects.exists()
+
+    @pytest.mark.django_db
+    def test_image_rendition_url_svg(self, image_content_block_field_factory, svg_file):
+        image_field = image_content_block_field_factory.create(image=svg_file.name)
+        template = Template(
+            "{% load content_blocks %}{% image_rendition_url image 'thumbnail' %}"
+        )
+
+        assert (
+            template.render(Context({"image": image_field.image}))
+            == image_field.image.url
+        )
@@ -0,0 +1,99 @@
+"""
+Tests for chunked upload services.
+"""
+from datetime import timedelta
+
+import pytest
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.utils import timezone
+from faker import Faker
+
+from content_blocks.models import ChunkedUpload
+from content_blocks.services.upload import ChunkedUploadServices
+
+faker = Faker()
+
+
+class TestChunkedUploadServices:
+    @pytest.mark.django_db
+    def test_append(self):
+        content = faker.binary(length=100)
+        chunked_upload = ChunkedUploadServices.create(
+            faker.file_name(extension="mp4"), len(content)
+        )
+
+        for offset in range(0, len(content), 30):
+            chunk = ContentFile(content[offset:][:30])
+            chunked_upload = ChunkedUploadServices.append(
+                chunked_upload.token, offset, chunk
+            )
+
+        assert chunked_upload.completed
+        upload = ChunkedUploadServices.open(chunked_upload.token)
+        assert upload.read() == content
+        upload.close()
+
+    @pytest.mark.django_db
+    def test_open_lazily(self):
+        """
+        The temporary file should only be opened when the upload is read.
+        """
+        content = faker.binary(length=10)
+        chunked_upload = ChunkedUploadServices.create(faker.file_name(), len(content))
+        ChunkedUploadServices.append(chunked_upload.token, 0, ContentFile(content))
+
+        upload = ChunkedUploadServices.open(chunked_upload.token)
+
+        assert upload.closed
+        assert upload.size == len(content)
+        assert upload.read() == content
+        assert not upload.closed
+        upload.close()
+        assert upload.closed
+
+    @pytest.mark.django_db
+    def test_append_resume(self):
+        """
+        A chunk sent again after a dropped response should be ignored, the offset tells the client where to resume.
+        """
+        content = faker.binary(length=100)
+        chunked_upload = ChunkedUploadServices.create(faker.file_name(), len(content))
+        ChunkedUploadServices.append(chunked_upload.token, 0, ContentFile(content[:50]))
+
+        chunked_upload = ChunkedUploadServices.append(
+            chunked_upload.token, 0, ContentFile(content[:50])
+        )
+        assert chunked_upload.offset == 50
+        assert ChunkedUploadServices.open(chunked_upload.token) is None
+
+        chunked_upload = ChunkedUploadServices.append(
+            chunked_upload.token, 50, ContentFile(content[50:])
+        )
+        assert ChunkedUploadServices.path(chunked_upload).read_bytes() == content
+
+    @pytest.mark.django_db
+    def test_append_too_large(self):
+        chunked_upload = ChunkedUploadServices.create(faker.file_name(), 10)
+
+        with pytest.raises(ValidationError):
+            ChunkedUploadServices.append(
+                chunked_upload.token, 0, ContentFile(faker.binary(length=11))
+            )
+
+    @pytest.mark.django_db
+    def test_create_max_size(self, settings):
+        settings.CONTENT_BLOCKS_CHUNKED_UPLOAD_MAX_SIZE = 10
+
+        with pytest.raises(ValidationError):
+            ChunkedUploadServices.create(faker.file_name(), 11)
+
+    @pytest.mark.django_db
+    def test_delete_expired(self, settings):
+        chunked_upload = ChunkedUploadServices.create(faker.file_name(), 10)
+        ChunkedUpload.objects.update(create_date=timezone.now() - timedelta(days=2))
+
+        ChunkedUploadServices.delete_expired()
+
+        assert not ChunkedUpload.objects.exists()
+        assert not ChunkedUploadServices.path(chunked_upload).exists()
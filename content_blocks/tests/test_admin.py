@@ -12,7 +12,9 @@ from content_blocks.models import (
     ContentBlockFields,
     ContentBlockTemplate,
     ContentBlockTemplateField,
+    TemplateFieldDeletion,
 )
+from content_blocks.services.content_block_template import TemplateFieldDeletionServices
 from content_blocks.tests.test_management_commands import _test_imported_json
 
 faker = Faker()
@@ -92,6 +94,38 @@ class TestContentBlockTemplateAdmin:
 
         assert response.status_code == 302
 
+    def test_content_block_template_admin_change_post_delete_field(
+        self,
+        admin_client,
+        base_admin_url,
+        content_block_template_field,
+        content_block_template_form_data,
+    ):
+        """
+        Deleted template fields should be queued for deletion.
+        """
+        inline_form_prefix = "content_block_template_fields"
+        content_block_template = content_block_template_field.content_block_template
+        content_block_template_form_data.update(
+            {
+                f"{inline_form_prefix}-INITIAL_FORMS": 1,
+                f"{inline_form_prefix}-0-id": content_block_template_field.id,
+                f"{inline_form_prefix}-0-content_block_template": content_block_template.id,
+                f"{inline_form_prefix}-0-key": content_block_template_field.key,
+                f"{inline_form_prefix}-0-DELETE": "on",
+            }
+        )
+        response = admin_client.post(
+            reverse(f"{base_admin_url}_change", args=[content_block_template.id]),
+            content_block_template_form_data,
+        )
+
+        assert response.status_code == 302
+        assert not ContentBlockTemplateField.objects.exists()
+        deletion = TemplateFieldDeletion.objects.get()
+        assert deletion.template_field == content_block_template_field
+        assert deletion.status == TemplateFieldDeletion.Status.PENDING
+
     @pytest.fixture
     def content_block_template_model_admin(self):
         return admin.site._registry.get(ContentBlockTemplate)
@@ -349,3 +383,29 @@ class TestContentBlockCollectionAdmin:
             {"slug": faker.slug(256), "_contentblocks": "Save and edit content blocks"},
         )
         assert response.status_code == 302
+
+
+@pytest.mark.django_db
+class TestTemplateFieldDeletionAdmin:
+    @pytest.fixture
+    def base_admin_url(self):
+        return "admin:content_blocks_templatefielddeletion"
+
+    @pytest.fixture
+    def template_field_deletion(self, content_block_template_field):
+        return TemplateFieldDeletionServices.queue(content_block_template_field)
+
+    def test_template_field_deletion_admin_changelist(
+        self, admin_client, base_admin_url, template_field_deletion
+    ):
+        response = admin_client.get(reverse(f"{base_admin_url}_changelist"))
+        assert response.status_code == 200
+        assert str(template_field_deletion) in response.content.decode()
+
+    def test_template_field_deletion_admin_change_get(
+        self, admin_client, base_admin_url, template_field_deletion
+    ):
+        response = admin_client.get(
+            reverse(f"{base_admin_url}_change", args=[template_field_deletion.id])
+        )
+        assert response.status_code == 200
@@ -136,11 +136,23 @@ class TestContentBlockTemplateFieldAdminForm:
         assert not form.is_valid()
         assert "field_type" in form.errors.keys()
 
+    @pytest.mark.django_db
+    def test_model_choices(self, settings):
+        """
+        Only the models in CONTENT_BLOCKS_MODEL_CHOICES should be offered.
+        """
+        settings.CONTENT_BLOCKS_MODEL_CHOICES = ["pages.Page"]
+        form = ContentBlockTemplateFieldAdminForm()
+
+        assert list(form.fields["model_choice_content_type"].queryset) == [
+            ContentType.objects.get(app_label="pages", model="page")
+        ]
+
     @pytest.mark.django_db
     def test_save(self, content_block_field_factory):
         """
-        If this is a new template field a field corresponding to this field should be added to all existing content
-        blocks that share the same content block template as this field.
+        If this is a new template field existing content blocks that share the same content block template should
+        have a virtual field for it, without a ContentBlockField being created.
         """
         content_block_field = content_block_field_factory.create(
             field_type=ContentBlockFields.TEXT_FIELD
@@ -156,7 +168,11 @@ class TestContentBlockTemplateFieldAdminForm:
         form = ContentBlockTemplateFieldAdminForm(form_data)
         assert form.is_valid()
         form.save()
-        assert ContentBlockField.objects.count() == 2
+        assert ContentBlockField.objects.count() == 1
+
+        field = content_block.fields["new_key"]
+        assert field.pk is None
+        assert field.context_value == ""
 
     def test_validate_choices(self):
         choices = "not even json"
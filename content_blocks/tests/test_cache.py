@@ -0,0 +1,585 @@
+"""
+Content blocks test_cache.py
+"""
+import sys
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+from asgiref.local import Local
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.template import Context, loader
+from faker import Faker
+
+from content_blocks.cache import (
+    CODECS,
+    CachedHtml,
+    LocalCache,
+    compress,
+    decompress,
+    render_cache,
+)
+from content_blocks.forms import PublishContentBlocksForm
+from content_blocks.models import ContentBlock
+from content_blocks.services.content_block import CollectionServices, RenderServices
+from content_blocks.templatetags.content_blocks import (
+    content_block_collection as content_block_collection_tag,
+)
+
+faker = Faker()
+
+
+@pytest.fixture
+def render_cache_settings(settings):
+    settings.CONTENT_BLOCKS_RENDER_CACHE = True
+    cache.clear()
+    yield settings
+    cache.clear()
+
+
+@pytest.fixture
+def nested_render_content_block(nested_content_block, tmp_path_factory):
+    """
+    Nested content block with a parent template which renders nested content blocks with the template tag.
+    """
+    template = (
+        tmp_path_factory.getbasetemp()
+        / "tmp-templates/content_blocks/content_blocks/_test_nested_render.html"
+    )
+    template.parent.mkdir(parents=True, exist_ok=True)
+    template.write_text(
+        "{% load content_blocks %}"
+        "{% for b in content_block.nestedfield %}{% render_content_block b %}{% endfor %}"
+    )
+
+    content_block, nested_content_block = nested_content_block
+    content_block.content_block_template.template_filename = template.name
+    content_block.content_block_template.save()
+    return content_block, nested_content_block
+
+
+def _rendered_templates(content_block, context=None):
+    """
+    :return: List of template names rendered when rendering the content block.
+    """
+    with patch(
+        "content_blocks.services.content_block.render_to_string",
+        wraps=loader.render_to_string,
+    ) as render_to_string:
+        RenderServices.render_content_block(content_block, context=context)
+    return [c.args[0] for c in render_to_string.call_args_list]
+
+
+class TestRenderCache:
+    @pytest.mark.django_db
+    def test_render_cached(self, render_cache_settings, nested_render_content_block):
+        """
+        Published content blocks and their nested content blocks should be cached separately.
+        """
+        content_block, nested_content_block = nested_render_content_block
+
+        assert _rendered_templates(content_block) == [
+            content_block.template,
+            nested_content_block.template,
+        ]
+        assert _rendered_templates(content_block) == []
+
+    @pytest.mark.django_db
+    def test_render_draft_not_cached(
+        self, render_cache_settings, nested_render_content_block
+    ):
+        content_block, nested_content_block = nested_render_content_block
+        content_block.draft = True
+        content_block.save()
+
+        RenderServices.render_content_block(content_block)
+
+        assert len(_rendered_templates(content_block)) == 2
+
+    @pytest.mark.django_db
+    def test_render_cache_timeout_0_not_cached(
+        self, render_cache_settings, text_content_block
+    ):
+        RenderServices.render_content_block(
+            text_content_block, context={"cache_timeout": 0}
+        )
+
+        assert _rendered_templates(text_content_block, {"cache_timeout": 0}) == [
+            text_content_block.template
+        ]
+
+    @pytest.mark.django_db
+    def test_render_cache_disabled(self, settings, text_content_block):
+        settings.CONTENT_BLOCKS_RENDER_CACHE = False
+        RenderServices.render_content_block(text_content_block)
+
+        assert _rendered_templates(text_content_block) == [text_content_block.template]
+
+    @pytest.mark.django_db
+    def test_nested_save_touches_parents(
+        self,
+        render_cache_settings,
+        nested_render_content_block,
+        django_capture_on_commit_callbacks,
+    ):
+        """
+        Saving a nested content block should re-render only the path from the nested content block to the root.
+        """
+        content_block, nested_content_block = nested_render_content_block
+        RenderServices.render_content_block(content_block)
+
+        text = faker.text(256)
+        field = nested_content_block.content_block_fields.get()
+        field.text = text
+        with django_capture_on_commit_callbacks(execute=True):
+            field.save()
+
+        content_block = ContentBlock.objects.get(id=content_block.id)
+        assert _rendered_templates(content_block) == [
+            content_block.template,
+            nested_content_block.template,
+        ]
+        assert text in RenderServices.render_content_block(content_block)
+
+    @pytest.mark.django_db
+    def test_touch_once_per_transaction(
+        self,
+        render_cache_settings,
+        nested_render_content_block,
+        django_capture_on_commit_callbacks,
+    ):
+        """
+        A content block saved many times in a transaction should be touched once, when the transaction commits.
+        """
+        _, nested_content_block = nested_render_content_block
+        field = nested_content_block.content_block_fields.get()
+        # Touches left pending by the fixtures' saves, which aren't committed.
+        render_cache.request_state.pending_touches = {}
+
+        with patch.object(render_cache, "touch") as touch:
+            with django_capture_on_commit_callbacks(execute=True):
+                for _ in range(3):
+                    field.save()
+                nested_content_block.save()
+                assert not touch.called
+
+        touch.assert_called_once_with(nested_content_block)
+
+    @pytest.mark.django_db
+    def test_publish_unchanged_cached(
+        self,
+        render_cache_settings,
+        content_block_collection,
+        text_content_block,
+        django_capture_on_commit_callbacks,
+    ):
+        """
+        Publishing again should not touch unchanged content blocks, their clones are still cached.
+        """
+        render_cache_settings.CONTENT_BLOCKS_PRE_RENDER = False
+        text_content_block.draft = True
+        text_content_block.save()
+        content_block_collection.content_blocks.add(text_content_block)
+
+        def publish():
+            form = PublishContentBlocksForm({}, parent=content_block_collection)
+            assert form.is_valid()
+            with django_capture_on_commit_callbacks(execute=True):
+                form.save()
+            return content_block_collection.content_blocks.published().get()
+
+        published = publish()
+        RenderServices.render_content_block(published)
+
+        content_block = publish()
+        assert content_block.id != published.id
+        assert content_block.fingerprint == published.fingerprint
+        assert _rendered_templates(content_block) == []
+
+    @pytest.mark.django_db
+    def test_publish_touches_changed(
+        self,
+        render_cache_settings,
+        content_block_collection,
+        text_content_block,
+        django_capture_on_commit_callbacks,
+    ):
+        """
+        Editing a published content block directly should still touch it.
+        """
+        RenderServices.render_content_block(text_content_block)
+        render_cache.request_state.pending_touches = {}
+
+        with django_capture_on_commit_callbacks(execute=True):
+            text_content_block.visible = False
+            text_content_block.save()
+
+        assert _rendered_templates(text_content_block) == [text_content_block.template]
+
+    @pytest.mark.django_db
+    def test_touch_draft(self, render_cache_settings, text_content_block):
+        """
+        Saving a draft should not change the version of the published content block with the same fingerprint.
+        """
+        version = render_cache.version(text_content_block)
+        text_content_block.draft = True
+
+        render_cache.touch(text_content_block)
+
+        assert render_cache.version(text_content_block) == version
+
+    @pytest.mark.django_db
+    def test_lookup_new_versions(self, render_cache_settings, text_content_blocks):
+        """
+        Versions missing from the cache should be added, without replacing versions started by another process, and
+        read back.
+        """
+        with patch.object(cache, "add", wraps=cache.add) as add, patch.object(
+            cache, "get_many", wraps=cache.get_many
+        ) as get_many:
+            values = render_cache.lookup(text_content_blocks, {})
+
+        assert add.call_count == len(text_content_blocks)
+        assert get_many.call_count == 2
+        assert {
+            content_block.id: values[content_block.id][1]
+            for content_block in text_content_blocks
+        } == {
+            content_block.id: render_cache.version(content_block)
+            for content_block in text_content_blocks
+        }
+
+    @pytest.mark.django_db
+    def test_lookup_version_started_elsewhere(
+        self, render_cache_settings, text_content_block
+    ):
+        """
+        A version started by another process between the lookup and the add should be used.
+        """
+        version_key = render_cache.version_key(
+            render_cache.ident(text_content_block.id, text_content_block.fingerprint)
+        )
+        add = cache.add
+
+        def add_after_other_process(key, value, **kwargs):
+            cache.set(key, 1, timeout=None)
+            return add(key, value, **kwargs)
+
+        with patch.object(cache, "add", side_effect=add_after_other_process):
+            assert (
+                render_cache.lookup([text_content_block], {})[text_content_block.id][1]
+                == 1
+            )
+
+        assert cache.get(version_key) == 1
+
+    @pytest.mark.django_db
+    def test_vary(self, render_cache_settings, site_factory):
+        sites = site_factory.create_batch(2)
+
+        assert render_cache.vary({"site": sites[0]}) != render_cache.vary(
+            {"site": sites[1]}
+        )
+
+
+class TestLocalCache:
+    def test_lru(self, settings):
+        """
+        The least recently used values should be evicted to keep the cache under the max size.
+        """
+        value = faker.pystr(min_chars=100, max_chars=100)
+        settings.CONTENT_BLOCKS_RENDER_CACHE_LOCAL_MAX_SIZE = sys.getsizeof(value) * 2
+        local_cache = LocalCache()
+
+        local_cache.set_many({"a": value, "b": value})
+        assert local_cache.get_many(["a"]) == {"a": value}
+        local_cache.set_many({"c": value})
+
+        assert local_cache.get_many(["a", "b", "c"]) == {"a": value, "c": value}
+        assert local_cache.size <= settings.CONTENT_BLOCKS_RENDER_CACHE_LOCAL_MAX_SIZE
+
+    def test_timeout(self, settings):
+        local_cache = LocalCache()
+
+        local_cache.set_many({"a": faker.pystr()}, timeout=-1)
+
+        assert local_cache.get_many(["a"]) == {}
+        assert local_cache.size == 0
+
+
+class TestRenderCacheLocal:
+    @pytest.fixture
+    def local_render_cache(self, render_cache_settings):
+        render_cache_settings.CONTENT_BLOCKS_RENDER_CACHE_LOCAL = True
+        render_cache.local_cache.clear()
+        # Requests made by other tests leave the generation marked as checked.
+        render_cache.request_state = Local()
+        yield render_cache
+        render_cache.local_cache.clear()
+        render_cache.request_state = Local()
+
+    def test_get_many(self, local_render_cache):
+        """
+        Values should be fetched from the shared cache once then kept in memory.
+        """
+        cache.set("a", "1")
+
+        assert local_render_cache.get_many(["a", "b"]) == {"a": "1"}
+        cache.delete("a")
+        assert local_render_cache.get_many(["a", "b"]) == {"a": "1"}
+
+    def test_poll(self, local_render_cache):
+        """
+        The in memory cache should be cleared when another process bumps the generation.
+        """
+        local_render_cache.set("a", "1")
+        cache.set("a", "2")
+
+        local_render_cache.bump_generation()
+
+        assert local_render_cache.get("a") == "2"
+
+    def test_poll_once_per_request(self, local_render_cache):
+        local_render_cache.request_started()
+
+        with patch.object(cache, "get", wraps=cache.get) as cache_get, patch.object(
+            cache, "get_many", return_value={}
+        ):
+            local_render_cache.get_many(["a"])
+            local_render_cache.get_many(["b"])
+
+        assert cache_get.call_count == 1
+
+    @pytest.mark.django_db
+    def test_render_content_blocks(self, local_render_cache, text_content_blocks):
+        """
+        Cached html should be fetched in one round trip.
+        """
+        html = RenderServices.render_content_blocks(text_content_blocks)
+        local_render_cache.local_cache.clear()
+
+        with patch.object(cache, "get_many", wraps=cache.get_many) as get_many:
+            assert RenderServices.render_content_blocks(text_content_blocks) == html
+
+        assert get_many.call_count == 1
+
+
+class TestRenderCacheFetch:
+    @pytest.fixture
+    def stale_html(self, render_cache_settings):
+        render_cache_settings.CONTENT_BLOCKS_RENDER_CACHE_STALE_TIMEOUT = 60
+        render_cache.stats.clear()
+        return CachedHtml(faker.text(), None, 1, time.time() - 1, 0.1)
+
+    def test_fetch_hit(self, render_cache_settings):
+        cached_html = CachedHtml(faker.text(), None, 1, None, 0.1)
+        render = Mock()
+
+        assert render_cache.fetch("key", 1, cached_html, render) == cached_html.html
+        render.assert_not_called()
+
+    def test_fetch_miss(self, render_cache_settings):
+        html = faker.text()
+
+        assert render_cache.fetch("key", 1, None, lambda: html, timeout=60) == html
+        cached_html = cache.get("key")
+        assert cached_html.html == html
+        assert cached_html.version == 1
+        assert cache.get(render_cache.lock_key("key")) is None
+
+    def test_fetch_locked_stale(self, stale_html):
+        """
+        Stale html should be served while another process renders.
+        """
+        cache.add(render_cache.lock_key("key"), 1)
+        render = Mock()
+
+        assert render_cache.fetch("key", 1, stale_html, render) == stale_html.html
+        render.assert_not_called()
+        assert render_cache.stats["stale"] == 1
+
+    def test_fetch_locked_new_version(self, stale_html):
+        """
+        Html for an old version is stale.
+        """
+        cached_html = stale_html._replace(expires=None)
+        cache.add(render_cache.lock_key("key"), 1)
+
+        assert render_cache.fetch("key", 2, cached_html, Mock()) == cached_html.html
+        assert render_cache.stats["stale"] == 1
+
+    def test_fetch_locked_wait(self, render_cache_settings):
+        """
+        Without stale html the process should wait for the lock then render if the html still isn't there.
+        """
+        render_cache_settings.CONTENT_BLOCKS_RENDER_CACHE_LOCK_WAIT = 0.1
+        render_cache.stats.clear()
+        cache.add(render_cache.lock_key("key"), 1)
+        html = faker.text()
+
+        assert render_cache.fetch("key", 1, None, lambda: html) == html
+        assert render_cache.stats["lock_timeout"] == 1
+
+    def test_fetch_error_stale(self, stale_html):
+        render = Mock(side_effect=ValueError)
+
+        assert render_cache.fetch("key", 1, stale_html, render) == stale_html.html
+        assert render_cache.stats["stale_error"] == 1
+        assert cache.get(render_cache.lock_key("key")) is None
+
+    def test_fetch_error(self, render_cache_settings):
+        with pytest.raises(ValueError):
+            render_cache.fetch("key", 1, None, Mock(side_effect=ValueError))
+
+    def test_refresh_early(self, render_cache_settings):
+        now = time.time()
+
+        assert render_cache.refresh_early(CachedHtml("", None, 1, now + 1, 1000), now)
+        assert not render_cache.refresh_early(
+            CachedHtml("", None, 1, now + 1000, 0), now
+        )
+        assert not render_cache.refresh_early(CachedHtml("", None, 1, None, 1000), now)
+
+        render_cache_settings.CONTENT_BLOCKS_RENDER_CACHE_EARLY_REFRESH = 0
+        assert not render_cache.refresh_early(
+            CachedHtml("", None, 1, now + 1, 1000), now
+        )
+
+
+class TestCompression:
+    @pytest.mark.parametrize("codec", CODECS)
+    def test_compress(self, settings, codec):
+        settings.CONTENT_BLOCKS_RENDER_CACHE_COMPRESS = codec
+        html = faker.text() * 100
+
+        value, value_codec = compress(html, min_size=100)
+
+        assert value_codec == codec
+        assert len(value) < len(html)
+        assert decompress(value, value_codec) == html
+
+    def test_compress_unknown(self, settings):
+        settings.CONTENT_BLOCKS_RENDER_CACHE_COMPRESS = "gzip"
+
+        with pytest.raises(ImproperlyConfigured):
+            compress(faker.pystr(max_chars=50), min_size=100)
+
+    def test_compress_small(self, settings):
+        settings.CONTENT_BLOCKS_RENDER_CACHE_COMPRESS = "zlib"
+        html = faker.pystr(max_chars=50)
+
+        assert compress(html, min_size=100) == (html, None)
+
+    def test_compress_disabled(self):
+        html = faker.text() * 100
+
+        assert compress(html, codec=None) == (html, None)
+
+    def test_fetch_compressed(self, render_cache_settings):
+        render_cache_settings.CONTENT_BLOCKS_RENDER_CACHE_COMPRESS = "zlib"
+        render_cache_settings.CONTENT_BLOCKS_RENDER_CACHE_COMPRESS_MIN_SIZE = 0
+        html = faker.text()
+
+        render_cache.fetch("key", 1, None, lambda: html)
+        cached_html = cache.get("key")
+
+        assert cached_html.codec == "zlib"
+        assert render_cache.fetch("key", 1, cached_html, Mock()) == html
+
+
+class TestCollectionCache:
+    @pytest.fixture
+    def collection_cache_settings(self, render_cache_settings):
+        render_cache_settings.CONTENT_BLOCKS_COLLECTION_CACHE = True
+        render_cache.request_started()
+        yield render_cache_settings
+        render_cache.request_finished()
+
+    @pytest.fixture
+    def collection(self, content_block_collection, text_content_block):
+        content_block_collection.content_blocks.add(text_content_block)
+        return content_block_collection
+
+    @pytest.mark.django_db
+    def test_render(self, collection_cache_settings, collection, text_content_block):
+        html = CollectionServices.render(collection.slug, {})
+
+        assert text_content_block.render() in html
+
+    @pytest.mark.django_db
+    def test_render_memoized(
+        self, collection_cache_settings, collection, django_assert_num_queries
+    ):
+        """
+        Rendering the same collection again in a request should not touch the database or the cache.
+        """
+        html = CollectionServices.render(collection.slug, {})
+
+        with django_assert_num_queries(0), patch.object(
+            cache, "get_many", wraps=cache.get_many
+        ) as get_many, patch.object(render_cache, "fetch") as fetch:
+            assert CollectionServices.render(collection.slug, {}) == html
+
+        get_many.assert_not_called()
+        fetch.assert_not_called()
+
+    @pytest.mark.django_db
+    def test_render_cached(self, collection_cache_settings, collection):
+        """
+        In a new request the cached html should be used without any queries.
+        """
+        html = CollectionServices.render(collection.slug, {})
+        render_cache.request_started()
+
+        with patch(
+            "content_blocks.services.content_block.render_to_string"
+        ) as render_to_string:
+            assert CollectionServices.render(collection.slug, {}) == html
+
+        render_to_string.assert_not_called()
+
+    @pytest.mark.django_db
+    def test_publish_invalidates(
+        self, collection_cache_settings, collection, text_content_block
+    ):
+        CollectionServices.render(collection.slug, {})
+        render_cache.request_started()
+
+        form = PublishContentBlocksForm({}, parent=collection)
+        assert form.is_valid()
+        form.save()
+
+        assert CollectionServices.resolve(collection.slug) == (collection.id, 1)
+
+    @pytest.mark.django_db
+    def test_slug_change(self, collection_cache_settings, collection):
+        old_slug = collection.slug
+        assert CollectionServices.resolve(old_slug) == (collection.id, 0)
+
+        collection.slug = faker.slug()
+        collection.save()
+
+        assert CollectionServices.resolve(old_slug) == (None, 0)
+        assert CollectionServices.resolve(collection.slug) == (collection.id, 0)
+
+    @pytest.mark.django_db
+    def test_delete(self, collection_cache_settings, collection):
+        slug = collection.slug
+        CollectionServices.resolve(slug)
+
+        collection.delete()
+
+        assert CollectionServices.resolve(slug) == (None, 0)
+
+    @pytest.mark.django_db
+    def test_template_tag(self, collection_cache_settings, collection):
+        html = content_block_collection_tag(Context(), collection.slug)[
+            "content_block_collection_html"
+        ]
+
+        assert html == CollectionServices.render(collection.slug, {})
+
+    @pytest.mark.django_db
+    def test_preview_not_cached(self, collection_cache_settings, collection):
+        assert CollectionServices.render(collection.slug, {"cache_timeout": 0}) is None
@@ -0,0 +1,111 @@
+"""
+Content blocks test_decorators.py
+"""
+import pytest
+from django.http import HttpResponse
+from django.utils.http import http_date
+
+from content_blocks.decorators import content_blocks_condition
+from content_blocks.models import ContentBlockCollection
+from content_blocks.services.content_block import PublishGenerationServices
+
+
+def get_collection(request, collection_id=None):
+    if collection_id is None:
+        return None
+    return ContentBlockCollection.objects.get(id=collection_id)
+
+
+@content_blocks_condition(get_collection)
+def collection_view(request, collection_id=None):
+    return HttpResponse("content blocks")
+
+
+@content_blocks_condition(get_collection, collections=["header"])
+def collection_with_header_view(request, collection_id=None):
+    return HttpResponse(request.content_blocks_parent.name)
+
+
+class TestContentBlocksCondition:
+    @pytest.mark.django_db
+    def test_validators_set(self, rf, content_block_collection, content_block):
+        content_block_collection.content_blocks.add(content_block)
+
+        response = collection_view(rf.get("/"), content_block_collection.id)
+
+        assert response.status_code == 200
+        assert response["ETag"].startswith('W/"')
+        assert response["Last-Modified"] == http_date(
+            content_block.mod_date.timestamp()
+        )
+
+    @pytest.mark.django_db
+    def test_if_none_match(self, rf, content_block_collection, content_block):
+        content_block_collection.content_blocks.add(content_block)
+        etag = collection_view(rf.get("/"), content_block_collection.id)["ETag"]
+
+        response = collection_view(
+            rf.get("/", HTTP_IF_NONE_MATCH=etag), content_block_collection.id
+        )
+
+        assert response.status_code == 304
+
+    @pytest.mark.django_db
+    def test_if_modified_since(self, rf, content_block_collection, content_block):
+        content_block_collection.content_blocks.add(content_block)
+        last_modified = collection_view(rf.get("/"), content_block_collection.id)[
+            "Last-Modified"
+        ]
+
+        response = collection_view(
+            rf.get("/", HTTP_IF_MODIFIED_SINCE=last_modified),
+            content_block_collection.id,
+        )
+
+        assert response.status_code == 304
+
+    def test_no_parent(self, rf):
+        response = collection_view(rf.get("/"))
+
+        assert response.status_code == 200
+        assert not response.has_header("ETag")
+
+    @pytest.mark.django_db
+    def test_parent_set(self, rf, content_block_collection):
+        response = collection_with_header_view(rf.get("/"), content_block_collection.id)
+
+        assert response.content.decode() == content_block_collection.name
+
+    @pytest.mark.django_db
+    def test_collections(self, rf, content_block_collection, content_block_factory):
+        header = ContentBlockCollection.objects.create(name="header", slug="header")
+        header.content_blocks.add(content_block_factory.create())
+        etag = collection_with_header_view(rf.get("/"), content_block_collection.id)[
+            "ETag"
+        ]
+
+        PublishGenerationServices.bump(header)
+        response = collection_with_header_view(
+            rf.get("/", HTTP_IF_NONE_MATCH=etag), content_block_collection.id
+        )
+
+        assert response.status_code == 200
+        assert response["ETag"] != etag
+
+    @pytest.mark.django_db(transaction=True, databases=["default", "replica"])
+    def test_read_database(
+        self, rf, settings, content_block_collection, nested_content_block
+    ):
+        """
+        Validators should be computed from the read database when it is set.
+        """
+        settings.CONTENT_BLOCKS_READ_DATABASE = "replica"
+        content_block, nested_content_block = nested_content_block
+        content_block_collection.content_blocks.add(content_block)
+
+        response = collection_view(rf.get("/"), content_block_collection.id)
+
+        assert response.status_code == 200
+        assert response["Last-Modified"] == http_date(
+            max(content_block.mod_date, nested_content_block.mod_date).timestamp()
+        )
@@ -1,6 +1,13 @@
 import pytest
+from django.core.files.base import File
+from PIL import Image
 
-from content_blocks.fields import SVGAndImageFieldFormField
+from content_blocks.fields import (
+    SVGAndImageFieldFormField,
+    process_upload,
+    validate_svg,
+)
+from content_blocks.services.media import MediaServices
 
 
 class TestSVGAndImageField:
@@ -20,3 +27,167 @@ class TestVideoField:
         content_block_field = populated_video_content_block_field_factory.create()
 
         assert content_block_field.video.file_extension == "mp4"
+
+
+@pytest.fixture
+def large_jpeg_file(tmp_path_factory):
+    """
+    A large JPEG with EXIF data.
+    """
+    image = Image.new("RGB", (4000, 3000), color=(155, 0, 0))
+    exif = Image.Exif()
+    exif[0x010F] = "Camera Maker"
+
+    path = tmp_path_factory.getbasetemp() / "tmp-jpegs/_test_large.jpg"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    image.save(path, quality=100, exif=exif)
+    return path
+
+
+@pytest.fixture
+def process_uploads_settings(settings):
+    settings.CONTENT_BLOCKS_PROCESS_IMAGE_UPLOADS = True
+    settings.CONTENT_BLOCKS_IMAGE_UPLOAD_MAX_DIMENSIONS = (1000, 1000)
+    settings.CONTENT_BLOCKS_MINIFY_SVG_UPLOADS = True
+    return settings
+
+
+class TestProcessUpload:
+    def test_process_upload_disabled(self, large_jpeg_file):
+        f = File(large_jpeg_file.open("rb"), name=large_jpeg_file.name)
+
+        processed, bytes_saved = process_upload(f)
+
+        assert processed is f
+        assert bytes_saved == 0
+
+    def test_process_upload_jpeg(self, process_uploads_settings, large_jpeg_file):
+        f = File(large_jpeg_file.open("rb"), name=large_jpeg_file.name)
+        original_size = f.size
+
+        processed, bytes_saved = process_upload(f)
+
+        assert processed.name == large_jpeg_file.name
+        assert bytes_saved > 0
+        with Image.open(processed) as image:
+            assert image.size == (1000, 750)
+            assert not image.getexif()
+        assert processed.size == original_size - bytes_saved
+
+    def test_process_upload_keep_exif(self, process_uploads_settings, large_jpeg_file):
+        process_uploads_settings.CONTENT_BLOCKS_IMAGE_UPLOAD_STRIP_EXIF = False
+        f = File(large_jpeg_file.open("rb"), name=large_jpeg_file.name)
+
+        processed, _ = process_upload(f)
+
+        with Image.open(processed) as image:
+            assert image.getexif()[0x010F] == "Camera Maker"
+
+    def test_process_upload_not_smaller(self, process_uploads_settings, tmp_path):
+        """
+        The original is kept when processing would not make it smaller.
+        """
+        path = tmp_path / "_test_small.jpg"
+        Image.new("RGB", (64, 64), color=(155, 0, 0)).save(path, quality=10)
+        f = File(path.open("rb"), name=path.name)
+
+        processed, bytes_saved = process_upload(f)
+
+        assert processed is f
+        assert processed.read() == path.read_bytes()
+        assert bytes_saved == 0
+
+    def test_process_upload_strip_exif_not_smaller(
+        self, process_uploads_settings, tmp_path
+    ):
+        """
+        EXIF data is stripped even when processing would not make the image smaller.
+        """
+        process_uploads_settings.CONTENT_BLOCKS_IMAGE_UPLOAD_QUALITY = 100
+        path = tmp_path / "_test_small_exif.jpg"
+        exif = Image.Exif()
+        exif[0x010F] = "Camera Maker"
+        Image.effect_noise((64, 64), 64).convert("RGB").save(
+            path, quality=10, exif=exif
+        )
+        f = File(path.open("rb"), name=path.name)
+
+        processed, bytes_saved = process_upload(f)
+
+        assert processed is not f
+        assert processed.size > path.stat().st_size
+        assert bytes_saved == 0
+        with Image.open(processed) as image:
+            assert image.size == (64, 64)
+            assert not image.getexif()
+
+    def test_process_upload_svg(self, process_uploads_settings, svg_file):
+        f = File(svg_file.open("rb"), name=svg_file.name)
+
+        processed, bytes_saved = process_upload(f)
+
+        svg = processed.read()
+        assert bytes_saved == len(svg_file.read_bytes()) - len(svg)
+        assert b">\n" not in svg
+        validate_svg(processed)
+
+    @pytest.mark.django_db
+    def test_image_field_save_value(
+        self,
+        process_uploads_settings,
+        image_content_block_field_factory,
+        large_jpeg_file,
+    ):
+        content_block_field = image_content_block_field_factory.create()
+
+        content_block_field.save_value(
+            File(large_jpeg_file.open("rb"), name=large_jpeg_file.name)
+        )
+
+        content_block_field.refresh_from_db()
+        assert (
+            content_block_field.image.width,
+            content_block_field.image.height,
+        ) == (1000, 750)
+
+
+class TestContentHashUploads:
+    @pytest.mark.django_db
+    @pytest.mark.parametrize(
+        "factory,field_name",
+        [
+            ("image_content_block_field_factory", "image"),
+            ("file_content_block_field_factory", "file"),
+            ("video_content_block_field_factory", "video"),
+        ],
+    )
+    def test_content_hash_uploads(
+        self, request, settings, png_file, factory, field_name
+    ):
+        """
+        Identical uploads should be stored once under a name derived from their content.
+        """
+        settings.CONTENT_BLOCKS_CONTENT_HASH_UPLOADS = True
+        factory = request.getfixturevalue(factory)
+        field_1, field_2 = factory.create(), factory.create()
+
+        field_1.save_value(File(png_file.open("rb"), name="one.png"))
+        field_2.save_value(File(png_file.open("rb"), name="two.PNG"))
+
+        name = getattr(field_1, field_name).name
+        assert name == getattr(field_2, field_name).name
+        assert MediaServices.is_content_hash_name(name)
+        assert name.endswith(".png")
+
+        storage = getattr(field_1, field_name).storage
+        assert len(storage.listdir(name.rsplit("/", 1)[0])[1]) == 1
+
+    @pytest.mark.django_db
+    def test_content_hash_uploads_disabled(
+        self, image_content_block_field_factory, png_file
+    ):
+        content_block_field = image_content_block_field_factory.create()
+
+        content_block_field.save_value(File(png_file.open("rb"), name="one.png"))
+
+        assert content_block_field.image.name == "content-blocks/images/one.png"
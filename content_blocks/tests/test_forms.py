@@ -3,7 +3,7 @@ Content blocks test_forms.py
 """
 import pytest
 from django.contrib.contenttypes.models import ContentType
-from django.core.files.base import File
+from django.core.files.base import ContentFile, File
 from faker import Faker
 
 from content_blocks.forms import (
@@ -16,12 +16,17 @@ from content_blocks.forms import (
     ResetContentBlocksForm,
 )
 from content_blocks.models import (
+    ChunkedUpload,
     ContentBlock,
     ContentBlockCollection,
+    ContentBlockField,
     ContentBlockFields,
     ContentBlockTemplate,
+    ImageRendition,
+    PublishedFields,
 )
 from content_blocks.services.content_block import CloneServices
+from content_blocks.services.upload import ChunkedUploadServices
 
 faker = Faker()
 
@@ -147,6 +152,50 @@ class TestNewNestedBlockForm:
         form.save()
         assert ContentBlock.objects.count() == 3
 
+    @pytest.mark.django_db
+    def test_save_virtual_field(
+        self, content_block, nested_content_block_template_field_factory
+    ):
+        """
+        Adding a nested block to a virtual nested field should save the field.
+        """
+        template_field = nested_content_block_template_field_factory.create(
+            content_block_template=content_block.content_block_template
+        )
+        data = {
+            "content_block_template": content_block.content_block_template,
+            "content_block": content_block,
+            "template_field": template_field,
+            "position": 0,
+        }
+
+        for i in range(2):
+            form = NewNestedBlockForm(data)
+            assert form.is_valid()
+            nested_block = form.save()
+
+        parent = ContentBlockField.objects.get(
+            content_block=content_block, template_field=template_field
+        )
+        assert parent.content_blocks.count() == 2
+        assert nested_block.parent == parent
+
+    @pytest.mark.django_db
+    def test_virtual_field_invalid(self, content_block, nested_content_block):
+        """
+        The nested field should belong to the content block's template.
+        """
+        _, nested_content_block = nested_content_block
+        form = NewNestedBlockForm(
+            {
+                "content_block_template": nested_content_block.content_block_template,
+                "content_block": content_block,
+                "template_field": nested_content_block.parent.template_field,
+                "position": 0,
+            }
+        )
+        assert not form.is_valid()
+
 
 class TestContentBlockForm:
     @pytest.mark.django_db
@@ -213,6 +262,67 @@ class TestContentBlockForm:
         content_block_field.refresh_from_db()
         assert content_block_field.image.read() == png_file.open("rb").read()
 
+    @pytest.mark.django_db
+    def test_save_chunked_upload(self, file_content_block_field_factory):
+        content_block_field = file_content_block_field_factory.create()
+        content_block = content_block_field.content_block
+        content = faker.binary(length=100)
+        chunked_upload = ChunkedUploadServices.create(
+            faker.file_name(extension="pdf"), len(content)
+        )
+        ChunkedUploadServices.append(chunked_upload.token, 0, ContentFile(content))
+
+        form = ContentBlockForm(
+            {
+                "name": content_block.name,
+                "filefield_upload_token": str(chunked_upload.token),
+            },
+            content_block=content_block,
+        )
+        assert form.is_valid()
+        form.save()
+
+        content_block_field.refresh_from_db()
+        assert content_block_field.file.read() == content
+        assert not ChunkedUpload.objects.exists()
+        assert not ChunkedUploadServices.path(chunked_upload).exists()
+
+    @pytest.mark.django_db
+    def test_save_chunked_upload_other_user(
+        self, admin_user, django_user_model, file_content_block_field_factory
+    ):
+        """
+        Uploads by another user should be ignored.
+        """
+        content_block_field = file_content_block_field_factory.create()
+        content_block = content_block_field.content_block
+        file_name = content_block_field.file.name
+        content = faker.binary(length=100)
+        chunked_upload = ChunkedUploadServices.create(
+            faker.file_name(extension="pdf"), len(content), user=admin_user
+        )
+        ChunkedUploadServices.append(
+            chunked_upload.token, 0, ContentFile(content), user=admin_user
+        )
+        other_user = django_user_model.objects.create_user(
+            username=faker.user_name(), is_staff=True
+        )
+
+        form = ContentBlockForm(
+            {
+                "name": content_block.name,
+                "filefield_upload_token": str(chunked_upload.token),
+            },
+            content_block=content_block,
+            user=other_user,
+        )
+        assert form.is_valid()
+        form.save()
+
+        content_block_field.refresh_from_db()
+        assert content_block_field.file.name == file_name
+        assert ChunkedUpload.objects.filter(id=chunked_upload.id).exists()
+
 
 class TestPublishContentBlocksForm:
     @pytest.mark.django_db
@@ -233,6 +343,53 @@ class TestPublishContentBlocksForm:
         assert not content_block_collection.content_blocks.filter(
             id=content_block.id
         ).exists()
+        assert content_block_collection.publish_generation == 1
+
+    @pytest.mark.django_db
+    def test_save_generates_renditions(
+        self,
+        content_block_collection,
+        content_block_factory,
+        populated_image_content_block_field_factory,
+        django_capture_on_commit_callbacks,
+    ):
+        """
+        Renditions should be generated once publishing is committed.
+        """
+        content_block = content_block_factory.create(draft=True)
+        image_field = populated_image_content_block_field_factory.create(
+            content_block=content_block
+        )
+        content_block_collection.content_blocks.add(content_block)
+
+        form = PublishContentBlocksForm({}, parent=content_block_collection)
+        assert form.is_valid()
+        with django_capture_on_commit_callbacks() as callbacks:
+            form.save()
+
+        renditions = ImageRendition.objects.filter(source=image_field.image.name)
+        assert not renditions.exists()
+
+        for callback in callbacks:
+            callback()
+        assert renditions.exists()
+
+    @pytest.mark.django_db
+    def test_save_stores_published_fields(
+        self, settings, content_block_collection, content_block_factory
+    ):
+        settings.CONTENT_BLOCKS_PUBLISHED_FIELDS = True
+        content_block_collection.content_blocks.add(
+            content_block_factory.create(draft=True)
+        )
+
+        form = PublishContentBlocksForm({}, parent=content_block_collection)
+        assert form.is_valid()
+        form.save()
+
+        assert list(
+            PublishedFields.objects.values_list("content_block_id", flat=True)
+        ) == [content_block_collection.content_blocks.published().get().id]
 
 
 class TestResetContentBlocksForm:
@@ -254,6 +411,7 @@ class TestResetContentBlocksForm:
         assert not content_block_collection.content_blocks.filter(
             id=content_block_2.id
         ).exists()
+        assert content_block_collection.publish_generation == 1
 
 
 class TestImportContentBlocksForm:
@@ -1,10 +1,12 @@
 from io import StringIO
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 import pytest
 from django.core import serializers
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
 from django.core.management import call_command
-from django.db import connection
+from django.db import DatabaseError, connection
 from faker import Faker
 
 from content_blocks.models import (
@@ -12,8 +14,14 @@ from content_blocks.models import (
     ContentBlockField,
     ContentBlockTemplate,
     ContentBlockTemplateField,
+    MediaMigration,
+    TemplateFieldDeletion,
 )
-from content_blocks.services.content_block_template import post_import
+from content_blocks.services.content_block_template import (
+    TemplateFieldDeletionServices,
+    post_import,
+)
+from content_blocks.services.media import MediaServices
 
 faker = Faker()
 
@@ -102,10 +110,36 @@ class TestManagementCommands:
 
         call_command("import_content_block_templates", cbt_import_export_json_file)
 
-        # template field and template should exist once more
+        # template field and template should exist once more, the field is virtual until a value is saved
         assert content_block_templates_query.count() == 1
         assert content_block_template_fields_query.count() == 1
-        assert content_block_fields_query.count() == 1
+        assert content_block_fields_query.count() == 0
+
+    @pytest.mark.django_db
+    def test_import_content_block_templates_delete_fields(
+        self,
+        cbt_import_export_objects,
+        cbt_import_export_json_file,
+        content_block_template_field_factory,
+        content_block_field_factory,
+    ):
+        content_block_template, _, content_block, _ = cbt_import_export_objects
+        # Not in the json so it is queued for deletion by the import.
+        content_block_field_factory.create(
+            content_block=content_block,
+            template_field=content_block_template_field_factory.create(
+                content_block_template=content_block_template, key="removed"
+            ),
+        )
+        assert ContentBlockField.objects.count() == 2
+
+        call_command("import_content_block_templates", cbt_import_export_json_file)
+
+        assert ContentBlockTemplateField.objects.count() == 1
+        assert ContentBlockField.objects.count() == 1
+        deletion = TemplateFieldDeletion.objects.get()
+        assert deletion.status == TemplateFieldDeletion.Status.PENDING
+        assert deletion.total == 1
 
     @pytest.mark.django_db
     def test_import_content_block_templates_bad_json(
@@ -137,6 +171,118 @@ class TestManagementCommands:
         handler.assert_called_once()
 
 
+class TestHashContentBlockMediaCommand:
+    @pytest.mark.django_db
+    def test_hash_content_block_media(
+        self, populated_image_content_block_field_factory
+    ):
+        """
+        Identical files should be migrated to one content hash name and the originals deleted.
+        """
+        fields = populated_image_content_block_field_factory.create_batch(2)
+        storage = fields[0].image.storage
+        original_names = [field.image.name for field in fields]
+        assert original_names[0] != original_names[1]
+
+        call_command("hash_content_block_media", field=["image"], stdout=StringIO())
+
+        names = set(
+            ContentBlockField.objects.values_list("image", flat=True).distinct()
+        )
+        assert len(names) == 1
+        name = names.pop()
+        assert MediaServices.is_content_hash_name(name)
+        assert storage.exists(name)
+        for original_name in original_names:
+            assert not storage.exists(original_name)
+
+        # Already migrated files are skipped
+        assert MediaServices.content_hash_media("image") == []
+
+    @pytest.mark.django_db
+    def test_hash_content_block_media_dry_run(
+        self, populated_file_content_block_field_factory
+    ):
+        field = populated_file_content_block_field_factory.create()
+
+        buffer = StringIO()
+        call_command(
+            "hash_content_block_media", dry_run=True, verbosity=2, stdout=buffer
+        )
+
+        assert f"{field.file.name} -> ?" in buffer.getvalue()
+        assert ContentBlockField.objects.get().file.name == field.file.name
+
+
+class TestMigrateContentBlocksMediaCommand:
+    @pytest.fixture
+    def source_storage(self, tmp_path_factory):
+        return FileSystemStorage(location=tmp_path_factory.mktemp("old-media"))
+
+    def _call_command(self, source_storage, **kwargs):
+        buffer = StringIO()
+        call_command(
+            "migrate_content_blocks_media",
+            source="django.core.files.storage.FileSystemStorage",
+            source_option=[f"location={source_storage.location}"],
+            stdout=buffer,
+            **kwargs,
+        )
+        return buffer.getvalue()
+
+    @pytest.mark.django_db
+    def test_migrate_content_blocks_media(
+        self, source_storage, file_content_block_field_factory
+    ):
+        content = faker.binary(length=1000)
+        name = source_storage.save("content-blocks/files/a.pdf", ContentFile(content))
+        field = file_content_block_field_factory.create(file=name)
+
+        output = self._call_command(
+            source_storage, field=["file"], rewrite=["content-blocks/", "media/"]
+        )
+
+        assert "1 file files copied, 0 failed." in output
+        field.refresh_from_db()
+        assert field.file.name == "media/files/a.pdf"
+        assert field.file.read() == content
+        migration = MediaMigration.objects.get()
+        assert migration.status == MediaMigration.Status.COPIED
+        assert migration.size == len(content)
+
+        # Copied files are skipped when run again.
+        output = self._call_command(
+            source_storage, field=["file"], rewrite=["content-blocks/", "media/"]
+        )
+        assert "0 file files copied, 0 failed." in output
+
+    @pytest.mark.django_db
+    def test_migrate_content_blocks_media_missing_file(
+        self, source_storage, file_content_block_field_factory
+    ):
+        field = file_content_block_field_factory.create(file=faker.file_name())
+
+        output = self._call_command(source_storage, field=["file"])
+
+        assert "0 file files copied, 1 failed." in output
+        assert MediaMigration.objects.get().status == MediaMigration.Status.FAILED
+        assert ContentBlockField.objects.get().file.name == field.file.name
+
+    @pytest.mark.django_db
+    def test_migrate_content_blocks_media_dry_run(
+        self, source_storage, file_content_block_field_factory
+    ):
+        name = source_storage.save(faker.file_name(), ContentFile(b"content"))
+        file_content_block_field_factory.create(file=name)
+
+        output = self._call_command(
+            source_storage, field=["file"], dry_run=True, verbosity=2
+        )
+
+        assert f"{name} -> {name}" in output
+        assert not MediaMigration.objects.exists()
+
+
 class TestDjangoManagementCommands:
     """
     Tests to confirm some Django management commands work.
@@ -199,3 +345,129 @@ class TestDjangoManagementCommands:
             sequence = cursor.fetchone()[0]
 
         assert sequence >= 3
+
+
+class TestBenchmarkRenderCacheCompressionCommand:
+    @pytest.mark.django_db
+    def test_benchmark_render_cache_compression(self, text_content_blocks):
+        buffer = StringIO()
+
+        call_command("benchmark_render_cache_compression", repeat=1, stdout=buffer)
+
+        output = buffer.getvalue()
+        assert f"{len(text_content_blocks)} fragments" in output
+        assert "zlib" in output
+
+    @pytest.mark.django_db
+    def test_benchmark_render_cache_compression_synthetic(self):
+        buffer = StringIO()
+
+        call_command(
+            "benchmark_render_cache_compression",
+            synthetic=True,
+            repeat=1,
+            stdout=buffer,
+        )
+
+        assert "3 fragments" in buffer.getvalue()
+
+
+class TestDeleteContentBlockTemplateFieldsCommand:
+    @pytest.mark.django_db
+    def test_delete_content_block_template_fields(
+        self,
+        settings,
+        content_block_template_field,
+        content_block_field_factory,
+        django_capture_on_commit_callbacks,
+    ):
+        settings.CONTENT_BLOCKS_DEFER_TEMPLATE_FIELD_DELETION = True
+        content_block_field_factory.create_batch(
+            5, template_field=content_block_template_field
+        )
+        with django_capture_on_commit_callbacks(execute=True):
+            deletion = TemplateFieldDeletionServices.queue(content_block_template_field)
+
+        # The fields are hidden until they are deleted.
+        assert deletion.total == 5
+        assert not ContentBlockTemplateField.objects.exists()
+        assert not ContentBlockField.objects.exists()
+        assert ContentBlockField._base_manager.count() == 5
+
+        buffer = StringIO()
+        call_command(
+            "delete_content_block_template_fields",
+            chunk_size=2,
+            verbosity=2,
+            stdout=buffer,
+        )
+
+        deletion.refresh_from_db()
+        assert deletion.status == TemplateFieldDeletion.Status.DONE
+        assert deletion.processed == 5
+        assert deletion.template_field is None
+        assert not ContentBlockField._base_manager.exists()
+        assert not ContentBlockTemplateField._base_manager.exists()
+
+        output = buffer.getvalue()
+        assert "2/5 (40%)" in output
+        assert "5/5 (100%)" in output
+        assert "1 template fields deleted, 0 failed." in output
+
+    @pytest.mark.django_db
+    def test_delete_content_block_template_fields_resume(
+        self, content_block_template_field, content_block_field_factory
+    ):
+        content_block_field_factory.create_batch(
+            5, template_field=content_block_template_field
+        )
+        deletion = TemplateFieldDeletionServices.queue(content_block_template_field)
+        run_chunk = TemplateFieldDeletionServices.run_chunk
+
+        def interrupted_run_chunk(deletion_id, chunk_size):
+            if TemplateFieldDeletion.objects.get(id=deletion_id).processed:
+                raise DatabaseError("Interrupted")
+            return run_chunk(deletion_id, chunk_size)
+
+        with patch.object(
+            TemplateFieldDeletionServices,
+            "run_chunk",
+            side_effect=interrupted_run_chunk,
+        ):
+            TemplateFieldDeletionServices.run_all(chunk_size=2)
+
+        deletion.refresh_from_db()
+        assert deletion.status == TemplateFieldDeletion.Status.FAILED
+        assert deletion.error == "Interrupted"
+        assert deletion.processed == 2
+        assert ContentBlockField._base_manager.count() == 3
+
+        # Failed deletions are only run again when asked.
+        assert TemplateFieldDeletionServices.run_all() == []
+
+        deletion = TemplateFieldDeletionServices.run_all(retry_failed=True)[0]
+        assert deletion.status == TemplateFieldDeletion.Status.DONE
+        assert deletion.processed == 5
+        assert not deletion.error
+        assert not ContentBlockField._base_manager.exists()
+
+    @pytest.mark.django_db
+    def test_delete_content_block_template_fields_not_deferred(
+        self,
+        content_block_template_field,
+        content_block_field_factory,
+        django_capture_on_commit_callbacks,
+    ):
+        """
+        By default the content block fields are deleted in the same request.
+        """
+        content_block_field_factory.create_batch(
+            3, template_field=content_block_template_field
+        )
+
+        with django_capture_on_commit_callbacks(execute=True):
+            deletion = TemplateFieldDeletionServices.queue(content_block_template_field)
+
+        deletion.refresh_from_db()
+        assert deletion.status == TemplateFieldDeletion.Status.DONE
+        assert not ContentBlockField._base_manager.exists()
@@ -1,11 +1,16 @@
 """
 Model tests
 """
+import importlib
+import re
+from unittest.mock import PropertyMock, patch
+
 import pytest
 from django import forms
+from django.apps import apps
 from django.contrib.contenttypes.models import ContentType
 from django.core.files.storage import get_storage_class
-from django.db import IntegrityError
+from django.db import IntegrityError, connection
 from django.forms.utils import pretty_name
 from faker import Faker
 
@@ -17,10 +22,12 @@ from content_blocks.models import (
     ContentBlockCollection,
     ContentBlockField,
     ContentBlockFields,
+    ContentBlockRenderField,
     ContentBlockTemplate,
     ContentBlockTemplateField,
     PolymorphError,
 )
+from content_blocks.signals import media_fields
 from content_blocks.tests.storages import SettingsTestStorage
 
 faker = Faker()
@@ -62,6 +69,26 @@ class TestContentBlockTemplateField:
                 key="same_key", content_block_template=template
             )
 
+    @pytest.mark.django_db
+    def test_content_block_template_field_deleting(
+        self, content_block_template_field, content_block_field_factory
+    ):
+        """
+        Fields being deleted are hidden and their key can be used again.
+        """
+        content_block_field_factory(template_field=content_block_template_field)
+        content_block_template_field.deleting = True
+        content_block_template_field.save()
+
+        assert not ContentBlockTemplateField.objects.exists()
+        assert not ContentBlockField.objects.exists()
+
+        content_block_template_field.pk = None
+        content_block_template_field.deleting = False
+        content_block_template_field.save()
+
+        assert ContentBlockTemplateField.objects.count() == 1
+
     @pytest.mark.django_db
     def test_content_block_template_field_str(self, content_block_template_field):
         assert str(content_block_template_field) == content_block_template_field.key
@@ -73,6 +100,56 @@ class TestContentBlock:
         assert ContentBlock.objects.count() == 1
         assert content_block == ContentBlock.objects.first()
 
+    @pytest.mark.django_db
+    def test_content_block_root_depth(self, deeply_nested_content_block):
+        """
+        Nested content blocks should have the top level content block as their root.
+        """
+        (
+            content_block,
+            nested_content_block,
+            deeply_nested_content_block,
+        ) = deeply_nested_content_block
+
+        assert (content_block.root_id, content_block.depth) == (None, 0)
+        assert (nested_content_block.root_id, nested_content_block.depth) == (
+            content_block.id,
+            1,
+        )
+        assert (
+            deeply_nested_content_block.root_id,
+            deeply_nested_content_block.depth,
+        ) == (content_block.id, 2)
+
+    @pytest.mark.django_db
+    def test_content_block_root_depth_migration(self, deeply_nested_content_block):
+        """
+        The root and depth of existing content blocks should be set by the migration.
+        """
+        migration = importlib.import_module(
+            "content_blocks.migrations.0020_contentblock_root_depth_data"
+        )
+        ContentBlock.objects.update(root=None, depth=0)
+
+        migration.forwards(apps, None)
+
+        assert [
+            (content_block.root_id, content_block.depth)
+            for content_block in ContentBlock.objects.order_by("depth")
+        ] == [
+            (None, 0),
+            (deeply_nested_content_block[0].id, 1),
+            (deeply_nested_content_block[0].id, 2),
+        ]
+
+    @pytest.mark.django_db
+    def test_content_block_delete_tree(self, deeply_nested_content_block):
+        content_block, *_ = deeply_nested_content_block
+
+        content_block.delete()
+
+        assert not ContentBlock.objects.exists()
+
     @pytest.mark.django_db
     def test_content_block_template(
         self, content_block_factory, content_block_template_factory
@@ -100,6 +177,53 @@ class TestContentBlock:
         )
         assert content_block.fields == {content_block_field.key: content_block_field}
 
+    @pytest.mark.django_db
+    def test_content_block_virtual_fields(
+        self, text_content_block, content_block_template_field_factory
+    ):
+        """
+        Template fields added after the content block was created should be virtual fields with the default value
+        until a value is saved.
+        """
+        html = text_content_block.render()
+        template_field = content_block_template_field_factory.create(
+            content_block_template=text_content_block.content_block_template,
+            key=faker.pystr(),
+        )
+        content_block = ContentBlock.objects.get(id=text_content_block.id)
+
+        field = content_block.fields[template_field.key]
+        assert field.pk is None
+        assert content_block.context[template_field.key] == ""
+        assert content_block.render() == html
+
+        text = faker.text()
+        field.save_value(text)
+
+        assert ContentBlockField.objects.get(template_field=template_field).text == text
+
+    @pytest.mark.django_db
+    def test_content_block_virtual_nested_fields(
+        self, content_block, nested_content_block_template_field_factory
+    ):
+        """
+        Virtual nested fields should not be saved by nested_fields, they are saved when a nested block is added.
+        """
+        template_field = nested_content_block_template_field_factory.create(
+            content_block_template=content_block.content_block_template
+        )
+
+        assert list(content_block.fields[template_field.key].context_value) == []
+
+        nested_field = content_block.nested_fields[template_field.key]
+        assert nested_field.pk is None
+        assert nested_field.template_field == template_field
+        assert list(nested_field.nested_blocks) == []
+        assert nested_field.editor_id == f"{content_block.id}_{template_field.id}"
+        assert not ContentBlockField.objects.filter(
+            template_field=template_field
+        ).exists()
+
     @pytest.mark.django_db
     def test_content_block_nested_fields(
         self, content_block, nested_content_block_field_factory
@@ -133,6 +257,29 @@ class TestContentBlock:
             content_block_field.key: content_block_field.context_value,
             "css_class": content_block.css_class,
         }
+        assert type(content_block.context) is dict
+
+    @pytest.mark.django_db
+    def test_content_block_context_lazy(
+        self, nested_content_block, django_assert_num_queries
+    ):
+        """
+        Field values should only be computed when they are read, and only once.
+        """
+        content_block, _ = nested_content_block
+        content_block = ContentBlock.objects.visible().get(id=content_block.id)
+
+        with django_assert_num_queries(0):
+            assert content_block.lazy_context["css_class"] == content_block.css_class
+
+        with patch.object(
+            ContentBlockRenderField, "context_value", new_callable=PropertyMock
+        ) as context_value:
+            content_block.lazy_context["nestedfield"]
+            content_block.lazy_context["nestedfield"]
+
+        context_value.assert_called_once()
+        assert "text" not in content_block.lazy_context
 
     @pytest.mark.django_db
     def test_can_render(
@@ -538,6 +685,124 @@ class TestContentBlockManager:
         assert ContentBlock.objects.count() == 2
         assert ContentBlock.objects.published().count() == 1
 
+    @pytest.mark.django_db
+    def test_content_block_manager_trees(
+        self, content_block, deeply_nested_content_block
+    ):
+        tree = set(deeply_nested_content_block)
+
+        assert set(ContentBlock.objects.filter(id=tree.pop().id).trees()) == set(
+            deeply_nested_content_block
+        )
+        assert set(ContentBlock.objects.filter(id=content_block.id).trees()) == {
+            content_block
+        }
+
+    @pytest.mark.django_db
+    def test_content_block_manager_descendants(self, deeply_nested_content_block):
+        (
+            content_block,
+            nested_content_block,
+            deeply_nested_content_block,
+        ) = deeply_nested_content_block
+
+        assert list(ContentBlock.objects.descendants(content_block)) == [
+            nested_content_block,
+            deeply_nested_content_block,
+        ]
+        assert list(ContentBlock.objects.descendants(nested_content_block)) == [
+            deeply_nested_content_block
+        ]
+
+    @pytest.mark.django_db
+    def test_content_block_manager_ancestors(
+        self, deeply_nested_content_block, django_assert_num_queries
+    ):
+        (
+            content_block,
+            nested_content_block,
+            deeply_nested_content_block,
+        ) = deeply_nested_content_block
+
+        with django_assert_num_queries(1):
+            ancestors = ContentBlock.objects.ancestors(
+                deeply_nested_content_block, "draft"
+            )
+
+        assert ancestors == [
+            (nested_content_block.id, nested_content_block.draft),
+            (content_block.id, content_block.draft),
+        ]
+        assert ContentBlock.objects.ancestors(content_block) == []
+
+
+class TestIndexes:
+    """
+    Query plans of the hot content block queries should use the indexes made for them.
+    """
+
+    @pytest.fixture
+    def seeded_content_blocks(
+        self,
+        nested_content_block,
+        content_block_factory,
+        populated_image_content_block_field_factory,
+    ):
+        content_block_factory.create_batch(20, draft=True)
+        content_block_factory.create_batch(20, draft=False)
+        content_block_factory.create_batch(10, draft=False, visible=False)
+        populated_image_content_block_field_factory.create_batch(5)
+
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                # The seeded tables are small enough to scan, make the planner show the index it would use.
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+        return nested_content_block
+
+    @pytest.mark.django_db
+    def test_indexes(self, seeded_content_blocks):
+        content_block, nested_content_block = seeded_content_blocks
+        image = ContentBlockField.objects.exclude(image="").first().image.name
+
+        plans = {
+            "content_blocks_published": ContentBlock.objects.visible(),
+            "content_blocks_drafts": ContentBlock.objects.drafts(),
+            "content_blocks_nested": ContentBlock.objects.nested().filter(
+                parent_id=nested_content_block.parent_id
+            ),
+            "content_blocks_field_block": content_block.content_block_fields.all(),
+            "content_blocks_field_image": media_fields("image", image).exclude(id=0),
+        }
+
+        for index, queryset in plans.items():
+            assert index in queryset.explain(), index
+
+    @pytest.mark.django_db
+    def test_parent_indexes(
+        self, seeded_content_blocks, content_block_collection, content_block_factory
+    ):
+        """
+        The content blocks of a parent are found with the index of the many to many table then by primary key.
+        """
+        content_block_collection.content_blocks.add(
+            *content_block_factory.create_batch(5, draft=False),
+            *content_block_factory.create_batch(5, draft=True),
+        )
+        tables = [
+            ContentBlock._meta.db_table,
+            ContentBlockCollection.content_blocks.through._meta.db_table,
+        ]
+
+        for queryset in [
+            content_block_collection.content_blocks.visible(),
+            content_block_collection.content_blocks.drafts(),
+        ]:
+            plan = queryset.explain()
+            for table in tables:
+                # SQLite and PostgreSQL full table scans.
+                assert not re.search(rf"(SCAN|Seq Scan on) {table}\b", plan), plan
+
 
 class TestContentBlockAvailability:
     @pytest.mark.django_db
@@ -0,0 +1,171 @@
+"""
+Tests for CONTENT_BLOCKS_READ_DATABASE routing.
+"""
+
+import pytest
+from django.db import connections
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from content_blocks.middleware import (
+    PRIMARY_DATABASE_COOKIE,
+    ReadDatabaseMiddleware,
+    stick_to_primary_database,
+)
+from content_blocks.models import ContentBlock, ContentBlockCollection
+from content_blocks.routers import (
+    ReadDatabaseRouter,
+    read_database,
+    use_primary_database,
+)
+from content_blocks.services.content_block import RenderServices
+
+
+@pytest.fixture
+def read_database_setting(settings):
+    settings.CONTENT_BLOCKS_READ_DATABASE = "replica"
+    return settings
+
+
+class TestReadDatabase:
+    def test_read_database(self):
+        assert read_database() is None
+        assert ContentBlock.objects.visible().db == "default"
+
+    def test_read_database_set(self, read_database_setting):
+        assert read_database() == "replica"
+        assert ContentBlock.objects.visible().db == "replica"
+        assert ContentBlock.objects.drafts().db == "default"
+        assert ContentBlock.objects.published().db == "default"
+        assert ContentBlock.objects.previews().db == "default"
+
+    def test_use_primary_database(self, read_database_setting):
+        with use_primary_database():
+            assert read_database() is None
+            assert ContentBlock.objects.visible().db == "default"
+
+        assert read_database() == "replica"
+
+    @pytest.mark.django_db(transaction=True, databases=["default", "replica"])
+    def test_render(
+        self, read_database_setting, text_content_block_template, content_block_factory
+    ):
+        """
+        Published content blocks and their fields should be read from the read database.
+        """
+        content_block = content_block_factory.create(
+            content_block_template=text_content_block_template
+        )
+        collection = ContentBlockCollection.objects.create(name="collection")
+        collection.content_blocks.add(content_block)
+
+        with CaptureQueriesContext(
+            connections["default"]
+        ) as default_queries, CaptureQueriesContext(
+            connections["replica"]
+        ) as replica_queries:
+            content_blocks = collection.content_blocks.visible()
+            html = RenderServices.render_content_blocks(content_blocks)
+
+        assert html == [RenderServices.render_content_block(content_block)]
+        assert all(
+            content_block._state.db == "replica" for content_block in content_blocks
+        )
+        assert len(replica_queries) > 1
+        # Template plans are read from the default database and cached.
+        assert not [
+            query
+            for query in default_queries
+            if '"content_blocks_contentblock"' in query["sql"]
+            or '"content_blocks_contentblockfield"' in query["sql"]
+        ]
+
+    @pytest.mark.django_db(transaction=True, databases=["default", "replica"])
+    def test_nested(self, read_database_setting, nested_content_block):
+        """
+        Nested content blocks should be read from the database their parent was read from so previews of drafts
+        don't read from the read database.
+        """
+        content_block, nested_content_block = nested_content_block
+        key = nested_content_block.parent.key
+
+        for queryset, alias in [
+            (ContentBlock.objects.all(), "default"),
+            (ContentBlock.objects.visible(), "replica"),
+        ]:
+            with CaptureQueriesContext(
+                connections["default"]
+            ) as default_queries, CaptureQueriesContext(
+                connections["replica"]
+            ) as replica_queries:
+                rendered = queryset.get(id=content_block.id)
+                RenderServices.render_content_block(rendered)
+                nested = list(queryset.get(id=content_block.id).context[key])
+
+            queries = {"default": default_queries, "replica": replica_queries}
+            assert nested == [nested_content_block]
+            assert nested[0]._state.db == alias
+            assert rendered.context[key][0]._state.db == alias
+            assert not [
+                query
+                for other, captured in queries.items()
+                if other != alias
+                for query in captured
+                if '"content_blocks_contentblock"' in query["sql"]
+            ]
+
+
+class TestReadDatabaseRouter:
+    @pytest.mark.django_db(transaction=True, databases=["default", "replica"])
+    def test_save(self, read_database_setting, content_block):
+        """
+        Content blocks read from the read database should be saved to the default database.
+        """
+        content_block = ContentBlock.objects.visible().get(id=content_block.id)
+        assert content_block._state.db == "replica"
+
+        content_block.visible = False
+        content_block.save()
+
+        assert content_block._state.db == "default"
+        assert (
+            not ContentBlock.objects.using("default").get(id=content_block.id).visible
+        )
+
+    def test_allow_relation(self, read_database_setting):
+        router = ReadDatabaseRouter()
+        content_block, other = ContentBlock(), ContentBlock()
+        content_block._state.db, other._state.db = "replica", "default"
+
+        assert router.allow_relation(content_block, other)
+
+        other._state.db = "other"
+        assert router.allow_relation(content_block, other) is None
+
+
+class TestReadDatabaseMiddleware:
+    def get_response(self, request):
+        return HttpResponse(str(read_database()))
+
+    def test_sticky(self, read_database_setting):
+        request = RequestFactory().get("/")
+        middleware = ReadDatabaseMiddleware(self.get_response)
+        assert middleware(request).content == b"replica"
+
+        response = stick_to_primary_database(HttpResponse())
+        request.COOKIES[PRIMARY_DATABASE_COOKIE] = response.cookies[
+            PRIMARY_DATABASE_COOKIE
+        ].value
+        assert middleware(request).content == b"None"
+
+    def test_not_set(self):
+        response = stick_to_primary_database(HttpResponse())
+        assert PRIMARY_DATABASE_COOKIE not in response.cookies
+
+    def test_bad_signature(self, read_database_setting):
+        request = RequestFactory().get("/")
+        request.COOKIES[PRIMARY_DATABASE_COOKIE] = "1"
+
+        middleware = ReadDatabaseMiddleware(self.get_response)
+        assert middleware(request).content == b"replica"
@@ -38,6 +38,8 @@ class TestContentBlockAdmin:
             NewNestedBlockForm(
                 initial={
                     "parent": parent,
+                    "content_block": parent.content_block_id,
+                    "template_field": parent.template_field_id,
                 }
             )
         )
@@ -2,10 +2,15 @@
 Content blocks test_views.py
 """
 import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from faker import Faker
 
-from content_blocks.models import ContentBlock
+from content_blocks.middleware import PRIMARY_DATABASE_COOKIE
+from content_blocks.models import ChunkedUpload, ContentBlock, ContentBlockField
+from content_blocks.services.upload import ChunkedUploadServices
 
 BASE_ADMIN_URL = "admin:content_blocks_contentblockcollection"
 
@@ -23,6 +28,53 @@ class TestContentBlockEditor:
         )
         assert response.status_code == 200
 
+    @pytest.mark.django_db
+    def test_content_block_editor_virtual_nested_fields(
+        self,
+        admin_client,
+        content_block_collection,
+        content_block_template,
+        content_block_factory,
+        nested_content_block_template_field_factory,
+    ):
+        """
+        Virtual nested fields should not be saved and template fields should be prefetched when the editor is rendered.
+        """
+        template_field = nested_content_block_template_field_factory.create(
+            content_block_template=content_block_template
+        )
+        url = reverse(
+            f"{BASE_ADMIN_URL}_content_block_editor",
+            args=[content_block_collection.id],
+        )
+
+        template_field_queries = []
+        for i in range(2):
+            content_block_collection.content_blocks.add(
+                *content_block_factory.create_batch(
+                    2, content_block_template=content_block_template, draft=True
+                )
+            )
+            with CaptureQueriesContext(connection) as queries:
+                response = admin_client.get(url)
+            template_field_queries.append(
+                [
+                    query
+                    for query in queries
+                    if 'FROM "content_blocks_contentblocktemplatefield"' in query["sql"]
+                ]
+            )
+
+        assert response.status_code == 200
+        assert (
+            f"nested_blocks_{content_block_collection.content_blocks.first().id}_{template_field.id}"
+            in (response.content.decode())
+        )
+        assert not ContentBlockField.objects.filter(
+            template_field=template_field
+        ).exists()
+        assert len(template_field_queries[0]) == len(template_field_queries[1])
+
 
 class TestContentBlockCreate:
     @pytest.mark.django_db
@@ -125,6 +177,35 @@ class TestToggleVisible:
         content_block.refresh_from_db()
         assert not visible == content_block.visible
 
+    @pytest.mark.django_db
+    def test_toggle_visible_bumps_publish_generation(
+        self, admin_client, content_block_collection, content_block
+    ):
+        content_block_collection.content_blocks.add(content_block)
+
+        admin_client.post(
+            reverse("content_blocks:toggle_visible", args=[content_block.id]),
+            {},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+
+        assert content_block_collection.publish_generation == 1
+
+    @pytest.mark.django_db
+    def test_toggle_visible_draft(
+        self, admin_client, content_block_collection, content_block_factory
+    ):
+        content_block = content_block_factory.create(draft=True)
+        content_block_collection.content_blocks.add(content_block)
+
+        admin_client.post(
+            reverse("content_blocks:toggle_visible", args=[content_block.id]),
+            {},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+
+        assert content_block_collection.publish_generation == 0
+
 
 class TestPublishContentBlocks:
     @pytest.mark.django_db
@@ -149,6 +230,27 @@ class TestPublishContentBlocks:
         assert ContentBlock.objects.published().count() == 1
         assert ContentBlock.objects.drafts().count() == 1
 
+    @pytest.mark.django_db
+    def test_publish_content_blocks_sticks_to_primary_database(
+        self, settings, admin_client, content_block_factory, content_block_collection
+    ):
+        settings.CONTENT_BLOCKS_READ_DATABASE = "replica"
+        content_block_collection.content_blocks.add(
+            content_block_factory.create(draft=True)
+        )
+
+        response = admin_client.post(
+            reverse(
+                f"{BASE_ADMIN_URL}_publish_content_blocks",
+                args=[content_block_collection.id],
+            ),
+            {},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+
+        assert response.status_code == 200
+        assert PRIMARY_DATABASE_COOKIE in response.cookies
+
 
 class TestDiscardChanges:
     @pytest.mark.django_db
@@ -234,3 +336,64 @@ class TestPermissions:
         )
 
         assert response.status_code == 403
+
+
+class TestChunkedUpload:
+    @pytest.mark.django_db
+    def test_chunked_upload_post(self, admin_client):
+        content = faker.binary(length=1000)
+        url = reverse("content_blocks:chunked_upload")
+
+        response = admin_client.post(
+            url,
+            {
+                "filename": faker.file_name(extension="pdf"),
+                "size": len(content),
+                "offset": 0,
+                "chunk": SimpleUploadedFile("blob", content[:600]),
+            },
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+        data = response.json()
+        assert data["offset"] == 600
+        assert not data["completed"]
+
+        # Resume without a chunk to get the current offset.
+        response = admin_client.post(
+            url, {"token": data["token"]}, HTTP_X_REQUESTED_WITH="XMLHttpRequest"
+        )
+        assert response.json()["offset"] == 600
+
+        response = admin_client.post(
+            url,
+            {
+                "token": data["token"],
+                "offset": 600,
+                "chunk": SimpleUploadedFile("blob", content[600:]),
+            },
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+        data = response.json()
+        assert data["offset"] == len(content)
+        assert data["completed"]
+
+        chunked_upload = ChunkedUpload.objects.get(token=data["token"])
+        assert ChunkedUploadServices.path(chunked_upload).read_bytes() == content
+
+    @pytest.mark.django_db
+    def test_chunked_upload_post_unknown_token(self, admin_client):
+        response = admin_client.post(
+            reverse("content_blocks:chunked_upload"),
+            {"token": faker.uuid4()},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+        assert response.status_code == 404
+
+    @pytest.mark.django_db
+    def test_chunked_upload_post_invalid(self, admin_client):
+        response = admin_client.post(
+            reverse("content_blocks:chunked_upload"),
+            {},
+            HTTP_X_REQUESTED_WITH="XMLHttpRequest",
+        )
+        assert "error" in response.json()
@@ -3,7 +3,14 @@ Content blocks test_widgets.py
 """
 import uuid
 
-from content_blocks.widgets import FileWidget
+import pytest
+from django.core.files.base import ContentFile
+from faker import Faker
+
+from content_blocks.services.upload import ChunkedUploadServices
+from content_blocks.widgets import ChunkedFileWidget, FileWidget
+
+faker = Faker()
 
 
 class TestFileWidget:
@@ -11,3 +18,54 @@ class TestFileWidget:
         file_widget = FileWidget()
         # This will raise ValueError and fail the test if the id is not a valid uuid
         uuid.UUID(file_widget.clear_checkbox_id("filefield"))
+
+
+class TestChunkedFileWidget:
+    @pytest.mark.django_db
+    def test_value_from_datadict(self):
+        content = faker.binary(length=10)
+        chunked_upload = ChunkedUploadServices.create(faker.file_name(), len(content))
+        ChunkedUploadServices.append(chunked_upload.token, 0, ContentFile(content))
+        widget = ChunkedFileWidget()
+
+        value = widget.value_from_datadict(
+            {"file_upload_token": str(chunked_upload.token)}, {}, "file"
+        )
+
+        assert value.read() == content
+        assert not widget.value_omitted_from_data(
+            {"file_upload_token": str(chunked_upload.token)}, {}, "file"
+        )
+        value.close()
+
+    @pytest.mark.django_db
+    def test_value_from_datadict_user(self, admin_user):
+        """
+        Only uploads by the user of the widget should be accepted.
+        """
+        content = faker.binary(length=10)
+        chunked_upload = ChunkedUploadServices.create(
+            faker.file_name(), len(content), user=admin_user
+        )
+        ChunkedUploadServices.append(
+            chunked_upload.token, 0, ContentFile(content), user=admin_user
+        )
+        data = {"file_upload_token": str(chunked_upload.token)}
+        widget = ChunkedFileWidget()
+
+        assert widget.value_from_datadict(data, {}, "file") is None
+
+        widget.user = admin_user
+        value = widget.value_from_datadict(data, {}, "file")
+        assert value.read() == content
+        value.close()
+
+    @pytest.mark.django_db
+    def test_value_from_datadict_incomplete(self):
+        chunked_upload = ChunkedUploadServices.create(faker.file_name(), 10)
+
+        value = ChunkedFileWidget().value_from_datadict(
+            {"file_upload_token": str(chunked_upload.token)}, {}, "file"
+        )
+
+        assert value is None
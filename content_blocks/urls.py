@@ -4,6 +4,7 @@ Content Blocks urls.py
 from django.urls import path
 
 from content_blocks.views import (
+    chunked_upload,
     content_block_delete,
     content_block_save,
     toggle_visible,
@@ -17,6 +18,7 @@ urlpatterns = [
         content_block_save,
         name="content_block_save",
     ),
+    path("_ajax/chunked-upload/", chunked_upload, name="chunked_upload"),
     path("_ajax/update-position/", update_position, name="update_position"),
     path(
         "_ajax/<int:content_block_id>/toggle-visible/",
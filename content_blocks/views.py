@@ -8,8 +8,8 @@ from django.contrib import messages
 from django.contrib.admin.models import ADDITION, CHANGE, DELETION, LogEntry
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.contenttypes.models import ContentType
-from django.core.exceptions import PermissionDenied
-from django.http import JsonResponse, StreamingHttpResponse
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.template.loader import render_to_string
 from django.urls import reverse
@@ -19,6 +19,7 @@ from django.views.decorators.http import require_POST
 from content_blocks.admin_forms import ContentBlockTemplateImportForm
 from content_blocks.conf import settings
 from content_blocks.forms import (
+    ChunkedUploadForm,
     ContentBlockForm,
     ImportContentBlocksForm,
     NewContentBlockForm,
@@ -26,7 +27,9 @@ from content_blocks.forms import (
     PublishContentBlocksForm,
     ResetContentBlocksForm,
 )
-from content_blocks.models import ContentBlock
+from content_blocks.middleware import stick_to_primary_database
+from content_blocks.models import ChunkedUpload, ContentBlock
+from content_blocks.services.content_block import PublishGenerationServices
 from content_blocks.services.content_block_template import ImportExportServices
 
 
@@ -179,7 +182,9 @@ def content_block_save(request, content_block_id):
     """
     content_block = get_object_or_404(ContentBlock, id=content_block_id)
 
-    form = ContentBlockForm(request.POST, request.FILES, content_block=content_block)
+    form = ContentBlockForm(
+        request.POST, request.FILES, content_block=content_block, user=request.user
+    )
 
     form_is_valid = form.is_valid()
 
@@ -210,6 +215,34 @@ def content_block_save(request, content_block_id):
     return JsonResponse({"html": content_block_form_html, "saved": form_is_valid})
 
 
+@staff_member_required
+@require_POST
+@require_ajax
+def chunked_upload(request):
+    """
+    Receive a chunk of a file or video upload.  Returns the token and offset the next chunk should be sent from.
+    """
+    form = ChunkedUploadForm(request.POST, request.FILES)
+
+    if not form.is_valid():
+        return JsonResponse({"error": form.errors.get_json_data()})
+
+    try:
+        upload = form.save(user=request.user)
+    except ChunkedUpload.DoesNotExist:
+        raise Http404
+    except ValidationError as e:
+        return JsonResponse({"error": e.messages})
+
+    return JsonResponse(
+        {
+            "token": upload.token,
+            "offset": upload.offset,
+            "completed": upload.completed,
+        }
+    )
+
+
 @staff_member_required
 @require_POST
 @require_ajax
@@ -237,6 +270,7 @@ def toggle_visible(request, content_block_id):
     content_block = ContentBlock.objects.get(id=content_block_id)
     content_block.visible = not content_block.visible
     content_block.save()
+    PublishGenerationServices.bump_content_block(content_block)
 
     create_log_entry(
         request,
@@ -245,7 +279,7 @@ def toggle_visible(request, content_block_id):
         change_message=[{"changed": {"fields": ["visible"]}}],
     )
 
-    return JsonResponse({"visible": content_block.visible})
+    return stick_to_primary_database(JsonResponse({"visible": content_block.visible}))
 
 
 def ajax_form(
@@ -299,8 +333,8 @@ def ajax_form(
 @require_POST
 @require_ajax
 def publish_content_blocks(request, object_id, model_admin=None):
-    return ajax_form(
-        request, object_id, PublishContentBlocksForm, model_admin=model_admin
+    return stick_to_primary_database(
+        ajax_form(request, object_id, PublishContentBlocksForm, model_admin=model_admin)
     )
 
 
@@ -361,8 +395,9 @@ def content_block_delete(request, content_block_id):
 
     create_log_entry(request, content_block, DELETION, "")
 
+    PublishGenerationServices.bump_content_block(content_block)
     content_block.delete()
-    return JsonResponse({})
+    return stick_to_primary_database(JsonResponse({}))
 
 
 # ContentBlockTemplate import export views
@@ -3,8 +3,11 @@ from pathlib import Path
 
 from django import forms, template
 from django.contrib.admin.widgets import AdminTextInputWidget
+from django.urls import reverse
 from django.utils.text import slugify
 
+from content_blocks.conf import settings
+
 
 class FileWidget(forms.ClearableFileInput):
     template_name = "content_blocks/widgets/clearable_file.html"
@@ -13,6 +16,47 @@ class FileWidget(forms.ClearableFileInput):
         return uuid.uuid4().hex
 
 
+class ChunkedFileWidget(FileWidget):
+    """
+    File widget which the content block editor uploads in chunks before the form is submitted.
+    The form is then submitted with the token of the completed upload instead of the file.
+    """
+
+    template_name = "content_blocks/widgets/chunked_file.html"
+    # Only uploads by this user are accepted, set by ContentBlockForm.
+    user = None
+
+    def token_name(self, name):
+        return f"{name}_upload_token"
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context["widget"]["attrs"].update(
+            {
+                "data-chunked-upload": reverse("content_blocks:chunked_upload"),
+                "data-chunk-size": settings.CONTENT_BLOCKS_CHUNKED_UPLOAD_CHUNK_SIZE,
+                "data-token-input": self.token_name(name),
+            }
+        )
+        context["widget"]["token_name"] = self.token_name(name)
+        return context
+
+    def value_from_datadict(self, data, files, name):
+        token = data.get(self.token_name(name))
+        if token:
+            from content_blocks.services.upload import ChunkedUploadServices
+
+            upload = ChunkedUploadServices.open(token, user=self.user)
+            if upload is not None:
+                return upload
+        return super().value_from_datadict(data, files, name)
+
+    def value_omitted_from_data(self, data, files, name):
+        return super().value_omitted_from_data(data, files, name) and not data.get(
+            self.token_name(name)
+        )
+
+
 class TemplateFilenameAutocompleteWidget(AdminTextInputWidget):
     """
     Add autocomplete suggestions to text input via datalist.
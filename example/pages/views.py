@@ -3,15 +3,28 @@ Page app views.py
 """
 from django.shortcuts import get_object_or_404, render
 
+from content_blocks.decorators import content_blocks_condition
 from example.pages.models import Page
 
 
+def get_page(request, page_slug=None, preview=False):
+    """
+    Page for conditional GET, None for previews.
+    """
+    if preview:
+        return None
+    return get_object_or_404(Page, slug=page_slug or "")
+
+
+# The header collection is rendered by base.html.
+@content_blocks_condition(get_page, collections=["header"])
 def page_detail(request, page_slug=None, preview=False):
     """
     Page detail view.
     """
-    page_slug = page_slug or ""
-    page = get_object_or_404(Page, slug=page_slug)
+    page = request.content_blocks_parent or get_object_or_404(
+        Page, slug=page_slug or ""
+    )
 
     content_blocks = (
         page.content_blocks.previews() if preview else page.content_blocks.visible()
@@ -65,6 +65,7 @@ MIDDLEWARE = [
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "django.contrib.sites.middleware.CurrentSiteMiddleware",
+    "content_blocks.middleware.ReadDatabaseMiddleware",
 ]
 
 ROOT_URLCONF = "example.urls"
@@ -102,6 +103,13 @@ DATABASES = {
 }
 DATABASES["default"]["ATOMIC_REQUESTS"] = True
 
+# Optional read replica public content block queries are read from, see CONTENT_BLOCKS_READ_DATABASE.
+if env("READ_DATABASE_URL", default=None):
+    DATABASES["replica"] = env.db("READ_DATABASE_URL")
+    CONTENT_BLOCKS_READ_DATABASE = "replica"
+
+DATABASE_ROUTERS = ["content_blocks.routers.ReadDatabaseRouter"]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
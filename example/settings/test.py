@@ -5,3 +5,10 @@ from .base import *  # noqa
 CONTENT_BLOCKS_DEFAULT_STATUS_MESSAGE = (
     lambda: f"&copy; Shy Studios Ltd {timezone.now().strftime('%Y')}"
 )
+
+# A read database for testing CONTENT_BLOCKS_READ_DATABASE, it uses the default test database.
+DATABASES["replica"] = {  # noqa
+    **DATABASES["default"],  # noqa
+    "ATOMIC_REQUESTS": False,
+    "TEST": {"MIRROR": "default"},
+}